@@ -0,0 +1,686 @@
+"""
+An alternative to the interpreter loop in `execute.py`, with the same semantics, limits and STL.
+
+Instead of decoding every instruction each time it runs, each instruction is translated once into a Python closure
+with its operands already read, that runs it against the VM state and returns the next instruction pointer. Translated
+chunks are cached by their bytecode, so repeatedly running the same bytecode (e.g. the same Hog function for many
+events) only pays for the translation once.
+
+Instructions are translated lazily at the position they're first run from, so even jumps into the middle of another
+instruction behave exactly as in the interpreter. Global lookups, calls and throws share their implementation with the
+interpreter.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import timedelta
+from typing import Any, Optional, TYPE_CHECKING
+
+from common.hogvm.python.execute import BytecodeResult, call_global, call_local, catch_exception, get_global
+from common.hogvm.python.memory import ValueStack
+from common.hogvm.python.objects import (
+    CallFrame,
+    ThrowFrame,
+    is_hog_upvalue,
+    new_hog_callable,
+    new_hog_closure,
+)
+from common.hogvm.python.operation import HOGQL_BYTECODE_IDENTIFIER, HOGQL_BYTECODE_IDENTIFIER_V0, Operation
+from common.hogvm.python.stl.bytecode import BYTECODE_STL
+from common.hogvm.python.utils import (
+    HogVMException,
+    HogVMRuntimeExceededException,
+    get_nested_value,
+    like,
+    unify_comparison_types,
+)
+
+if TYPE_CHECKING:
+    from posthog.models import Team
+
+COMPILED_CHUNK_CACHE_SIZE = 1000
+
+# Runs one instruction and returns the instruction pointer to continue from
+CompiledOp = Callable[["_Machine"], int]
+
+
+class _Halt(Exception):
+    def __init__(self, result: Any):
+        self.result = result
+
+
+class CompiledChunk:
+    __slots__ = ("bytecode", "ops")
+
+    def __init__(self, bytecode: tuple[Any, ...]):
+        self.bytecode = bytecode
+        self.ops: list[Optional[CompiledOp]] = [None] * len(bytecode)
+
+    def compile(self, ip: int) -> CompiledOp:
+        op = self.ops[ip] = _compile_op(self.bytecode, ip)
+        return op
+
+
+_compiled_chunks: OrderedDict[tuple[Any, ...], CompiledChunk] = OrderedDict()
+_compiled_chunks_lock = threading.Lock()
+
+
+def compile_chunk(bytecode: list[Any]) -> CompiledChunk:
+    """Translate a chunk of bytecode, reusing an earlier translation of the same bytecode if there's one."""
+    code = tuple(bytecode)
+    # Include the types, as `1`, `1.0` and `True` are equal but are different constants
+    key = tuple((type(value), value) for value in code)
+    try:
+        hash(key)
+    except TypeError:
+        return CompiledChunk(code)
+    with _compiled_chunks_lock:
+        chunk = _compiled_chunks.get(key)
+        if chunk is not None:
+            _compiled_chunks.move_to_end(key)
+            return chunk
+        chunk = _compiled_chunks[key] = CompiledChunk(code)
+        while len(_compiled_chunks) > COMPILED_CHUNK_CACHE_SIZE:
+            _compiled_chunks.popitem(last=False)
+        return chunk
+
+
+def execute_compiled_bytecode(
+    input: list[Any] | dict,
+    globals: Optional[dict[str, Any]] = None,
+    functions: Optional[dict[str, Callable[..., Any]]] = None,
+    timeout=timedelta(seconds=5),
+    team: Optional["Team"] = None,
+) -> BytecodeResult:
+    """Same as `execute_bytecode`, but runs compiled chunks. There's no debugger support."""
+    bytecodes = input if isinstance(input, dict) else {"root": {"bytecode": input}}
+    root_bytecode = bytecodes.get("root", {}).get("bytecode", []) or []
+
+    if (
+        not root_bytecode
+        or len(root_bytecode) == 0
+        or (root_bytecode[0] != HOGQL_BYTECODE_IDENTIFIER and root_bytecode[0] != HOGQL_BYTECODE_IDENTIFIER_V0)
+    ):
+        raise HogVMException(f"Invalid bytecode. Must start with '{HOGQL_BYTECODE_IDENTIFIER}'")
+    version = root_bytecode[1] if len(root_bytecode) >= 2 and root_bytecode[0] == HOGQL_BYTECODE_IDENTIFIER else 0
+    if isinstance(timeout, int):
+        timeout = timedelta(seconds=timeout)
+
+    vm = _Machine(
+        bytecodes=bytecodes,
+        root_bytecode=root_bytecode,
+        globals=globals,
+        functions=functions,
+        timeout=timeout,
+        team=team,
+        version=version,
+    )
+    root_frame = CallFrame(
+        ip=0,
+        chunk="root",
+        stack_start=0,
+        arg_len=0,
+        closure=new_hog_closure(
+            new_hog_callable(type="local", arg_count=0, upvalue_count=0, ip=0, chunk="root", name="")
+        ),
+    )
+    vm.call_stack.append(root_frame)
+    ip = vm.enter_frame(root_frame)
+
+    try:
+        while True:
+            if ip >= len(vm.code):
+                # Ran out of bytecode to execute in this call frame, so return null from it
+                ip = vm.end_frame()
+            vm.ops += 1
+            if (vm.ops & 127) == 0:  # every 128th operation
+                vm.check_timeout()
+            op = vm.code[ip]
+            if op is None:
+                op = vm.chunk.compile(ip)
+            ip = op(vm)
+    except _Halt as halt:
+        return BytecodeResult(result=halt.result, stdout=vm.stdout, bytecodes=bytecodes)
+
+
+class _Machine:
+    """The state of one execution, and the operations on it that instructions share."""
+
+    def __init__(
+        self,
+        *,
+        bytecodes: dict,
+        root_bytecode: list[Any],
+        globals: Optional[dict[str, Any]],
+        functions: Optional[dict[str, Callable[..., Any]]],
+        timeout: timedelta,
+        team: Optional["Team"],
+        version: int,
+    ):
+        self.bytecodes = bytecodes
+        self.root_bytecode = root_bytecode
+        self.globals = globals
+        self.functions = functions
+        self.timeout_seconds = timeout.total_seconds()
+        self.team = team
+        self.version = version
+        self.start_time = time.time()
+        self.ops = 0
+        self.value_stack = ValueStack()
+        self.stack = self.value_stack.values
+        self.push = self.value_stack.push
+        self.pop = self.value_stack.pop
+        self.upvalues: list[dict] = []
+        self.upvalues_by_id: dict[int, dict] = {}
+        self.call_stack: list[CallFrame] = []
+        self.throw_stack: list[ThrowFrame] = []
+        self.declared_functions: dict[str, tuple[int, int]] = {}
+        self.stdout: list[str] = []
+        self.chunks: dict[str, tuple[CompiledChunk, Optional[dict]]] = {}
+        # Set by `enter_frame`
+        self.frame: CallFrame
+        self.chunk: CompiledChunk
+        self.code: list[Optional[CompiledOp]]
+        self.chunk_globals: Optional[dict[str, Any]]
+
+    def enter_frame(self, frame: CallFrame) -> int:
+        """Continue running in the given call frame, returning the instruction pointer to continue from."""
+        self.frame = frame
+        name = frame.chunk if frame.chunk and frame.chunk != "root" else "root"
+        cached = self.chunks.get(name)
+        if cached is None:
+            if name == "root":
+                cached = (compile_chunk(self.root_bytecode), self.globals)
+            elif name.startswith("stl/") and name[4:] in BYTECODE_STL:
+                cached = (compile_chunk(BYTECODE_STL[name[4:]][1]), {})
+            elif self.bytecodes.get(name):
+                cached = (
+                    compile_chunk(self.bytecodes[name].get("bytecode", [])),
+                    self.bytecodes[name].get("globals", {}),
+                )
+            else:
+                raise HogVMException(f"Unknown chunk: {frame.chunk}")
+            self.chunks[name] = cached
+        self.chunk, self.chunk_globals = cached
+        self.code = self.chunk.ops
+        bytecode = self.chunk.bytecode
+        if frame.ip == 0 and (bytecode[0] == "_H" or bytecode[0] == "_h"):
+            frame.ip += 2 if bytecode[0] == "_H" else 1
+        return frame.ip
+
+    def call(self, frame: CallFrame, return_ip: int) -> int:
+        self.frame.ip = return_ip
+        ip = self.enter_frame(frame)
+        self.call_stack.append(frame)
+        return ip
+
+    def end_frame(self) -> int:
+        last_call_frame = self.call_stack.pop()
+        if len(self.call_stack) == 0 or last_call_frame is None:
+            if len(self.stack) > 1:
+                raise HogVMException("Invalid bytecode. More than one value left on stack")
+            raise _Halt(self.pop() if len(self.stack) > 0 else None)
+        self.keep_first_elements(last_call_frame.stack_start)
+        self.push(None)
+        return self.enter_frame(self.call_stack[-1])
+
+    def keep_first_elements(self, count: int) -> list[Any]:
+        if count < 0 or len(self.stack) < count:
+            raise HogVMException("Stack underflow")
+        for upvalue in reversed(self.upvalues):
+            if upvalue["location"] >= count:
+                if not upvalue["closed"]:
+                    upvalue["closed"] = True
+                    upvalue["value"] = self.stack[upvalue["location"]]
+            else:
+                break
+        return self.value_stack.truncate(count)
+
+    def check_timeout(self) -> None:
+        if time.time() - self.start_time > self.timeout_seconds:
+            raise HogVMRuntimeExceededException(timeout_seconds=self.timeout_seconds, ops_performed=self.ops)
+
+    def capture_upvalue(self, index: int) -> dict:
+        for upvalue in reversed(self.upvalues):
+            if upvalue["location"] < index:
+                break
+            if upvalue["location"] == index:
+                return upvalue
+        created_upvalue = {
+            "__hogUpValue__": True,
+            "location": index,
+            "closed": False,
+            "value": None,
+            "id": len(self.upvalues) + 1,
+        }
+        self.upvalues.append(created_upvalue)
+        self.upvalues_by_id[created_upvalue["id"]] = created_upvalue
+        self.upvalues.sort(key=lambda x: x["location"])
+        return created_upvalue
+
+    def get_upvalue(self, index: int) -> dict:
+        closure = self.frame.closure
+        if index >= len(closure["upvalues"]):
+            raise HogVMException(f"Invalid upvalue index: {index}")
+        upvalue = self.upvalues_by_id[closure["upvalues"][index]]
+        if not is_hog_upvalue(upvalue):
+            raise HogVMException(f"Invalid upvalue: {upvalue}")
+        return upvalue
+
+
+def _compile_op(bytecode: tuple[Any, ...], ip: int) -> CompiledOp:
+    """Translate the instruction at `ip` of a chunk into a closure."""
+    last_op = len(bytecode) - 1
+
+    def operands(count: int) -> tuple[Any, ...]:
+        if ip + count > last_op:
+            raise _MissingOperands()
+        return bytecode[ip + 1 : ip + 1 + count]
+
+    try:
+        return _compile_symbol(bytecode[ip], ip, operands)
+    except _MissingOperands:
+
+        def unexpected_end(vm: _Machine) -> int:
+            raise HogVMException("Unexpected end of bytecode")
+
+        return unexpected_end
+
+
+class _MissingOperands(Exception):
+    pass
+
+
+def _compile_symbol(symbol: Any, ip: int, operands: Callable[[int], tuple[Any, ...]]) -> CompiledOp:
+    next_ip = ip + 1
+
+    match symbol:
+        case None:
+
+            def halt(vm: _Machine) -> int:
+                raise _Halt(vm.pop() if len(vm.stack) > 0 else None)
+
+            return halt
+        case Operation.STRING | Operation.INTEGER | Operation.FLOAT:
+            (value,) = operands(1)
+
+            def push_constant(vm: _Machine) -> int:
+                vm.push(value)
+                return ip + 2
+
+            return push_constant
+        case Operation.TRUE | Operation.FALSE | Operation.NULL:
+            constant = True if symbol == Operation.TRUE else False if symbol == Operation.FALSE else None
+
+            def push_literal(vm: _Machine) -> int:
+                vm.push(constant)
+                return next_ip
+
+            return push_literal
+        case Operation.NOT:
+
+            def not_(vm: _Machine) -> int:
+                vm.push(not vm.pop())
+                return next_ip
+
+            return not_
+        case Operation.AND | Operation.OR:
+            (count,) = operands(1)
+            reduce = all if symbol == Operation.AND else any
+
+            def and_or(vm: _Machine) -> int:
+                vm.push(reduce([vm.pop() for _ in range(count)]))
+                return ip + 2
+
+            return and_or
+        case (
+            Operation.PLUS
+            | Operation.MINUS
+            | Operation.DIVIDE
+            | Operation.MULTIPLY
+            | Operation.MOD
+            | Operation.IN
+            | Operation.NOT_IN
+        ):
+            binary = _BINARY_OPERATIONS[symbol]
+
+            def binary_operation(vm: _Machine) -> int:
+                vm.push(binary(vm.pop(), vm.pop()))
+                return next_ip
+
+            return binary_operation
+        case Operation.EQ | Operation.NOT_EQ | Operation.GT | Operation.GT_EQ | Operation.LT | Operation.LT_EQ:
+            compare = _COMPARISONS[symbol]
+
+            def comparison(vm: _Machine) -> int:
+                var1, var2 = unify_comparison_types(vm.pop(), vm.pop())
+                vm.push(compare(var1, var2))
+                return next_ip
+
+            return comparison
+        case Operation.LIKE | Operation.ILIKE | Operation.NOT_LIKE | Operation.NOT_ILIKE:
+            flags = re.IGNORECASE if symbol in (Operation.ILIKE, Operation.NOT_ILIKE) else 0
+            negate = symbol in (Operation.NOT_LIKE, Operation.NOT_ILIKE)
+
+            def like_(vm: _Machine) -> int:
+                matches = like(vm.pop(), vm.pop(), flags) if flags else like(vm.pop(), vm.pop())
+                vm.push(not matches if negate else matches)
+                return next_ip
+
+            return like_
+        case Operation.REGEX | Operation.NOT_REGEX | Operation.IREGEX | Operation.NOT_IREGEX:
+            regex_flags = re.RegexFlag.IGNORECASE if symbol in (Operation.IREGEX, Operation.NOT_IREGEX) else 0
+            regex_negate = symbol in (Operation.NOT_REGEX, Operation.NOT_IREGEX)
+
+            def regex(vm: _Machine) -> int:
+                args = [vm.pop(), vm.pop()]
+                if args[0] and args[1]:
+                    matches = bool(re.search(re.compile(args[1], regex_flags), args[0]))
+                    vm.push(not matches if regex_negate else matches)
+                else:
+                    vm.push(False)
+                return next_ip
+
+            return regex
+        case Operation.GET_GLOBAL:
+            (count,) = operands(1)
+
+            def get_global_(vm: _Machine) -> int:
+                chain = [vm.pop() for _ in range(count)]
+                vm.push(get_global(chain, vm.chunk_globals, vm.functions))
+                return ip + 2
+
+            return get_global_
+        case Operation.POP:
+
+            def pop(vm: _Machine) -> int:
+                vm.pop()
+                return next_ip
+
+            return pop
+        case Operation.CLOSE_UPVALUE:
+
+            def close_upvalue(vm: _Machine) -> int:
+                vm.keep_first_elements(len(vm.stack) - 1)
+                return next_ip
+
+            return close_upvalue
+        case Operation.RETURN:
+
+            def return_(vm: _Machine) -> int:
+                response = vm.pop()
+                last_call_frame = vm.call_stack.pop()
+                if len(vm.call_stack) == 0 or last_call_frame is None:
+                    raise _Halt(response)
+                vm.keep_first_elements(last_call_frame.stack_start)
+                vm.push(response)
+                return vm.enter_frame(vm.call_stack[-1])
+
+            return return_
+        case Operation.GET_LOCAL:
+            (local_index,) = operands(1)
+
+            def get_local(vm: _Machine) -> int:
+                stack_start = 0 if not vm.call_stack else vm.call_stack[-1].stack_start
+                vm.value_stack.push_copy(local_index + stack_start)
+                return ip + 2
+
+            return get_local
+        case Operation.SET_LOCAL:
+            (local_index,) = operands(1)
+
+            def set_local(vm: _Machine) -> int:
+                stack_start = 0 if not vm.call_stack else vm.call_stack[-1].stack_start
+                vm.value_stack.pop_into(local_index + stack_start)
+                return ip + 2
+
+            return set_local
+        case Operation.GET_PROPERTY | Operation.GET_PROPERTY_NULLISH:
+            nullish = symbol == Operation.GET_PROPERTY_NULLISH
+
+            def get_property(vm: _Machine) -> int:
+                property = vm.pop()
+                vm.push(get_nested_value(vm.pop(), [property], nullish=nullish))
+                return next_ip
+
+            return get_property
+        case Operation.SET_PROPERTY:
+
+            def set_property(vm: _Machine) -> int:
+                value = vm.pop()
+                field = vm.pop()
+                vm.value_stack.set_property(vm.pop(), field, value)
+                return next_ip
+
+            return set_property
+        case Operation.DICT:
+            (count,) = operands(1)
+
+            def dict_(vm: _Machine) -> int:
+                if count > 0:
+                    vm.value_stack.push_container(count * 2, dict)
+                else:
+                    vm.push({})
+                return ip + 2
+
+            return dict_
+        case Operation.ARRAY:
+            (count,) = operands(1)
+
+            def array(vm: _Machine) -> int:
+                if count > 0:
+                    vm.value_stack.push_container(count, list)
+                else:
+                    vm.push([])
+                return ip + 2
+
+            return array
+        case Operation.TUPLE:
+            (count,) = operands(1)
+
+            def tuple_(vm: _Machine) -> int:
+                if count > 0:
+                    vm.value_stack.push_container(count, tuple)
+                else:
+                    vm.push(())
+                return ip + 2
+
+            return tuple_
+        case Operation.JUMP:
+            (count,) = operands(1)
+            jump_ip = ip + 2 + count
+
+            def jump(vm: _Machine) -> int:
+                return jump_ip
+
+            return jump
+        case Operation.JUMP_IF_FALSE:
+            (count,) = operands(1)
+            jump_ip = ip + 2 + count
+
+            def jump_if_false(vm: _Machine) -> int:
+                return ip + 2 if vm.pop() else jump_ip
+
+            return jump_if_false
+        case Operation.JUMP_IF_STACK_NOT_NULL:
+            (count,) = operands(1)
+            jump_ip = ip + 2 + count
+
+            def jump_if_stack_not_null(vm: _Machine) -> int:
+                return jump_ip if len(vm.stack) > 0 and vm.stack[-1] is not None else ip + 2
+
+            return jump_if_stack_not_null
+        case Operation.DECLARE_FN:
+            # DEPRECATED
+            name, arg_len, body_len = operands(3)
+
+            def declare_fn(vm: _Machine) -> int:
+                vm.declared_functions[name] = (ip + 4, arg_len)
+                return ip + 4 + body_len
+
+            return declare_fn
+        case Operation.CALLABLE:
+            name, arg_count, upvalue_count, body_length = operands(4)
+
+            def callable_(vm: _Machine) -> int:
+                vm.push(
+                    new_hog_callable(
+                        type="local",
+                        name=name,
+                        chunk=vm.frame.chunk,
+                        arg_count=arg_count,
+                        upvalue_count=upvalue_count,
+                        ip=ip + 5,
+                    )
+                )
+                return ip + 5 + body_length
+
+            return callable_
+        case Operation.CLOSURE:
+            (upvalue_count,) = operands(1)
+            captures = operands(1 + upvalue_count * 2)[1:]
+
+            def closure(vm: _Machine) -> int:
+                closure_callable = vm.pop()
+                closure = new_hog_closure(closure_callable)
+                stack_start = vm.frame.stack_start
+                if upvalue_count != closure_callable["upvalueCount"]:
+                    raise HogVMException(
+                        f"Invalid upvalue count. Expected {closure_callable['upvalueCount']}, got {upvalue_count}"
+                    )
+                for i in range(0, len(captures), 2):
+                    is_local, index = captures[i], captures[i + 1]
+                    if is_local:
+                        closure["upvalues"].append(vm.capture_upvalue(stack_start + index)["id"])
+                    else:
+                        closure["upvalues"].append(vm.frame.closure["upvalues"][index])
+                vm.push(closure)
+                return ip + 2 + len(captures)
+
+            return closure
+        case Operation.GET_UPVALUE:
+            (index,) = operands(1)
+
+            def get_upvalue(vm: _Machine) -> int:
+                upvalue = vm.get_upvalue(index)
+                if upvalue["closed"]:
+                    vm.push(upvalue["value"])
+                else:
+                    vm.value_stack.push_copy(upvalue["location"])
+                return ip + 2
+
+            return get_upvalue
+        case Operation.SET_UPVALUE:
+            (index,) = operands(1)
+
+            def set_upvalue(vm: _Machine) -> int:
+                upvalue = vm.get_upvalue(index)
+                if upvalue["closed"]:
+                    upvalue["value"] = vm.pop()
+                else:
+                    vm.value_stack.replace(upvalue["location"], vm.pop())
+                return ip + 2
+
+            return set_upvalue
+        case Operation.CALL_GLOBAL:
+            name, arg_count = operands(2)
+
+            def call_global_(vm: _Machine) -> int:
+                vm.check_timeout()
+                frame = call_global(
+                    name,
+                    arg_count,
+                    value_stack=vm.value_stack,
+                    keep_first_elements=vm.keep_first_elements,
+                    chunk=vm.frame.chunk,
+                    declared_functions=vm.declared_functions,
+                    functions=vm.functions,
+                    version=vm.version,
+                    team=vm.team,
+                    stdout=vm.stdout,
+                    timeout_seconds=vm.timeout_seconds,
+                )
+                return ip + 3 if frame is None else vm.call(frame, ip + 3)
+
+            return call_global_
+        case Operation.CALL_LOCAL:
+            (args_length,) = operands(1)
+
+            def call_local_(vm: _Machine) -> int:
+                vm.check_timeout()
+                frame = call_local(
+                    args_length,
+                    value_stack=vm.value_stack,
+                    version=vm.version,
+                    team=vm.team,
+                    stdout=vm.stdout,
+                    timeout_seconds=vm.timeout_seconds,
+                )
+                return ip + 2 if frame is None else vm.call(frame, ip + 2)
+
+            return call_local_
+        case Operation.TRY:
+            (count,) = operands(1)
+            # Relative to the TRY itself, as the interpreter computes it before reading the operand
+            catch_ip = ip + 1 + count
+
+            def try_(vm: _Machine) -> int:
+                vm.throw_stack.append(
+                    ThrowFrame(call_stack_len=len(vm.call_stack), stack_len=len(vm.stack), catch_ip=catch_ip)
+                )
+                return ip + 2
+
+            return try_
+        case Operation.POP_TRY:
+
+            def pop_try(vm: _Machine) -> int:
+                if vm.throw_stack:
+                    vm.throw_stack.pop()
+                else:
+                    raise HogVMException("Invalid operation POP_TRY: no try block to pop")
+                return next_ip
+
+            return pop_try
+        case Operation.THROW:
+
+            def throw(vm: _Machine) -> int:
+                exception = vm.pop()
+                last_throw = catch_exception(exception, vm.throw_stack)
+                vm.keep_first_elements(last_throw.stack_len)
+                del vm.call_stack[last_throw.call_stack_len :]
+                vm.push(exception)
+                frame = vm.call_stack[-1]
+                vm.enter_frame(frame)
+                frame.ip = last_throw.catch_ip
+                return last_throw.catch_ip
+
+            return throw
+        case _:
+
+            def unexpected_node(vm: _Machine) -> int:
+                raise HogVMException(f'Unexpected node while running bytecode in chunk "{vm.frame.chunk}": {symbol}')
+
+            return unexpected_node
+
+
+_BINARY_OPERATIONS: dict[Operation, Callable[[Any, Any], Any]] = {
+    Operation.PLUS: lambda a, b: a + b,
+    Operation.MINUS: lambda a, b: a - b,
+    Operation.DIVIDE: lambda a, b: a / b,
+    Operation.MULTIPLY: lambda a, b: a * b,
+    Operation.MOD: lambda a, b: a % b,
+    Operation.IN: lambda a, b: a in b,
+    Operation.NOT_IN: lambda a, b: a not in b,
+}
+
+_COMPARISONS: dict[Operation, Callable[[Any, Any], bool]] = {
+    Operation.EQ: lambda a, b: a == b,
+    Operation.NOT_EQ: lambda a, b: a != b,
+    Operation.GT: lambda a, b: a > b,
+    Operation.GT_EQ: lambda a, b: a >= b,
+    Operation.LT: lambda a, b: a < b,
+    Operation.LT_EQ: lambda a, b: a <= b,
+}
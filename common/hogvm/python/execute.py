@@ -6,6 +6,7 @@ from typing import Any, Optional, TYPE_CHECKING
 from collections.abc import Callable
 
 from common.hogvm.python.debugger import debugger, color_bytecode
+from common.hogvm.python.memory import ValueStack
 from common.hogvm.python.objects import (
     is_hog_error,
     new_hog_closure,
@@ -24,8 +25,6 @@ from common.hogvm.python.utils import (
     HogVMException,
     get_nested_value,
     like,
-    set_nested_value,
-    calculate_cost,
     unify_comparison_types,
     HogVMRuntimeExceededException,
     HogVMMemoryExceededException,
@@ -34,7 +33,6 @@ from common.hogvm.python.utils import (
 if TYPE_CHECKING:
     from posthog.models import Team
 
-MAX_MEMORY = 64 * 1024 * 1024  # 64 MB
 MAX_FUNCTION_ARGS_LENGTH = 300
 CALLSTACK_LENGTH = 1000
 
@@ -46,6 +44,182 @@ class BytecodeResult:
     stdout: list[str]
 
 
+def get_global(chain: list[Any], chunk_globals: Optional[dict[str, Any]], functions: Optional[dict[str, Any]]) -> Any:
+    """The value of a global variable, or a closure for the host or STL function of that name."""
+    if chunk_globals and chain[0] in chunk_globals:
+        return deepcopy(get_nested_value(chunk_globals, chain, True))
+    elif functions and chain[0] in functions:
+        return new_hog_closure(
+            new_hog_callable(type="stl", name=chain[0], arg_count=0, upvalue_count=0, ip=-1, chunk="stl")
+        )
+    elif chain[0] in STL and len(chain) == 1:
+        return new_hog_closure(
+            new_hog_callable(
+                type="stl",
+                name=chain[0],
+                arg_count=STL[chain[0]].maxArgs or 0,
+                upvalue_count=0,
+                ip=-1,
+                chunk="stl",
+            )
+        )
+    elif chain[0] in BYTECODE_STL and len(chain) == 1:
+        return new_hog_closure(
+            new_hog_callable(
+                type="stl",
+                name=chain[0],
+                arg_count=len(BYTECODE_STL[chain[0]][0]),
+                upvalue_count=0,
+                ip=0,
+                chunk=f"stl/{chain[0]}",
+            )
+        )
+    raise HogVMException(f"Global variable not found: {chain[0]}")
+
+
+def _function_frame(*, type: str, name: str, chunk: str, ip: int, arg_count: int, stack_start: int) -> CallFrame:
+    return CallFrame(
+        ip=ip,
+        chunk=chunk,
+        stack_start=stack_start,
+        arg_len=arg_count,
+        closure=new_hog_closure(
+            new_hog_callable(type=type, name=name, arg_count=arg_count, upvalue_count=0, ip=ip, chunk=chunk)
+        ),
+    )
+
+
+def call_global(
+    name: str,
+    arg_count: int,
+    *,
+    value_stack: ValueStack,
+    keep_first_elements: Callable[[int], list[Any]],
+    chunk: str,
+    declared_functions: dict[str, tuple[int, int]],
+    functions: Optional[dict[str, Callable[..., Any]]],
+    version: int,
+    team: Optional["Team"],
+    stdout: list[str],
+    timeout_seconds: float,
+) -> Optional[CallFrame]:
+    """
+    Call a function by its name. Host and STL functions run right away and push their result on the stack, while for
+    functions that run bytecode, the call frame to continue in is returned.
+    """
+    stack = value_stack.values
+    # This is for backwards compatibility. We use a closure on the stack with local functions now.
+    if name in declared_functions:
+        func_ip, arg_len = declared_functions[name]
+        if arg_len > arg_count:
+            for _ in range(arg_len - arg_count):
+                value_stack.push(None)
+        return _function_frame(
+            type="local", name=name, chunk=chunk, ip=func_ip, arg_count=arg_len, stack_start=len(stack) - arg_len
+        )
+    if name == "import":
+        if arg_count != 1:
+            raise HogVMException("Function import requires exactly 1 argument")
+        module_name = value_stack.pop()
+        return _function_frame(
+            type="local", name=module_name, chunk=module_name, ip=0, arg_count=0, stack_start=len(stack)
+        )
+    if (functions is not None and name in functions) or name in STL:
+        if version == 0:
+            args = [value_stack.pop() for _ in range(arg_count)]
+        else:
+            args = keep_first_elements(len(stack) - arg_count)
+        if functions is not None and name in functions:
+            response = functions[name](*args)
+            # Host functions may have mutated anything they were passed
+            value_stack.invalidate()
+        else:
+            response = STL[name].fn(args, team, stdout, timeout_seconds)
+        value_stack.push(response)
+        return None
+    if name in BYTECODE_STL:
+        arg_names = BYTECODE_STL[name][0]
+        if len(arg_names) != arg_count:
+            raise HogVMException(f"Function {name} requires exactly {len(arg_names)} arguments")
+        return _function_frame(
+            type="stl", name=name, chunk=f"stl/{name}", ip=0, arg_count=arg_count, stack_start=len(stack) - arg_count
+        )
+    raise HogVMException(f"Unsupported function call: {name}")
+
+
+def call_local(
+    args_length: int,
+    *,
+    value_stack: ValueStack,
+    version: int,
+    team: Optional["Team"],
+    stdout: list[str],
+    timeout_seconds: float,
+) -> Optional[CallFrame]:
+    """
+    Call the closure on top of the stack. STL functions run right away and push their result on the stack, while for
+    local functions, the call frame to continue in is returned.
+    """
+    closure = value_stack.pop()
+    if not isinstance(closure, dict) or closure.get("__hogClosure__") is None:
+        raise HogVMException(f"Invalid closure: {closure}")
+    callable = closure.get("callable")
+    if not isinstance(callable, dict) or callable.get("__hogCallable__") is None:
+        raise HogVMException(f"Invalid callable: {callable}")
+    if args_length > MAX_FUNCTION_ARGS_LENGTH:
+        raise HogVMException("Too many arguments")
+
+    if callable.get("__hogCallable__") == "local":
+        if callable["argCount"] > args_length:
+            # TODO: specify minimum required arguments somehow
+            for _ in range(callable["argCount"] - args_length):
+                value_stack.push(None)
+        elif callable["argCount"] < args_length:
+            raise HogVMException(f"Too many arguments. Passed {args_length}, expected {callable['argCount']}")
+        return CallFrame(
+            ip=callable["ip"],
+            chunk=callable["chunk"],
+            stack_start=len(value_stack.values) - callable["argCount"],
+            arg_len=callable["argCount"],
+            closure=closure,
+        )
+
+    elif callable.get("__hogCallable__") == "stl":
+        if callable["name"] not in STL:
+            raise HogVMException(f"Unsupported function call: {callable['name']}")
+        stl_fn = STL[callable["name"]]
+        if stl_fn.minArgs is not None and args_length < stl_fn.minArgs:
+            raise HogVMException(f"Function {callable['name']} requires at least {stl_fn.minArgs} arguments")
+        if stl_fn.maxArgs is not None and args_length > stl_fn.maxArgs:
+            raise HogVMException(f"Function {callable['name']} requires at most {stl_fn.maxArgs} arguments")
+        if version == 0:
+            args = [value_stack.pop() for _ in range(args_length)]
+        else:
+            args = list(reversed([value_stack.pop() for _ in range(args_length)]))
+            if stl_fn.maxArgs is not None and len(args) < stl_fn.maxArgs:
+                args = [*args, *([None] * (stl_fn.maxArgs - len(args)))]
+        value_stack.push(stl_fn.fn(args, team, stdout, timeout_seconds))
+        return None
+
+    elif callable.get("__hogCallable__") == "async":
+        raise HogVMException("Async functions are not supported")
+
+    raise HogVMException("Invalid callable")
+
+
+def catch_exception(exception: Any, throw_stack: list[ThrowFrame]) -> ThrowFrame:
+    """The try block that catches a thrown value, raising an error if there isn't one or the value isn't an error."""
+    if not is_hog_error(exception):
+        raise HogVMException("Can not throw: value is not of type Error")
+    if not throw_stack:
+        raise UncaughtHogVMException(
+            type=exception.get("type"),
+            message=exception.get("message"),
+            payload=exception.get("payload"),
+        )
+    return throw_stack.pop()
+
+
 def execute_bytecode(
     input: list[Any] | dict,
     globals: Optional[dict[str, Any]] = None,
@@ -66,15 +240,13 @@ def execute_bytecode(
     version = root_bytecode[1] if len(root_bytecode) >= 2 and root_bytecode[0] == HOGQL_BYTECODE_IDENTIFIER else 0
     start_time = time.time()
     last_op = len(root_bytecode) - 1
-    stack: list = []
+    value_stack = ValueStack()
+    stack = value_stack.values
     upvalues: list[dict] = []
     upvalues_by_id: dict[int, dict] = {}
-    mem_stack: list = []
     call_stack: list[CallFrame] = []
     throw_stack: list[ThrowFrame] = []
     declared_functions: dict[str, tuple[int, int]] = {}
-    mem_used = 0
-    max_mem_used = 0
     ops = 0
     stdout: list[str] = []
     debug_bytecode = []
@@ -127,7 +299,6 @@ def execute_bytecode(
     set_chunk_bytecode()
 
     def stack_keep_first_elements(count: int) -> list[Any]:
-        nonlocal stack, mem_stack, mem_used
         if count < 0 or len(stack) < count:
             raise HogVMException("Stack underflow")
         for upvalue in reversed(upvalues):
@@ -137,11 +308,7 @@ def execute_bytecode(
                     upvalue["value"] = stack[upvalue["location"]]
             else:
                 break
-        removed = stack[count:]
-        stack = stack[0:count]
-        mem_used -= sum(mem_stack[count:])
-        mem_stack = mem_stack[0:count]
-        return removed
+        return value_stack.truncate(count)
 
     def next_token():
         nonlocal frame, chunk_bytecode
@@ -150,22 +317,8 @@ def execute_bytecode(
         frame.ip += 1
         return chunk_bytecode[frame.ip]
 
-    def pop_stack():
-        if not stack:
-            raise HogVMException("Stack underflow")
-        nonlocal mem_used
-        mem_used -= mem_stack.pop()
-        return stack.pop()
-
-    def push_stack(value):
-        stack.append(value)
-        mem_stack.append(calculate_cost(value))
-        nonlocal mem_used
-        mem_used += mem_stack[-1]
-        nonlocal max_mem_used
-        max_mem_used = max(mem_used, max_mem_used)
-        if mem_used > MAX_MEMORY:
-            raise HogVMMemoryExceededException(memory_limit=MAX_MEMORY, attempted_memory=mem_used)
+    pop_stack = value_stack.pop
+    push_stack = value_stack.push
 
     def check_timeout():
         if time.time() - start_time > timeout.total_seconds() and not debug:
@@ -298,49 +451,7 @@ def execute_bytecode(
                 )
             case Operation.GET_GLOBAL:
                 chain = [pop_stack() for _ in range(next_token())]
-                if chunk_globals and chain[0] in chunk_globals:
-                    push_stack(deepcopy(get_nested_value(chunk_globals, chain, True)))
-                elif functions and chain[0] in functions:
-                    push_stack(
-                        new_hog_closure(
-                            new_hog_callable(
-                                type="stl",
-                                name=chain[0],
-                                arg_count=0,
-                                upvalue_count=0,
-                                ip=-1,
-                                chunk="stl",
-                            )
-                        )
-                    )
-                elif chain[0] in STL and len(chain) == 1:
-                    push_stack(
-                        new_hog_closure(
-                            new_hog_callable(
-                                type="stl",
-                                name=chain[0],
-                                arg_count=STL[chain[0]].maxArgs or 0,
-                                upvalue_count=0,
-                                ip=-1,
-                                chunk="stl",
-                            )
-                        )
-                    )
-                elif chain[0] in BYTECODE_STL and len(chain) == 1:
-                    push_stack(
-                        new_hog_closure(
-                            new_hog_callable(
-                                type="stl",
-                                name=chain[0],
-                                arg_count=len(BYTECODE_STL[chain[0]][0]),
-                                upvalue_count=0,
-                                ip=0,
-                                chunk=f"stl/{chain[0]}",
-                            )
-                        )
-                    )
-                else:
-                    raise HogVMException(f"Global variable not found: {chain[0]}")
+                push_stack(get_global(chain, chunk_globals, functions))
             case Operation.POP:
                 pop_stack()
             case Operation.CLOSE_UPVALUE:
@@ -359,16 +470,10 @@ def execute_bytecode(
 
             case Operation.GET_LOCAL:
                 stack_start = 0 if not call_stack else call_stack[-1].stack_start
-                push_stack(stack[next_token() + stack_start])
+                value_stack.push_copy(next_token() + stack_start)
             case Operation.SET_LOCAL:
                 stack_start = 0 if not call_stack else call_stack[-1].stack_start
-                value = pop_stack()
-                index = next_token() + stack_start
-                stack[index] = value
-                last_cost = mem_stack[index]
-                mem_stack[index] = calculate_cost(value)
-                mem_used += mem_stack[index] - last_cost
-                max_mem_used = max(mem_used, max_mem_used)
+                value_stack.pop_into(next_token() + stack_start)
             case Operation.GET_PROPERTY:
                 property = pop_stack()
                 push_stack(get_nested_value(pop_stack(), [property]))
@@ -378,35 +483,23 @@ def execute_bytecode(
             case Operation.SET_PROPERTY:
                 value = pop_stack()
                 field = pop_stack()
-                set_nested_value(pop_stack(), [field], value)
+                value_stack.set_property(pop_stack(), field, value)
             case Operation.DICT:
                 count = next_token()
                 if count > 0:
-                    elems = stack[-(count * 2) :]
-                    stack = stack[: -(count * 2)]
-                    mem_used -= sum(mem_stack[-(count * 2) :])
-                    mem_stack = mem_stack[: -(count * 2)]
-                    push_stack({elems[i]: elems[i + 1] for i in range(0, len(elems), 2)})
+                    value_stack.push_container(count * 2, dict)
                 else:
                     push_stack({})
             case Operation.ARRAY:
                 count = next_token()
                 if count > 0:
-                    elems = stack[-count:]
-                    stack = stack[:-count]
-                    mem_used -= sum(mem_stack[-count:])
-                    mem_stack = mem_stack[:-count]
-                    push_stack(elems)
+                    value_stack.push_container(count, list)
                 else:
                     push_stack([])
             case Operation.TUPLE:
                 count = next_token()
                 if count > 0:
-                    elems = stack[-count:]
-                    stack = stack[:-count]
-                    mem_used -= sum(mem_stack[-count:])
-                    mem_stack = mem_stack[:-count]
-                    push_stack(tuple(elems))
+                    value_stack.push_container(count, tuple)
                 else:
                     push_stack(())
             case Operation.JUMP:
@@ -470,7 +563,7 @@ def execute_bytecode(
                 if upvalue["closed"]:
                     push_stack(upvalue["value"])
                 else:
-                    push_stack(stack[upvalue["location"]])
+                    value_stack.push_copy(upvalue["location"])
             case Operation.SET_UPVALUE:
                 index = next_token()
                 closure = frame.closure
@@ -482,157 +575,47 @@ def execute_bytecode(
                 if upvalue["closed"]:
                     upvalue["value"] = pop_stack()
                 else:
-                    stack[upvalue["location"]] = pop_stack()
+                    value_stack.replace(upvalue["location"], pop_stack())
             case Operation.CALL_GLOBAL:
                 check_timeout()
                 name = next_token()
                 arg_count = next_token()
-                # This is for backwards compatibility. We use a closure on the stack with local functions now.
-                if name in declared_functions:
-                    func_ip, arg_len = declared_functions[name]
+                call_frame = call_global(
+                    name,
+                    arg_count,
+                    value_stack=value_stack,
+                    keep_first_elements=stack_keep_first_elements,
+                    chunk=frame.chunk,
+                    declared_functions=declared_functions,
+                    functions=functions,
+                    version=version,
+                    team=team,
+                    stdout=stdout,
+                    timeout_seconds=timeout.total_seconds(),
+                )
+                if call_frame is not None:
                     frame.ip += 1  # advance for when we return
-                    if arg_len > arg_count:
-                        for _ in range(arg_len - arg_count):
-                            push_stack(None)
-                    frame = CallFrame(
-                        ip=func_ip,
-                        chunk=frame.chunk,
-                        stack_start=len(stack) - arg_len,
-                        arg_len=arg_len,
-                        closure=new_hog_closure(
-                            new_hog_callable(
-                                type="local",
-                                name=name,
-                                arg_count=arg_len,
-                                upvalue_count=0,
-                                ip=func_ip,
-                                chunk=frame.chunk,
-                            )
-                        ),
-                    )
+                    frame = call_frame
                     set_chunk_bytecode()
                     call_stack.append(frame)
                     continue  # resume the loop without incrementing frame.ip
-                else:
-                    if name == "import":
-                        if arg_count != 1:
-                            raise HogVMException("Function import requires exactly 1 argument")
-                        module_name = pop_stack()
-                        frame.ip += 1  # advance for when we return
-                        frame = CallFrame(
-                            ip=0,
-                            chunk=module_name,
-                            stack_start=len(stack),
-                            arg_len=0,
-                            closure=new_hog_closure(
-                                new_hog_callable(
-                                    type="local",
-                                    name=module_name,
-                                    arg_count=0,
-                                    upvalue_count=0,
-                                    ip=0,
-                                    chunk=module_name,
-                                )
-                            ),
-                        )
-                        set_chunk_bytecode()
-                        call_stack.append(frame)
-                        continue
-                    elif functions is not None and name in functions:
-                        if version == 0:
-                            args = [pop_stack() for _ in range(arg_count)]
-                        else:
-                            args = stack_keep_first_elements(len(stack) - arg_count)
-                        push_stack(functions[name](*args))
-                    elif name in STL:
-                        if version == 0:
-                            args = [pop_stack() for _ in range(arg_count)]
-                        else:
-                            args = stack_keep_first_elements(len(stack) - arg_count)
-                        push_stack(STL[name].fn(args, team, stdout, timeout.total_seconds()))
-                    elif name in BYTECODE_STL:
-                        arg_names = BYTECODE_STL[name][0]
-                        if len(arg_names) != arg_count:
-                            raise HogVMException(f"Function {name} requires exactly {len(arg_names)} arguments")
-                        frame.ip += 1  # advance for when we return
-                        frame = CallFrame(
-                            ip=0,
-                            chunk=f"stl/{name}",
-                            stack_start=len(stack) - arg_count,
-                            arg_len=arg_count,
-                            closure=new_hog_closure(
-                                new_hog_callable(
-                                    type="stl",
-                                    name=name,
-                                    arg_count=arg_count,
-                                    upvalue_count=0,
-                                    ip=0,
-                                    chunk=f"stl/{name}",
-                                )
-                            ),
-                        )
-                        set_chunk_bytecode()
-                        call_stack.append(frame)
-                        continue  # resume the loop without incrementing frame.ip
-                    else:
-                        raise HogVMException(f"Unsupported function call: {name}")
             case Operation.CALL_LOCAL:
                 check_timeout()
-                closure = pop_stack()
-                if not isinstance(closure, dict) or closure.get("__hogClosure__") is None:
-                    raise HogVMException(f"Invalid closure: {closure}")
-                callable = closure.get("callable")
-                if not isinstance(callable, dict) or callable.get("__hogCallable__") is None:
-                    raise HogVMException(f"Invalid callable: {callable}")
                 args_length = next_token()
-                if args_length > MAX_FUNCTION_ARGS_LENGTH:
-                    raise HogVMException("Too many arguments")
-
-                if callable.get("__hogCallable__") == "local":
-                    if callable["argCount"] > args_length:
-                        # TODO: specify minimum required arguments somehow
-                        for _ in range(callable["argCount"] - args_length):
-                            push_stack(None)
-                    elif callable["argCount"] < args_length:
-                        raise HogVMException(
-                            f"Too many arguments. Passed {args_length}, expected {callable['argCount']}"
-                        )
+                call_frame = call_local(
+                    args_length,
+                    value_stack=value_stack,
+                    version=version,
+                    team=team,
+                    stdout=stdout,
+                    timeout_seconds=timeout.total_seconds(),
+                )
+                if call_frame is not None:
                     frame.ip += 1  # advance for when we return
-                    frame = CallFrame(
-                        ip=callable["ip"],
-                        chunk=callable["chunk"],
-                        stack_start=len(stack) - callable["argCount"],
-                        arg_len=callable["argCount"],
-                        closure=closure,
-                    )
+                    frame = call_frame
                     set_chunk_bytecode()
                     call_stack.append(frame)
                     continue  # resume the loop without incrementing frame.ip
-
-                elif callable.get("__hogCallable__") == "stl":
-                    if callable["name"] not in STL:
-                        raise HogVMException(f"Unsupported function call: {callable['name']}")
-                    stl_fn = STL[callable["name"]]
-                    if stl_fn.minArgs is not None and args_length < stl_fn.minArgs:
-                        raise HogVMException(
-                            f"Function {callable['name']} requires at least {stl_fn.minArgs} arguments"
-                        )
-                    if stl_fn.maxArgs is not None and args_length > stl_fn.maxArgs:
-                        raise HogVMException(f"Function {callable['name']} requires at most {stl_fn.maxArgs} arguments")
-                    if version == 0:
-                        args = [pop_stack() for _ in range(args_length)]
-                    else:
-                        args = list(reversed([pop_stack() for _ in range(args_length)]))
-                        if stl_fn.maxArgs is not None and len(args) < stl_fn.maxArgs:
-                            args = [*args, *([None] * (stl_fn.maxArgs - len(args)))]
-                    push_stack(stl_fn.fn(args, team, stdout, timeout.total_seconds()))
-
-                elif callable.get("__hogCallable__") == "async":
-                    raise HogVMException("Async functions are not supported")
-
-                else:
-                    raise HogVMException("Invalid callable")
-
             case Operation.TRY:
                 throw_stack.append(
                     ThrowFrame(
@@ -646,28 +629,14 @@ def execute_bytecode(
                     raise HogVMException("Invalid operation POP_TRY: no try block to pop")
             case Operation.THROW:
                 exception = pop_stack()
-                if not is_hog_error(exception):
-                    raise HogVMException("Can not throw: value is not of type Error")
-                if throw_stack:
-                    last_throw = throw_stack.pop()
-                    call_stack_len, stack_len, catch_ip = (
-                        last_throw.call_stack_len,
-                        last_throw.stack_len,
-                        last_throw.catch_ip,
-                    )
-                    stack_keep_first_elements(stack_len)
-                    call_stack = call_stack[0:call_stack_len]
-                    push_stack(exception)
-                    frame = call_stack[-1]
-                    set_chunk_bytecode()
-                    frame.ip = catch_ip
-                    continue
-                else:
-                    raise UncaughtHogVMException(
-                        type=exception.get("type"),
-                        message=exception.get("message"),
-                        payload=exception.get("payload"),
-                    )
+                last_throw = catch_exception(exception, throw_stack)
+                stack_keep_first_elements(last_throw.stack_len)
+                call_stack = call_stack[0 : last_throw.call_stack_len]
+                push_stack(exception)
+                frame = call_stack[-1]
+                set_chunk_bytecode()
+                frame.ip = last_throw.catch_ip
+                continue
             case _:
                 raise HogVMException(
                     f'Unexpected node while running bytecode in chunk "{frame.chunk}": {chunk_bytecode[frame.ip]}'
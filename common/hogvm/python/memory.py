@@ -0,0 +1,172 @@
+from typing import Any, Optional
+
+from common.hogvm.python.utils import (
+    COST_PER_UNIT,
+    HogVMException,
+    HogVMMemoryExceededException,
+    calculate_cost,
+    set_nested_value,
+)
+
+MAX_MEMORY = 64 * 1024 * 1024  # 64 MB
+
+# Generations of known costs that stay valid until the value itself is mutated, or that are never valid
+_FLAT = -1
+_STALE = -2
+
+
+def _is_flat(value: Any) -> bool:
+    """Whether no other container is nested in the value, so that mutating other containers doesn't change its cost."""
+    if isinstance(value, dict):
+        return not any(isinstance(item, dict | list | tuple) for item in (*value.keys(), *value.values()))
+    if isinstance(value, list | tuple):
+        return not any(isinstance(item, dict | list | tuple) for item in value)
+    return True
+
+
+class ValueStack:
+    """
+    The value stack of a HogVM execution, and the memory its values are accounted for.
+
+    Each value is accounted for with its `calculate_cost` at the time it was put on the stack, like before. On top of
+    that, each slot also knows the current cost of its value, so that pushing it again (e.g. reading a local variable
+    in a loop) doesn't need to walk the whole value again. Values are only mutated in place by SET_PROPERTY and by host
+    functions. SET_PROPERTY updates the known cost of the slots holding the mutated container, and makes the known
+    costs of others that may have it nested somewhere stale. Host functions make all known costs stale.
+    """
+
+    __slots__ = ("values", "costs", "known", "generation", "mem_used", "max_mem_used")
+
+    def __init__(self):
+        self.values: list[Any] = []
+        # What each value is accounted for
+        self.costs: list[int] = []
+        # Current cost of each value, and the generation it's valid for (or `_FLAT`/`_STALE`)
+        self.known: list[tuple[int, int]] = []
+        self.generation = 0
+        self.mem_used = 0
+        self.max_mem_used = 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _measure(self, value: Any) -> tuple[int, int]:
+        return calculate_cost(value), _FLAT if _is_flat(value) else self.generation
+
+    def _known_cost(self, index: int) -> Optional[int]:
+        cost, generation = self.known[index]
+        return cost if generation == _FLAT or generation == self.generation else None
+
+    def _append(self, value: Any, cost: int, generation: int) -> None:
+        self.values.append(value)
+        self.costs.append(cost)
+        self.known.append((cost, generation))
+        self.mem_used += cost
+        self.max_mem_used = max(self.mem_used, self.max_mem_used)
+        if self.mem_used > MAX_MEMORY:
+            raise HogVMMemoryExceededException(memory_limit=MAX_MEMORY, attempted_memory=self.mem_used)
+
+    def push(self, value: Any) -> None:
+        cost, generation = self._measure(value)
+        self._append(value, cost, generation)
+
+    def push_copy(self, index: int) -> None:
+        """Push the value of another slot again."""
+        value = self.values[index]
+        cost = self._known_cost(index)
+        if cost is None:
+            cost, generation = self._measure(value)
+            self.known[index] = (cost, generation)
+        else:
+            generation = self.known[index][1]
+        self._append(value, cost, generation)
+
+    def pop(self) -> Any:
+        if not self.values:
+            raise HogVMException("Stack underflow")
+        self.mem_used -= self.costs.pop()
+        self.known.pop()
+        return self.values.pop()
+
+    def pop_into(self, index: int) -> None:
+        """Pop the top value, and put it into the slot at `index` (relative to the stack without it)."""
+        if not self.values:
+            raise HogVMException("Stack underflow")
+        cost = self._known_cost(-1)
+        generation = self.known[-1][1]
+        value = self.pop()
+        if cost is None:
+            cost, generation = self._measure(value)
+        self.values[index] = value
+        last_cost = self.costs[index]
+        self.costs[index] = cost
+        self.known[index] = (cost, generation)
+        self.mem_used += cost - last_cost
+        self.max_mem_used = max(self.mem_used, self.max_mem_used)
+
+    def replace(self, index: int, value: Any) -> None:
+        """Replace the value in a slot, without changing what it's accounted for."""
+        self.values[index] = value
+        self.known[index] = (self.costs[index], _STALE)
+
+    def truncate(self, count: int) -> list[Any]:
+        """Remove all but the first `count` values, returning the removed ones."""
+        removed = self.values[count:]
+        del self.values[count:]
+        self.mem_used -= sum(self.costs[count:])
+        del self.costs[count:]
+        del self.known[count:]
+        return removed
+
+    def push_container(self, count: int, build: type[dict] | type[list] | type[tuple]) -> None:
+        """Replace the top `count` values with a dict (of alternating keys and values), list or tuple of them."""
+        start = max(len(self.values) - count, 0)
+        known_costs = [self._known_cost(index) for index in range(start, len(self.values))]
+        elems = self.truncate(start)
+
+        container: Any
+        if build is dict:
+            container = {elems[i]: elems[i + 1] for i in range(0, len(elems), 2)}
+        else:
+            container = elems if build is list else tuple(elems)
+        # Nothing can refer to the new container yet, so its cost is that of its elements (unless keys were repeated)
+        if None in known_costs or (build is dict and len(container) * 2 != len(elems)):
+            self.push(container)
+        else:
+            cost = COST_PER_UNIT + sum(cost or 0 for cost in known_costs)
+            self._append(container, cost, _FLAT if _is_flat(container) else self.generation)
+
+    def set_property(self, obj: Any, field: Any, value: Any) -> None:
+        delta: Optional[int] = None
+        # The cost of the changed item as part of the container, like `calculate_cost(obj)` would count it
+        marked = {id(obj)}
+        if isinstance(obj, dict):
+            if field in obj:
+                delta = calculate_cost(value, marked) - calculate_cost(obj[field], marked)
+            else:
+                delta = calculate_cost(field, marked) + calculate_cost(value, marked)
+        elif isinstance(obj, list) and isinstance(field, int) and 0 < field <= len(obj):
+            delta = calculate_cost(value, marked) - calculate_cost(obj[field - 1], marked)
+
+        set_nested_value(obj, [field], value)
+
+        generation = self.generation
+        self.generation += 1
+        if obj is None:
+            return
+        value_is_flat = not isinstance(value, dict | list | tuple)
+        for index, slot_value in enumerate(self.values):
+            if slot_value is obj:
+                cost, slot_generation = self.known[index]
+                if delta is None or (slot_generation != _FLAT and slot_generation != generation):
+                    self.known[index] = (cost, _STALE)
+                elif slot_generation == _FLAT and value_is_flat:
+                    self.known[index] = (cost + delta, _FLAT)
+                else:
+                    self.known[index] = (cost + delta, self.generation)
+
+    def invalidate(self) -> None:
+        """Forget all known costs, e.g. after calling a function that may have mutated anything."""
+        self.generation += 1
+        for index, (cost, _) in enumerate(self.known):
+            self.known[index] = (cost, _STALE)
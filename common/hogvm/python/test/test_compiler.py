@@ -0,0 +1,76 @@
+import json
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from common.hogvm.python.compiler import compile_chunk, execute_compiled_bytecode
+from common.hogvm.python.execute import execute_bytecode
+from common.hogvm.python.operation import (
+    Operation as op,
+    HOGQL_BYTECODE_IDENTIFIER as _H,
+    HOGQL_BYTECODE_VERSION as VERSION,
+)
+from common.hogvm.python.utils import HogVMException, UncaughtHogVMException
+
+SNAPSHOTS_DIR = Path(__file__).parents[2] / "__tests__" / "__snapshots__"
+# Only run on Node.js by common/hogvm/test.sh
+NODEJS_ONLY_PROGRAMS = {"sql"}
+
+
+@pytest.mark.parametrize(
+    "program", sorted(path.stem for path in SNAPSHOTS_DIR.glob("*.hoge") if path.stem not in NODEJS_ONLY_PROGRAMS)
+)
+def test_engines_match_test_programs(program):
+    bytecode = json.loads((SNAPSHOTS_DIR / f"{program}.hoge").read_text())
+    expected_stdout = (SNAPSHOTS_DIR / f"{program}.stdout").read_text()
+
+    interpreted = execute_bytecode(bytecode, timeout=timedelta(seconds=60))
+    compiled = execute_compiled_bytecode(bytecode, timeout=timedelta(seconds=60))
+
+    assert "\n".join(compiled.stdout) == "\n".join(interpreted.stdout) == expected_stdout.rstrip("\n")
+    assert compiled.result == interpreted.result
+
+
+class TestCompiledBytecodeExecute:
+    def test_errors_match_interpreter(self):
+        programs = [
+            [_H, VERSION, op.TRUE, op.CALL_GLOBAL, "notAFunction", 1],
+            [_H, VERSION, op.CALL_GLOBAL, "replaceOne", 1],
+            [_H, VERSION, op.TRUE, op.TRUE, op.NOT],
+            [_H, VERSION, op.INTEGER],
+            [_H, VERSION, "notAnOperation"],
+        ]
+        for program in programs:
+            with pytest.raises(HogVMException) as interpreted:
+                execute_bytecode(program, {})
+            with pytest.raises(HogVMException) as compiled:
+                execute_compiled_bytecode(program, {})
+            assert str(compiled.value) == str(interpreted.value)
+
+    def test_uncaught_errors(self):
+        program = [_H, VERSION, op.STRING, "Oops", op.STRING, "Error", op.CALL_GLOBAL, "Error", 2, op.THROW]
+
+        with pytest.raises(UncaughtHogVMException) as e:
+            execute_compiled_bytecode(program, {})
+        assert str(e.value) == "Error('Oops')"
+
+    def test_globals_and_functions(self):
+        program = [_H, VERSION, op.STRING, "b", op.STRING, "a", op.GET_GLOBAL, 2, op.CALL_GLOBAL, "double", 1]
+        response = execute_compiled_bytecode(program, {"a": {"b": 21}}, functions={"double": lambda x: x * 2})
+
+        assert response.result == 42
+
+    def test_compiled_chunks_are_reused(self):
+        bytecode = [_H, VERSION, op.INTEGER, 1, op.INTEGER, 2, op.PLUS]
+
+        assert compile_chunk(bytecode) is compile_chunk(list(bytecode))
+        assert execute_compiled_bytecode(bytecode).result == 3
+        assert execute_compiled_bytecode(bytecode).result == 3
+
+    def test_compiled_chunks_keep_constant_types(self):
+        # `1`, `1.0` and `True` are equal, so they must not share a compiled chunk
+        for value in (1, 1.0, True):
+            result = execute_compiled_bytecode([_H, VERSION, op.FLOAT, value]).result
+
+            assert result == value and type(result) is type(value)
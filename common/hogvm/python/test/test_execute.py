@@ -3,13 +3,14 @@ from typing import Any, Optional
 from collections.abc import Callable
 
 
-from common.hogvm.python.execute import execute_bytecode, get_nested_value
+from common.hogvm.python.execute import execute_bytecode, get_nested_value, validate_bytecode
+from common.hogvm.python.memory import ValueStack
 from common.hogvm.python.operation import (
     Operation as op,
     HOGQL_BYTECODE_IDENTIFIER as _H,
     HOGQL_BYTECODE_VERSION as VERSION,
 )
-from common.hogvm.python.utils import UncaughtHogVMException
+from common.hogvm.python.utils import UncaughtHogVMException, calculate_cost
 from posthog.hogql.compiler.bytecode import create_bytecode
 from posthog.hogql.parser import parse_expr, parse_program
 
@@ -185,6 +186,13 @@ class TestBytecodeExecute:
         else:
             raise AssertionError("Expected Exception not raised")
 
+    def test_validate_bytecode(self):
+        assert validate_bytecode(["_H", 1, 33, 1, 33, 2, 6]) == (True, None)
+
+        valid, message = validate_bytecode(["_H", 1, 32, "x", 2, "throwError", 1])
+        assert not valid
+        assert message is not None and message.startswith("Function execution error: ")
+
     def test_memory_limits_2(self):
         bytecode = [
             "_h",
@@ -272,6 +280,24 @@ class TestBytecodeExecute:
         else:
             raise AssertionError("Expected Exception not raised")
 
+    def test_value_stack_costs_follow_mutations(self):
+        stack = ValueStack()
+        stack.push({"a": "b"})
+        stack.push({"nested": stack.values[0]})
+        stack.push_copy(0)
+        stack.set_property(stack.pop(), "c", "d" * 100)
+
+        stack.push_copy(0)
+        stack.push_copy(1)
+        assert stack.costs[-2] == calculate_cost(stack.values[0])
+        assert stack.costs[-1] == calculate_cost(stack.values[1])
+
+        stack.push("e")
+        stack.push_copy(0)
+        stack.push_container(2, list)
+        assert stack.costs[-1] == calculate_cost(stack.values[-1])
+        assert stack.mem_used == sum(stack.costs)
+
     def test_functions(self):
         def stringify(*args):
             if args[0] == 1:
@@ -0,0 +1,57 @@
+# isort: skip_file
+# Needs to be first to set up django environment
+from . import helpers  # noqa: F401
+from posthog.hogql.context import HogQLContext
+from posthog.hogql.database.database import create_hogql_database
+from posthog.hogql.printer import print_ast
+from posthog.hogql.visitor import TraversingVisitor, clone_expr
+from posthog.hogql_queries.insights.funnels.funnels_query_runner import FunnelsQueryRunner
+from posthog.models import Organization, Team
+from posthog.schema import (
+    BreakdownFilter,
+    DateRange,
+    EventPropertyFilter,
+    EventsNode,
+    FunnelsQuery,
+    PropertyOperator,
+)
+
+FUNNEL_QUERY = FunnelsQuery(
+    series=[
+        EventsNode(event="$pageview"),
+        EventsNode(
+            event="$autocapture",
+            properties=[EventPropertyFilter(key="$browser", value="Chrome", operator=PropertyOperator.EXACT)],
+        ),
+        EventsNode(event="$pageview"),
+        EventsNode(event="$pageleave"),
+    ],
+    breakdownFilter=BreakdownFilter(breakdown="$browser"),
+    dateRange=DateRange(date_from="2021-01-01", date_to="2021-10-01"),
+)
+
+
+class HogQLSuite:
+    """CPU-only benchmarks of building and printing HogQL queries, these don't run anything against ClickHouse."""
+
+    version = "v001"
+
+    def setup(self):
+        # :TRICKY: Data in benchmark servers has ID=2
+        team = Team.objects.filter(id=2).first()
+        if team is None:
+            organization = Organization.objects.create()
+            team = Team.objects.create(id=2, organization=organization, name="The Bakery")
+        self.team = team
+        self.database = create_hogql_database(team=team)
+        self.funnel_ast = FunnelsQueryRunner(query=FUNNEL_QUERY, team=team).to_query()
+
+    def time_traverse_funnel(self):
+        TraversingVisitor().visit(self.funnel_ast)
+
+    def time_clone_funnel(self):
+        clone_expr(self.funnel_ast)
+
+    def time_resolve_and_print_funnel(self):
+        context = HogQLContext(team_id=self.team.pk, team=self.team, database=self.database, enable_select_queries=True)
+        print_ast(clone_expr(self.funnel_ast), context=context, dialect="clickhouse")
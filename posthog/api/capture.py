@@ -6,7 +6,7 @@ from random import random
 import sentry_sdk
 import structlog
 import time
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
 from datetime import datetime, timedelta, UTC
 from dateutil import parser
 from django.conf import settings
@@ -29,7 +29,12 @@ from posthog.api.csp import process_csp_report
 from posthog.cache_utils import cache_for
 from posthog.exceptions import generate_exception_response
 from posthog.exceptions_capture import capture_exception
-from posthog.kafka_client.client import KafkaProducer, session_recording_kafka_producer
+from posthog.kafka_client.client import (
+    KafkaProducer,
+    ProducerMessage,
+    _KafkaProducer,
+    session_recording_kafka_producer,
+)
 from posthog.kafka_client.topics import (
     KAFKA_EVENTS_PLUGIN_INGESTION_HISTORICAL,
     KAFKA_SESSION_RECORDING_EVENTS,
@@ -131,6 +136,17 @@ REPLAY_MESSAGE_PRODUCTION_TIMER = Histogram(
     "Time taken to produce a set of replay messages",
 )
 
+EVENT_BATCH_PRODUCTION_TIMER = Histogram(
+    "capture_event_batch_production_seconds",
+    "Time taken to serialize the events of a request and hand them to the Kafka producer at once",
+)
+
+EVENT_BATCH_PRODUCTION_FAILURES_COUNTER = Counter(
+    "capture_event_batch_production_failures_total",
+    "Requests whose events failed to be produced at once, per stage (handing them to the producer, or its acks).",
+    labelnames=["stage"],
+)
+
 # This flag tells us to use the cookieless mode, and that we can't use distinct id as the partition key
 COOKIELESS_MODE_FLAG_PROPERTY = "$cookieless_mode"
 
@@ -192,6 +208,7 @@ def build_kafka_event_data(
     sent_at: Optional[datetime],
     event_uuid: UUIDT,
     token: str,
+    data_serializer: Callable[[Any], str] = json.dumps,
 ) -> dict:
     logger.debug("build_kafka_event_data", token=token)
     res = {
@@ -199,7 +216,7 @@ def build_kafka_event_data(
         "distinct_id": safe_clickhouse_string(distinct_id),
         "ip": safe_clickhouse_string(ip) if ip else ip,
         "site_url": safe_clickhouse_string(site_url),
-        "data": json.dumps(data),
+        "data": data_serializer(data),
         "now": now.isoformat(),
         "token": token,
     }
@@ -608,39 +625,49 @@ def get_event(request, csp_report: dict[str, Any] | None = None):
 
     with start_span(op="kafka.produce") as span:
         span.set_tag("event.count", len(processed_events))
+        events_to_capture = []
         for event, event_uuid, distinct_id in processed_events:
             if f"{token}:{distinct_id}" in get_tokens_to_drop():
                 logger.warning("Dropping event", token=token, distinct_id=distinct_id)
                 continue
+            events_to_capture.append((event, event_uuid, distinct_id))
 
-            try:
-                futures.append(
-                    capture_internal(
-                        event,
-                        distinct_id,
-                        ip,
-                        site_url,
-                        now,
-                        sent_at,
-                        event_uuid,
-                        token,
-                        historical=historical,
-                    )
-                )
-            except Exception as exc:
-                capture_exception(exc, {"data": data})
-                statsd.incr("posthog_cloud_raw_endpoint_failure", tags={"endpoint": "capture"})
-                logger.exception("kafka_produce_failure", exc_info=exc)
-                return cors_response(
-                    request,
-                    generate_exception_response(
-                        "capture",
-                        "Unable to store event. Please try again. If you are the owner of this app you can check the logs for further details.",
-                        code="server_error",
-                        type="server_error",
-                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    ),
+        try:
+            if settings.CAPTURE_BATCH_PRODUCE_ENABLED:
+                futures = capture_batch_internal(
+                    events_to_capture, ip, site_url, now, sent_at, token, historical=historical
                 )
+            else:
+                for event, event_uuid, distinct_id in events_to_capture:
+                    futures.append(
+                        capture_internal(
+                            event,
+                            distinct_id,
+                            ip,
+                            site_url,
+                            now,
+                            sent_at,
+                            event_uuid,
+                            token,
+                            historical=historical,
+                        )
+                    )
+        except Exception as exc:
+            if settings.CAPTURE_BATCH_PRODUCE_ENABLED:
+                EVENT_BATCH_PRODUCTION_FAILURES_COUNTER.labels(stage="produce").inc()
+            capture_exception(exc, {"data": data})
+            statsd.incr("posthog_cloud_raw_endpoint_failure", tags={"endpoint": "capture"})
+            logger.exception("kafka_produce_failure", exc_info=exc)
+            return cors_response(
+                request,
+                generate_exception_response(
+                    "capture",
+                    "Unable to store event. Please try again. If you are the owner of this app you can check the logs for further details.",
+                    code="server_error",
+                    type="server_error",
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                ),
+            )
 
     with start_span(op="kafka.wait"):
         span.set_tag("future.count", len(futures))
@@ -649,6 +676,8 @@ def get_event(request, csp_report: dict[str, Any] | None = None):
             try:
                 future.get(timeout=settings.KAFKA_PRODUCE_ACK_TIMEOUT_SECONDS - (time.monotonic() - start_time))
             except KafkaError as exc:
+                if settings.CAPTURE_BATCH_PRODUCE_ENABLED:
+                    EVENT_BATCH_PRODUCTION_FAILURES_COUNTER.labels(stage="ack").inc()
                 # TODO: distinguish between retriable errors and non-retriable
                 # errors, and set Retry-After header accordingly.
                 # TODO: return 400 error for non-retriable errors that require the
@@ -1001,6 +1030,100 @@ def capture_internal(
     )
 
 
+def _serialize_event_data(data: Any) -> str:
+    return _KafkaProducer.orjson_serializer(data).decode("utf-8")
+
+
+def capture_batch_internal(
+    events: list[tuple[dict[str, Any], UUIDT, str]],
+    ip,
+    site_url,
+    now,
+    sent_at,
+    token,
+    historical=False,
+    extra_headers: list[tuple[str, str]] | None = None,
+) -> list[FutureRecordMetadata]:
+    """
+    Produce the events of a request, as `(event, event_uuid, distinct_id)`, like `capture_internal` does one by one.
+
+    Events are serialized with orjson, and their partition keys and overflow decisions are made in one pass, with what
+    is the same for all events (overflowing sessions, headers, keys already known to be randomly partitioned) looked up
+    once. The messages are then handed to the producer of their topic at once.
+    """
+    encoded_headers = [("token", token.encode("utf-8"))] + [
+        (name, value.encode("utf-8")) for name, value in extra_headers or []
+    ]
+    overflowing_sessions: Optional[set[str]] = None
+    randomly_partitioned_keys: set[str] = set()
+
+    messages: list[ProducerMessage] = []
+    session_recording_messages: list[ProducerMessage] = []
+
+    with EVENT_BATCH_PRODUCTION_TIMER.time():
+        for event, event_uuid, distinct_id in events:
+            headers = [encoded_headers[0], ("distinct_id", distinct_id.encode("utf-8")), *encoded_headers[1:]]
+            event_name = event["event"]
+            parsed_event = build_kafka_event_data(
+                distinct_id=distinct_id,
+                ip=ip,
+                site_url=site_url,
+                data=event,
+                now=now,
+                sent_at=sent_at,
+                event_uuid=event_uuid,
+                token=token,
+                data_serializer=_serialize_event_data,
+            )
+
+            if event_name in SESSION_RECORDING_EVENT_NAMES:
+                partition_key: Optional[str] = event["properties"]["$session_id"]
+                overflowing = False
+                if token in settings.REPLAY_OVERFLOW_FORCED_TOKENS:
+                    overflowing = True
+                elif settings.REPLAY_OVERFLOW_SESSIONS_ENABLED:
+                    if overflowing_sessions is None:
+                        overflowing_sessions = _list_overflowing_keys(InputType.REPLAY)
+                    overflowing = partition_key in overflowing_sessions
+                topic = _kafka_topic(event_name, overflowing=overflowing)
+            else:
+                # Same partitioning as `capture_internal`
+                candidate_partition_key = f"{token}:{distinct_id}"
+                if event.get("properties", {}).get(COOKIELESS_MODE_FLAG_PROPERTY):
+                    candidate_partition_key = f"{token}:{ip}"
+
+                partition_key = candidate_partition_key
+                if not historical and settings.CAPTURE_ALLOW_RANDOM_PARTITIONING:
+                    # A key over capacity won't have any left for the rest of the request, no need to check it again
+                    if (
+                        distinct_id.lower() in LIKELY_ANONYMOUS_IDS
+                        or candidate_partition_key in randomly_partitioned_keys
+                    ):
+                        partition_key = None
+                    elif is_randomly_partitioned(candidate_partition_key):
+                        randomly_partitioned_keys.add(candidate_partition_key)
+                        partition_key = None
+                topic = _kafka_topic(event_name, historical=historical)
+
+            message = ProducerMessage(
+                topic=topic,
+                value=_KafkaProducer.orjson_serializer(parsed_event),
+                key=partition_key.encode("utf-8") if partition_key is not None else None,
+                headers=headers,
+            )
+            if event_name in SESSION_RECORDING_DEDICATED_KAFKA_EVENTS:
+                session_recording_messages.append(message)
+            else:
+                messages.append(message)
+
+        futures = KafkaProducer().produce_many(messages) if messages else []
+        if session_recording_messages:
+            futures += session_recording_kafka_producer().produce_many(session_recording_messages)
+
+    statsd.incr("posthog_cloud_plugin_server_ingestion", len(messages) + len(session_recording_messages))
+    return futures
+
+
 def is_randomly_partitioned(candidate_partition_key: str) -> bool:
     """Check whether event with given partition key is to be randomly partitioned.
 
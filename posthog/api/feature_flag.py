@@ -7,6 +7,8 @@ from datetime import datetime
 from django.db import transaction
 from django.db.models import QuerySet, Q, deletion, Prefetch
 from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
 from drf_spectacular.utils import OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 from rest_framework import (
@@ -34,7 +36,7 @@ from posthog.api.tagged_item import TaggedItemSerializerMixin, TaggedItemViewSet
 from posthog.api.dashboards.dashboard import Dashboard
 from posthog.api.utils import ClassicBehaviorBooleanFieldSerializer
 from posthog.auth import PersonalAPIKeyAuthentication, TemporaryTokenAuthentication, ProjectSecretAPIKeyAuthentication
-from posthog.constants import FlagRequestType, SURVEY_TARGETING_FLAG_PREFIX
+from posthog.constants import SURVEY_TARGETING_FLAG_PREFIX, FlagRequestType
 from posthog.event_usage import report_user_action
 from posthog.exceptions import Conflict
 from posthog.helpers.dashboard_templates import (
@@ -54,18 +56,19 @@ from posthog.models.activity_logging.activity_log import (
 )
 from posthog.models.activity_logging.activity_page import activity_page_response
 from posthog.models.activity_logging.model_activity import ImpersonatedContext
-from posthog.models.cohort import Cohort, CohortOrEmpty
+from posthog.models.cohort import Cohort
 from posthog.models.cohort.util import get_dependent_cohorts
 from posthog.models.feature_flag import (
     FeatureFlagDashboards,
     can_user_edit_feature_flag,
     get_all_feature_flags,
+    get_all_feature_flags_for_distinct_ids,
     get_user_blast_radius,
 )
 from posthog.models.feature_flag.flag_analytics import increment_request_count
 from posthog.models.feature_flag.flag_matching import check_flag_evaluation_query_is_ok
+from posthog.models.feature_flag.local_evaluation import LocalEvaluationError, get_local_evaluation_payload
 from posthog.models.surveys.survey import Survey
-from posthog.models.group_type_mapping import GroupTypeMapping
 from posthog.models.property import Property
 from posthog.models.feature_flag.flag_status import FeatureFlagStatusChecker, FeatureFlagStatus
 from posthog.permissions import ProjectSecretAPITokenPermission
@@ -77,15 +80,10 @@ from ee.models.rbac.organization_resource_access import OrganizationResourceAcce
 from django.dispatch import receiver
 from posthog.models.signals import model_activity_signal
 
-DATABASE_FOR_LOCAL_EVALUATION = (
-    "default"
-    if ("local_evaluation" not in settings.READ_REPLICA_OPT_IN or "replica" not in settings.DATABASES)
-    else "replica"
-)
-
 BEHAVIOURAL_COHORT_FOUND_ERROR_CODE = "behavioral_cohort_found"
 
 MAX_PROPERTY_VALUES = 1000
+MAX_BATCH_EVALUATION_DISTINCT_IDS = 1000
 
 
 class FeatureFlagThrottle(BurstRateThrottle):
@@ -947,22 +945,8 @@ class FeatureFlagViewSet(
         start_time = time.time()
 
         try:
-            # Check if team is quota limited for feature flags
-            if settings.DECIDE_FEATURE_FLAG_QUOTA_CHECK:
-                from ee.billing.quota_limiting import QuotaLimitingCaches, QuotaResource, list_limited_team_attributes
-
-                limited_tokens_flags = list_limited_team_attributes(
-                    QuotaResource.FEATURE_FLAG_REQUESTS, QuotaLimitingCaches.QUOTA_LIMITER_CACHE_KEY
-                )
-                if self.team.api_token in limited_tokens_flags:
-                    return Response(
-                        {
-                            "type": "quota_limited",
-                            "detail": "You have exceeded your feature flag request quota",
-                            "code": "payment_required",
-                        },
-                        status=status.HTTP_402_PAYMENT_REQUIRED,
-                    )
+            if self._is_quota_limited():
+                return self._quota_limited_response()
 
             logger.info(
                 "Starting local evaluation",
@@ -972,160 +956,35 @@ class FeatureFlagViewSet(
                 },
             )
 
+            should_send_cohorts = "send_cohorts" in request.GET
             try:
-                feature_flags = FeatureFlag.objects.db_manager(DATABASE_FOR_LOCAL_EVALUATION).filter(
-                    ~Q(is_remote_configuration=True),
-                    team__project_id=self.project_id,
-                    deleted=False,
+                payload = get_local_evaluation_payload(
+                    self.project_id, should_send_cohorts, serializer_context=self.get_serializer_context()
                 )
-                logger.info("Retrieved feature flags", extra={"flags_count": len(feature_flags)})
-            except Exception as e:
-                logger.error("Error fetching feature flags", exc_info=True)
+            except LocalEvaluationError as e:
+                logger.error(e.detail, exc_info=True)
                 capture_exception(e)
-                return Response(
-                    {
-                        "type": "server_error",
-                        "code": "feature_flags_fetch_failed",
-                        "detail": "Error fetching feature flags",
-                    },
-                    status=500,
-                )
-
-            should_send_cohorts = "send_cohorts" in request.GET
-            cohorts = {}
-            seen_cohorts_cache: dict[int, CohortOrEmpty] = {}
-
-            if should_send_cohorts:
-                try:
-                    seen_cohorts_cache = {
-                        cohort.pk: cohort
-                        for cohort in Cohort.objects.db_manager(DATABASE_FOR_LOCAL_EVALUATION).filter(
-                            team__project_id=self.project_id, deleted=False
-                        )
-                    }
-                    logger.info("Prefetched cohorts", extra={"cohorts_count": len(seen_cohorts_cache)})
-                except Exception as e:
-                    logger.error("Error prefetching cohorts", exc_info=True)
-                    capture_exception(e)
-                    return Response(
-                        {
-                            "type": "server_error",
-                            "code": "cohorts_fetch_failed",
-                            "detail": "Error fetching cohorts",
-                        },
-                        status=500,
-                    )
-
-            parsed_flags = []
-            for feature_flag in feature_flags:
-                try:
-                    filters = feature_flag.get_filters()
-                    # transform cohort filters to be evaluated locally, but only if send_cohorts is false
-                    if not should_send_cohorts and (
-                        len(
-                            feature_flag.get_cohort_ids(
-                                using_database=DATABASE_FOR_LOCAL_EVALUATION,
-                                seen_cohorts_cache=seen_cohorts_cache,
-                            )
-                        )
-                        == 1
-                    ):
-                        feature_flag.filters = {
-                            **filters,
-                            "groups": feature_flag.transform_cohort_filters_for_easy_evaluation(
-                                using_database=DATABASE_FOR_LOCAL_EVALUATION,
-                                seen_cohorts_cache=seen_cohorts_cache,
-                            ),
-                        }
-                    else:
-                        feature_flag.filters = filters
-
-                    parsed_flags.append(feature_flag)
-
-                    # when param set, send cohorts, for libraries that can handle evaluating them locally
-                    # irrespective of complexity
-                    if should_send_cohorts:
-                        try:
-                            cohort_ids = feature_flag.get_cohort_ids(
-                                using_database=DATABASE_FOR_LOCAL_EVALUATION,
-                                seen_cohorts_cache=seen_cohorts_cache,
-                            )
-
-                            for id in cohort_ids:
-                                # don't duplicate queries for already added cohorts
-                                if id not in cohorts:
-                                    if id in seen_cohorts_cache:
-                                        cohort = seen_cohorts_cache[id]
-                                    else:
-                                        cohort = (
-                                            Cohort.objects.db_manager(DATABASE_FOR_LOCAL_EVALUATION)
-                                            .filter(id=id, team__project_id=self.project_id, deleted=False)
-                                            .first()
-                                        )
-                                        seen_cohorts_cache[id] = cohort or ""
-
-                                    if cohort and not cohort.is_static:
-                                        try:
-                                            cohorts[str(cohort.pk)] = cohort.properties.to_dict()
-                                        except Exception:
-                                            logger.error(
-                                                "Error processing cohort properties",
-                                                extra={"cohort_id": id},
-                                                exc_info=True,
-                                            )
-                                            continue
-
-                        except Exception:
-                            logger.error(
-                                "Error processing cohorts for feature flag",
-                                extra={"flag_id": feature_flag.pk},
-                                exc_info=True,
-                            )
-                            continue
-
-                except Exception:
-                    logger.error("Error processing feature flag", extra={"flag_id": feature_flag.pk}, exc_info=True)
-                    continue
+                return Response({"type": "server_error", "code": e.code, "detail": e.detail}, status=500)
 
             # Add request for analytics
-            if len(parsed_flags) > 0 and not all(
-                flag.key.startswith(SURVEY_TARGETING_FLAG_PREFIX) for flag in parsed_flags
-            ):
+            if payload.billable:
                 increment_request_count(self.team.pk, 1, FlagRequestType.LOCAL_EVALUATION)
 
             duration = time.time() - start_time
             logger.info(
                 "Local evaluation complete",
-                extra={"duration": duration, "flags_count": len(parsed_flags), "cohorts_count": len(cohorts)},
+                extra={
+                    "duration": duration,
+                    "flags_count": payload.flags_count,
+                    "cohorts_count": payload.cohorts_count,
+                },
             )
 
-            try:
-                response_data = {
-                    "flags": [
-                        MinimalFeatureFlagSerializer(feature_flag, context=self.get_serializer_context()).data
-                        for feature_flag in parsed_flags
-                    ],
-                    "group_type_mapping": {
-                        str(row.group_type_index): row.group_type
-                        for row in GroupTypeMapping.objects.db_manager(DATABASE_FOR_LOCAL_EVALUATION).filter(
-                            project_id=self.project_id
-                        )
-                    },
-                    "cohorts": cohorts,
-                }
-                return Response(response_data)
-
-            except Exception as e:
-                logger.error("Error serializing response", exc_info=True)
-                capture_exception(e)
-                return Response(
-                    {
-                        "type": "server_error",
-                        "code": "serialization_failed",
-                        "detail": "Error preparing response",
-                    },
-                    status=500,
-                )
+            # SDKs poll this, so let them skip downloading and parsing the payload when it hasn't changed
+            if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+            if "*" in if_none_match or payload.etag in [etag.removeprefix("W/") for etag in if_none_match]:
+                return HttpResponseNotModified(headers={"ETag": payload.etag})
+            return HttpResponse(payload.content, content_type="application/json", headers={"ETag": payload.etag})
 
         except Exception as e:
             duration = time.time() - start_time
@@ -1173,6 +1032,65 @@ class FeatureFlagViewSet(
 
         return Response(flags_with_evaluation_reasons)
 
+    def _is_quota_limited(self) -> bool:
+        """Whether the team is quota limited for feature flag requests."""
+        if not settings.DECIDE_FEATURE_FLAG_QUOTA_CHECK:
+            return False
+
+        from ee.billing.quota_limiting import QuotaLimitingCaches, QuotaResource, list_limited_team_attributes
+
+        limited_tokens_flags = list_limited_team_attributes(
+            QuotaResource.FEATURE_FLAG_REQUESTS, QuotaLimitingCaches.QUOTA_LIMITER_CACHE_KEY
+        )
+        return self.team.api_token in limited_tokens_flags
+
+    def _quota_limited_response(self) -> Response:
+        return Response(
+            {
+                "type": "quota_limited",
+                "detail": "You have exceeded your feature flag request quota",
+                "code": "payment_required",
+            },
+            status=status.HTTP_402_PAYMENT_REQUIRED,
+        )
+
+    @action(methods=["POST"], detail=False, required_scopes=["feature_flag:read"])
+    def batch_evaluation(self, request: request.Request, **kwargs):
+        distinct_ids = request.data.get("distinct_ids")
+        if not isinstance(distinct_ids, list) or not all(isinstance(distinct_id, str) for distinct_id in distinct_ids):
+            raise exceptions.ValidationError(detail="distinct_ids must be a list of strings")
+        if len(distinct_ids) > MAX_BATCH_EVALUATION_DISTINCT_IDS:
+            raise exceptions.ValidationError(
+                detail=f"Flags can be evaluated for at most {MAX_BATCH_EVALUATION_DISTINCT_IDS} distinct_ids at once"
+            )
+
+        groups = request.data.get("groups") or {}
+        person_properties = request.data.get("person_properties") or {}
+        group_properties = request.data.get("group_properties") or {}
+        if not all(isinstance(value, dict) for value in (groups, person_properties, group_properties)):
+            raise exceptions.ValidationError(detail="groups, person_properties and group_properties must be objects")
+
+        if self._is_quota_limited():
+            return self._quota_limited_response()
+
+        flags, errors = get_all_feature_flags_for_distinct_ids(
+            self.team,
+            distinct_ids,
+            groups,
+            property_value_overrides=person_properties,
+            group_property_value_overrides=group_properties,
+        )
+
+        # Billed as one /decide request per distinct_id, unless only survey targeting flags were evaluated
+        if any(
+            not flag_key.startswith(SURVEY_TARGETING_FLAG_PREFIX)
+            for distinct_id_flags in flags.values()
+            for flag_key in distinct_id_flags
+        ):
+            increment_request_count(self.team.pk, len(distinct_ids))
+
+        return Response({"flags": flags, "errors_while_computing_flags": errors})
+
     @action(methods=["POST"], detail=False)
     def user_blast_radius(self, request: request.Request, **kwargs):
         if "condition" not in request.data:
@@ -1156,6 +1156,45 @@ class TestCapture(BaseTest):
             },
         )
 
+    @override_settings(CAPTURE_BATCH_PRODUCE_ENABLED=True, CAPTURE_ALLOW_RANDOM_PARTITIONING=True)
+    @patch("posthog.kafka_client.client._KafkaProducer.produce_many", return_value=[])
+    @patch("posthog.kafka_client.client._KafkaProducer.produce")
+    def test_batch_produced_at_once(self, kafka_produce, kafka_produce_many):
+        events = [
+            {"type": "capture", "event": "user signed up", "distinct_id": "2", "properties": {"big": 2**70}},
+            {"type": "capture", "event": "user logged in", "distinct_id": "anonymous"},
+        ]
+        response = self.client.post(
+            "/batch/",
+            data={"api_key": self.team.api_token, "batch": events},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(kafka_produce.call_count, 0)
+        self.assertEqual(kafka_produce_many.call_count, 1)
+        messages = kafka_produce_many.call_args[0][0]
+        self.assertEqual(
+            [(message.topic, message.key, message.headers) for message in messages],
+            [
+                (
+                    KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC,
+                    f"{self.team.api_token}:2".encode(),
+                    [("token", self.team.api_token.encode()), ("distinct_id", b"2")],
+                ),
+                (
+                    KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC,
+                    None,
+                    [("token", self.team.api_token.encode()), ("distinct_id", b"anonymous")],
+                ),
+            ],
+        )
+        for message, event in zip(messages, events):
+            value = json.loads(message.value)
+            self.assertEqual(value["distinct_id"], event["distinct_id"])
+            self.assertEqual(value["token"], self.team.api_token)
+            self.assertEqual(json.loads(value["data"]), {"properties": {}, **event})
+
     @patch("posthog.kafka_client.client._KafkaProducer.produce")
     def test_batch_with_invalid_event(self, kafka_produce):
         data = [
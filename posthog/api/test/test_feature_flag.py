@@ -6,7 +6,7 @@ from unittest.mock import call, patch
 from django.core.cache import cache
 from django.db import connection
 from django.db.utils import OperationalError
-from django.test import TransactionTestCase
+from django.test import TransactionTestCase, override_settings
 from django.test.client import RequestFactory
 from django.utils.timezone import now
 from freezegun.api import freeze_time
@@ -16,7 +16,7 @@ from rest_framework import status
 from posthog import redis
 from posthog.api.cohort import get_cohort_actors_for_feature_flag
 from posthog.api.feature_flag import FeatureFlagSerializer
-from posthog.constants import AvailableFeature
+from posthog.constants import SURVEY_TARGETING_FLAG_PREFIX, AvailableFeature
 from posthog.models import Experiment, FeatureFlag, GroupTypeMapping, User
 from posthog.models.cohort import Cohort
 from posthog.models.dashboard import Dashboard
@@ -27,6 +27,7 @@ from posthog.models.feature_flag import (
     get_feature_flags_for_team_in_cache,
 )
 from posthog.models.feature_flag.feature_flag import FeatureFlagHashKeyOverride
+from posthog.models.feature_flag import local_evaluation
 from posthog.models.group.util import create_group
 from posthog.models.organization import Organization
 from posthog.models.person import Person
@@ -2993,6 +2994,117 @@ class TestFeatureFlag(APIBaseTest, ClickhouseTestMixin):
 
         self.assertEqual(response_data["group_type_mapping"], {"0": "organization", "1": "company"})
 
+    def test_local_evaluation_etag(self):
+        FeatureFlag.objects.all().delete()
+        feature_flag = FeatureFlag.objects.create(
+            team=self.team, key="alpha-feature", created_by=self.user, filters={"groups": [{"rollout_percentage": 20}]}
+        )
+        secret_api_key = generate_random_token_secret()
+        self.team.secret_api_token = secret_api_key
+        self.team.save()
+        self.client.logout()
+
+        response = self.client.get("/api/feature_flag/local_evaluation", HTTP_AUTHORIZATION=f"Bearer {secret_api_key}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response.headers["ETag"]
+
+        response = self.client.get(
+            "/api/feature_flag/local_evaluation",
+            HTTP_AUTHORIZATION=f"Bearer {secret_api_key}",
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        feature_flag.filters = {"groups": [{"rollout_percentage": 40}]}
+        feature_flag.save()
+
+        response = self.client.get(
+            "/api/feature_flag/local_evaluation",
+            HTTP_AUTHORIZATION=f"Bearer {secret_api_key}",
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.json()["flags"][0]["filters"], {"groups": [{"rollout_percentage": 40}]})
+
+    @override_settings(LOCAL_EVALUATION_CACHE_TTL_SECONDS=60)
+    def test_local_evaluation_payload_is_cached_until_flags_change(self):
+        FeatureFlag.objects.all().delete()
+        feature_flag = FeatureFlag.objects.create(
+            team=self.team, key="alpha-feature", created_by=self.user, filters={"groups": [{"rollout_percentage": 20}]}
+        )
+        secret_api_key = generate_random_token_secret()
+        self.team.secret_api_token = secret_api_key
+        self.team.save()
+        self.client.logout()
+
+        response = self.client.get("/api/feature_flag/local_evaluation", HTTP_AUTHORIZATION=f"Bearer {secret_api_key}")
+        self.assertEqual(response.json()["flags"][0]["filters"], {"groups": [{"rollout_percentage": 20}]})
+
+        # Updates that bypass Django signals aren't picked up until the payload expires
+        FeatureFlag.objects.filter(pk=feature_flag.pk).update(filters={"groups": [{"rollout_percentage": 30}]})
+        response = self.client.get("/api/feature_flag/local_evaluation", HTTP_AUTHORIZATION=f"Bearer {secret_api_key}")
+        self.assertEqual(response.json()["flags"][0]["filters"], {"groups": [{"rollout_percentage": 20}]})
+
+        feature_flag.filters = {"groups": [{"rollout_percentage": 40}]}
+        with self.captureOnCommitCallbacks(execute=True):
+            feature_flag.save()
+
+        response = self.client.get("/api/feature_flag/local_evaluation", HTTP_AUTHORIZATION=f"Bearer {secret_api_key}")
+        self.assertEqual(response.json()["flags"][0]["filters"], {"groups": [{"rollout_percentage": 40}]})
+
+    @override_settings(LOCAL_EVALUATION_CACHE_TTL_SECONDS=60)
+    def test_local_evaluation_payload_built_while_flags_change_is_not_cached(self):
+        FeatureFlag.objects.all().delete()
+        feature_flag = FeatureFlag.objects.create(
+            team=self.team, key="alpha-feature", created_by=self.user, filters={"groups": [{"rollout_percentage": 20}]}
+        )
+        secret_api_key = generate_random_token_secret()
+        self.team.secret_api_token = secret_api_key
+        self.team.save()
+        self.client.logout()
+
+        build_local_evaluation_response = local_evaluation.build_local_evaluation_response
+        changed = False
+
+        def build_while_flag_changes(*args, **kwargs):
+            nonlocal changed
+            response = build_local_evaluation_response(*args, **kwargs)
+            if not changed:
+                # The poll has read the flags, when the flag is changed (and the payload rebuilt) before it's stored
+                changed = True
+                feature_flag.filters = {"groups": [{"rollout_percentage": 40}]}
+                with self.captureOnCommitCallbacks(execute=True):
+                    feature_flag.save()
+            return response
+
+        with patch.object(local_evaluation, "build_local_evaluation_response", side_effect=build_while_flag_changes):
+            response = self.client.get(
+                "/api/feature_flag/local_evaluation", HTTP_AUTHORIZATION=f"Bearer {secret_api_key}"
+            )
+        self.assertEqual(response.json()["flags"][0]["filters"], {"groups": [{"rollout_percentage": 20}]})
+
+        response = self.client.get("/api/feature_flag/local_evaluation", HTTP_AUTHORIZATION=f"Bearer {secret_api_key}")
+        self.assertEqual(response.json()["flags"][0]["filters"], {"groups": [{"rollout_percentage": 40}]})
+
+    def test_local_evaluation_reports_which_step_failed(self):
+        secret_api_key = generate_random_token_secret()
+        self.team.secret_api_token = secret_api_key
+        self.team.save()
+        self.client.logout()
+
+        with patch("posthog.models.feature_flag.local_evaluation.Cohort.objects.db_manager", side_effect=Exception):
+            response = self.client.get(
+                "/api/feature_flag/local_evaluation?send_cohorts", HTTP_AUTHORIZATION=f"Bearer {secret_api_key}"
+            )
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(
+            response.json(),
+            {"type": "server_error", "code": "cohorts_fetch_failed", "detail": "Error fetching cohorts"},
+        )
+
     @patch("posthog.api.feature_flag.report_user_action")
     def test_local_evaluation_with_secret_api_key(self, mock_capture):
         FeatureFlag.objects.all().delete()
@@ -4372,6 +4484,103 @@ class TestFeatureFlag(APIBaseTest, ClickhouseTestMixin):
             },
         )
 
+    def test_batch_evaluation(self):
+        FeatureFlag.objects.all().delete()
+        GroupTypeMapping.objects.create(
+            team=self.team, project_id=self.team.project_id, group_type="organization", group_type_index=0
+        )
+        Person.objects.create(team_id=self.team.pk, distinct_ids=["1", "2"], properties={"beta-property": "beta-value"})
+        FeatureFlag.objects.create(
+            key="beta-feature",
+            team=self.team,
+            filters={"groups": [{"properties": [{"key": "beta-property", "value": "beta-value"}]}]},
+            created_by=self.user,
+        )
+        FeatureFlag.objects.create(
+            key="plan-feature",
+            team=self.team,
+            filters={"groups": [{"properties": [{"key": "plan", "value": "scale"}]}]},
+            created_by=self.user,
+        )
+        FeatureFlag.objects.create(
+            key="group-feature",
+            team=self.team,
+            filters={"aggregation_group_type_index": 0, "groups": [{"rollout_percentage": 100}]},
+            created_by=self.user,
+        )
+
+        response = self.client.post(
+            f"/api/projects/{self.team.pk}/feature_flags/batch_evaluation",
+            {
+                "distinct_ids": ["1", "2", "3"],
+                "groups": {"organization": "posthog"},
+                "person_properties": {"plan": "scale"},
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {
+                "flags": {
+                    "1": {"beta-feature": True, "plan-feature": True, "group-feature": True},
+                    "2": {"beta-feature": True, "plan-feature": True, "group-feature": True},
+                    "3": {"beta-feature": False, "plan-feature": True, "group-feature": True},
+                },
+                "errors_while_computing_flags": False,
+            },
+        )
+
+    @patch("posthog.api.feature_flag.increment_request_count")
+    def test_batch_evaluation_counts_a_request_per_distinct_id(self, mock_increment_request_count):
+        FeatureFlag.objects.all().delete()
+        FeatureFlag.objects.create(
+            key=f"{SURVEY_TARGETING_FLAG_PREFIX}survey",
+            team=self.team,
+            filters={"groups": [{"rollout_percentage": 100}]},
+            created_by=self.user,
+        )
+        data = {"distinct_ids": ["1", "2", "3"]}
+
+        self.client.post(f"/api/projects/{self.team.pk}/feature_flags/batch_evaluation", data, format="json")
+        mock_increment_request_count.assert_not_called()
+
+        FeatureFlag.objects.create(
+            key="beta-feature", team=self.team, filters={"groups": [{"rollout_percentage": 100}]}, created_by=self.user
+        )
+        self.client.post(f"/api/projects/{self.team.pk}/feature_flags/batch_evaluation", data, format="json")
+        mock_increment_request_count.assert_called_once_with(self.team.pk, 3)
+
+    @patch("posthog.api.feature_flag.settings.DECIDE_FEATURE_FLAG_QUOTA_CHECK", True)
+    @patch("posthog.api.feature_flag.increment_request_count")
+    def test_batch_evaluation_quota_limited(self, mock_increment_request_count):
+        FeatureFlag.objects.create(
+            key="beta-feature", team=self.team, filters={"groups": [{"rollout_percentage": 100}]}, created_by=self.user
+        )
+
+        with patch("ee.billing.quota_limiting.list_limited_team_attributes", return_value=[self.team.api_token]):
+            response = self.client.post(
+                f"/api/projects/{self.team.pk}/feature_flags/batch_evaluation", {"distinct_ids": ["1"]}, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_402_PAYMENT_REQUIRED)
+        self.assertEqual(response.json()["type"], "quota_limited")
+        mock_increment_request_count.assert_not_called()
+
+    def test_batch_evaluation_validation(self):
+        for data in (
+            {},
+            {"distinct_ids": "1"},
+            {"distinct_ids": [1, 2]},
+            {"distinct_ids": [str(index) for index in range(1001)]},
+            {"distinct_ids": ["1"], "groups": ["organization"]},
+        ):
+            response = self.client.post(
+                f"/api/projects/{self.team.pk}/feature_flags/batch_evaluation", data, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+
     def test_validation_person_properties(self):
         person_request = self._create_flag_with_properties(
             "person-flag",
@@ -106,6 +106,10 @@ def on_worker_start(**kwargs) -> None:
     sentry_init()
     start_http_server(int(os.getenv("CELERY_METRICS_PORT", "8001")))
 
+    from posthog.clickhouse.client.connection import Workload, prewarm_ch_pools
+
+    prewarm_ch_pools([Workload.OFFLINE, Workload.ONLINE])
+
 
 # Set up clickhouse query instrumentation
 @task_prerun.connect
@@ -1,8 +1,9 @@
-from posthog.clickhouse.client.execute import query_with_columns, sync_execute
+from posthog.clickhouse.client.execute import query_with_columns, stream_execute, sync_execute
 from posthog.clickhouse.client.execute_async import execute_process_query
 
 __all__ = [
     "sync_execute",
+    "stream_execute",
     "query_with_columns",
     "execute_process_query",
 ]
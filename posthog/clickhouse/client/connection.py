@@ -1,15 +1,20 @@
 import logging
 import os
+import threading
+import time
 from contextlib import contextmanager
 from enum import Enum
 from functools import cache
-from collections.abc import Mapping
+from collections.abc import Iterable, Mapping
 
+import numpy as np
 from clickhouse_connect import get_client
 from clickhouse_connect.driver import Client as HttpClient, httputil
 from clickhouse_driver import Client as SyncClient
 from clickhouse_pool import ChPool
+from clickhouse_pool.pool import TooManyConnections
 from django.conf import settings
+from prometheus_client import Counter, Gauge, Histogram
 
 
 from posthog.settings import data_stores
@@ -96,16 +101,39 @@ class ProxyClient:
     ):
         if query_id:
             settings["query_id"] = query_id
+        # Only meaningful to clickhouse_driver, ClickHouse itself would reject it
+        use_numpy = settings.pop("use_numpy", False) if settings else False
         result = self._client.query(query=query, parameters=params, settings=settings, column_oriented=columnar)
 
         # we must play with result summary here
         written_rows = int(result.summary.get("written_rows", 0))
         if written_rows > 0:
             return written_rows
+        result_set = result.result_set
+        if columnar and use_numpy:
+            result_set = [_numpy_column(column, type) for column, type in zip(result_set, result.column_types)]
         if with_column_types:
             column_types_driver_format = [(a, b.name) for (a, b) in zip(result.column_names, result.column_types)]
-            return result.result_set, column_types_driver_format
-        return result.result_set
+            return result_set, column_types_driver_format
+        return result_set
+
+    def execute_iter(
+        self,
+        query,
+        params=None,
+        with_column_types=False,
+        external_tables=None,
+        query_id=None,
+        settings=None,
+        types_check=False,
+    ):
+        if query_id:
+            settings["query_id"] = query_id
+        with self._client.query_rows_stream(query=query, parameters=params, settings=settings) as stream:
+            if with_column_types:
+                source = stream.source
+                yield [(a, b.name) for (a, b) in zip(source.column_names, source.column_types)]
+            yield from stream
 
     # Implement methods for session managment: https://peps.python.org/pep-0343/ so ProxyClient can be used in all places a clickhouse_driver.Client is.
     def __enter__(self):
@@ -115,6 +143,14 @@ class ProxyClient:
         pass
 
 
+def _numpy_column(column, column_type) -> np.ndarray:
+    try:
+        return np.asarray(column, dtype=column_type.np_type)
+    except (TypeError, ValueError):
+        # e.g. Nullable columns containing NULLs
+        return np.asarray(column, dtype=object)
+
+
 _clickhouse_http_pool_mgr = httputil.get_pool_manager(
     maxsize=settings.CLICKHOUSE_CONN_POOL_MAX,  # max number of open connection per pool
     block=True,  # makes the maxsize limit per pool, keeps connections
@@ -197,7 +233,9 @@ def get_client_from_pool(
         kwargs = get_kwargs_for_client(workload=workload, team_id=team_id, readonly=readonly, ch_user=ch_user)
         return get_http_client(**kwargs)
 
-    return get_pool(workload=workload, team_id=team_id, readonly=readonly, ch_user=ch_user).get_client()
+    return get_pool(workload=workload, team_id=team_id, readonly=readonly, ch_user=ch_user).get_client(
+        workload=workload, ch_user=ch_user
+    )
 
 
 def get_pool(
@@ -237,7 +275,121 @@ def default_client(host=settings.CLICKHOUSE_HOST):
     )
 
 
-def _make_ch_pool(*, client_settings: Mapping[str, str] | None = None, **overrides) -> ChPool:
+CLICKHOUSE_POOL_CONNECTIONS_GAUGE = Gauge(
+    "posthog_clickhouse_pool_connections",
+    "Open connections of ClickHouse connection pools, by whether they are in use or idle.",
+    labelnames=["host", "user", "state"],
+)
+
+CLICKHOUSE_POOL_ACQUIRE_SECONDS = Histogram(
+    "posthog_clickhouse_pool_acquire_seconds",
+    "Time spent waiting for a connection from a ClickHouse connection pool.",
+    labelnames=["workload", "ch_user", "host"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf")),
+)
+
+CLICKHOUSE_POOL_EXHAUSTED_COUNTER = Counter(
+    "posthog_clickhouse_pool_exhausted",
+    "Connections that couldn't be handed out because the ClickHouse connection pool was at its maximum size.",
+    labelnames=["workload", "ch_user", "host"],
+)
+
+CLICKHOUSE_POOL_REAPED_COUNTER = Counter(
+    "posthog_clickhouse_pool_reaped",
+    "Idle ClickHouse connections closed because they were unused for too long.",
+    labelnames=["host", "user"],
+)
+
+
+class InstrumentedChPool(ChPool):
+    """
+    A `ChPool` that reports its connections to Prometheus, and can close idle connections and open them in advance.
+
+    Pools are shared by all workloads and ClickHouse users that resolve to the same connection arguments, so the
+    connection gauges are labelled with the actual host and user, while acquisitions are labelled with what asked.
+    """
+
+    def __init__(self, **kwargs):
+        self._metrics_lock = threading.Lock()
+        self._idle_since: dict[int, float] = {}
+        super().__init__(**kwargs)
+        host, user = str(self.connection_args["host"]), str(self.connection_args.get("user", "default"))
+        self._host = host
+        self._in_use_gauge = CLICKHOUSE_POOL_CONNECTIONS_GAUGE.labels(host=host, user=user, state="in_use")
+        self._idle_gauge = CLICKHOUSE_POOL_CONNECTIONS_GAUGE.labels(host=host, user=user, state="idle")
+        self._reaped_counter = CLICKHOUSE_POOL_REAPED_COUNTER.labels(host=host, user=user)
+
+    def _open_counts(self) -> tuple[int, int]:
+        return len(self._used), sum(1 for client in self._pool if client.connection.connected)
+
+    @contextmanager
+    def _tracked(self):
+        # Every change to `_pool` and `_used` goes through here, so the gauges can be moved by the difference
+        with self._metrics_lock:
+            in_use, idle = self._open_counts()
+            try:
+                yield
+            finally:
+                new_in_use, new_idle = self._open_counts()
+                self._in_use_gauge.inc(new_in_use - in_use)
+                self._idle_gauge.inc(new_idle - idle)
+
+    def pull(self, key=None):
+        with self._tracked():
+            self._reap_idle()
+            client = super().pull(key)
+            self._idle_since.pop(id(client), None)
+            return client
+
+    def push(self, client=None, key=None, close=False):
+        with self._tracked():
+            super().push(client=client, key=key, close=close)
+            if any(pooled is client for pooled in self._pool):
+                self._idle_since[id(client)] = time.monotonic()
+            self._reap_idle()
+
+    def cleanup(self):
+        with self._tracked():
+            super().cleanup()
+
+    def _reap_idle(self) -> None:
+        timeout = settings.CLICKHOUSE_CONN_POOL_IDLE_TIMEOUT_SECONDS
+        if timeout <= 0:
+            return
+        # Clients stay in the pool and reconnect when they're next used
+        cutoff = time.monotonic() - timeout
+        for client in self._pool:
+            if client.connection.connected and self._idle_since.get(id(client), cutoff) < cutoff:
+                client.disconnect()
+                self._reaped_counter.inc()
+
+    def prewarm(self) -> None:
+        """Connect all idle clients, so that the first queries of a worker don't pay for it."""
+        with self._tracked():
+            for client in self._pool:
+                if not client.connection.connected:
+                    client.connection.force_connect()
+                    self._idle_since[id(client)] = time.monotonic()
+
+    @contextmanager
+    def get_client(
+        self, key=None, *, workload: Workload = Workload.DEFAULT, ch_user: ClickHouseUser = ClickHouseUser.DEFAULT
+    ):
+        labels = {"workload": workload.value, "ch_user": ch_user.value, "host": self._host}
+        start_time = time.perf_counter()
+        try:
+            client = self.pull(key)
+        except TooManyConnections:
+            CLICKHOUSE_POOL_EXHAUSTED_COUNTER.labels(**labels).inc()
+            raise
+        CLICKHOUSE_POOL_ACQUIRE_SECONDS.labels(**labels).observe(time.perf_counter() - start_time)
+        try:
+            yield client
+        finally:
+            self.push(client=client)
+
+
+def _make_ch_pool(*, client_settings: Mapping[str, str] | None = None, **overrides) -> InstrumentedChPool:
     kwargs = {
         "host": settings.CLICKHOUSE_HOST,
         "database": settings.CLICKHOUSE_DATABASE,
@@ -257,12 +409,24 @@ def _make_ch_pool(*, client_settings: Mapping[str, str] | None = None, **overrid
         **overrides,
     }
 
-    return ChPool(**kwargs)
+    return InstrumentedChPool(**kwargs)
 
 
 make_ch_pool = cache(_make_ch_pool)
 
 
+def prewarm_ch_pools(workloads: Iterable[Workload]) -> None:
+    """Opens the connections of the pools for the given workloads in advance, if enabled. Meant for worker startup."""
+    if not settings.CLICKHOUSE_CONN_POOL_PREWARM or settings.CLICKHOUSE_USE_HTTP:
+        return
+    for workload in workloads:
+        try:
+            get_pool(workload=workload).prewarm()
+        except Exception:
+            # The pool connects lazily on first use anyway
+            logging.exception("Failed to prewarm ClickHouse connection pool for %s", workload)
+
+
 def get_default_clickhouse_workload_type():
     global _default_workload
     return _default_workload
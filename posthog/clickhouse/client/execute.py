@@ -3,8 +3,9 @@ import logging
 import threading
 import traceback
 import types
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
 from contextlib import contextmanager
+from dataclasses import dataclass
 from functools import lru_cache
 from time import perf_counter
 from typing import Any, Optional, Union
@@ -104,20 +105,94 @@ def validated_client_query_id() -> Optional[str]:
 logger = logging.getLogger(__name__)
 
 
-@patchable
-def sync_execute(
+@dataclass
+class _QueryExecution:
+    """Where and how a query runs, after applying workload routing and query tags."""
+
+    sql: str
+    args: Any
+    tags: dict[str, Any]
+    query_id: Optional[str]
+    core_settings: dict[str, Any]
+    workload: Workload
+    ch_user: ClickHouseUser
+    team_id: Optional[int]
+    readonly: bool
+    chargeable: Any
+    is_personal_api_key: bool
+
+    @property
+    def query_type(self) -> str:
+        return self.tags.get("query_type", "Other")
+
+    def settings(self) -> dict[str, Any]:
+        settings = {
+            **self.core_settings,
+            "log_comment": json.dumps(self.tags, separators=(",", ":")),
+            "query_id": self.query_id,
+        }
+        if self.workload == Workload.OFFLINE:
+            # disabling hedged requests for offline queries reduces the likelihood of these queries bleeding over into the
+            # online resource pool when the offline resource pool is under heavy load. this comes at the cost of higher and
+            # more variable latency and a higher likelihood of query failures - but offline workloads should be tolerant to
+            # these disruptions
+            settings["use_hedged_requests"] = "0"
+        return settings
+
+    def client(self, sync_client: Optional[SyncClient] = None):
+        return sync_client or get_client_from_pool(self.workload, self.team_id, self.readonly, self.ch_user)
+
+    def record_started(self) -> None:
+        QUERY_STARTED_COUNTER.labels(
+            team_id=str(self.tags.get("team_id", "0")),
+            access_method=self.tags.get("access_method", "other"),
+            chargeable=str(self.tags.get("chargeable", "0")),
+        ).inc()
+
+    def record_finished(self, execution_time: float) -> None:
+        QUERY_FINISHED_COUNTER.labels(
+            team_id=str(self.tags.get("team_id", "0")),
+            access_method=self.tags.get("access_method", "other"),
+            chargeable=str(self.tags.get("chargeable", "0")),
+        ).inc()
+
+        if query_counter := getattr(thread_local_storage, "query_counter", None):
+            query_counter.total_query_time += execution_time
+
+        if app_settings.SHELL_PLUS_PRINT_SQL:
+            print("Execution time: %.6fs" % (execution_time,))  # noqa T201
+
+    def handle_error(self, e: Exception) -> Optional[Exception]:
+        """
+        Records a failed attempt and returns the error to raise. Returns None instead if the query should be retried,
+        in which case the execution has been rerouted already.
+        """
+        exception_type = ch_error_type(e)
+        QUERY_ERROR_COUNTER.labels(
+            exception_type=exception_type,
+            query_type=self.query_type,
+            workload=self.workload.value if self.workload else "None",
+            chargeable=self.chargeable,
+        ).inc()
+        err = wrap_query_error(e)
+        if isinstance(err, ClickhouseAtCapacity) and self.is_personal_api_key and self.workload == Workload.OFFLINE:
+            self.workload = Workload.ONLINE
+            self.tags["clickhouse_exception_type"] = exception_type
+            self.tags["workload"] = str(self.workload)
+            return None
+        return err
+
+
+def _prepare_execution(
     query,
-    args=None,
-    settings=None,
-    with_column_types=False,
-    flush=True,
-    *,
-    workload: Workload = Workload.DEFAULT,
-    team_id: Optional[int] = None,
-    readonly=False,
-    sync_client: Optional[SyncClient] = None,
-    ch_user: ClickHouseUser = ClickHouseUser.DEFAULT,
-):
+    args,
+    settings,
+    flush: bool,
+    workload: Workload,
+    team_id: Optional[int],
+    readonly: bool,
+    ch_user: ClickHouseUser,
+) -> _QueryExecution:
     if not workload:
         workload = Workload.DEFAULT
         # TODO replace this by assert, sorry, no messing with ClickHouse should be possible
@@ -168,7 +243,6 @@ def sync_execute(
         **(settings or {}),
     }
     tags["query_settings"] = core_settings
-    query_type = tags.get("query_type", "Other")
     if ch_user == ClickHouseUser.DEFAULT:
         if is_personal_api_key:
             ch_user = ClickHouseUser.API
@@ -176,66 +250,137 @@ def sync_execute(
             # process requests made to API from the PH app
             ch_user = ClickHouseUser.APP
 
+    return _QueryExecution(
+        sql=prepared_sql,
+        args=prepared_args,
+        tags=tags,
+        query_id=query_id,
+        core_settings=core_settings,
+        workload=workload,
+        ch_user=ch_user,
+        team_id=team_id,
+        readonly=readonly,
+        chargeable=chargeable,
+        is_personal_api_key=is_personal_api_key,
+    )
+
+
+@patchable
+def sync_execute(
+    query,
+    args=None,
+    settings=None,
+    with_column_types=False,
+    flush=True,
+    *,
+    workload: Workload = Workload.DEFAULT,
+    team_id: Optional[int] = None,
+    readonly=False,
+    sync_client: Optional[SyncClient] = None,
+    ch_user: ClickHouseUser = ClickHouseUser.DEFAULT,
+    columnar: bool = False,
+):
+    """
+    Runs a query and returns all of its rows as tuples.
+
+    With `columnar`, returns a list with one array per column instead, which saves building a tuple per row when the
+    result is only going to be aggregated further. Columns are NumPy arrays of the matching dtype where the ClickHouse
+    type allows it. Empty results have no columns at all.
+    """
+    execution = _prepare_execution(query, args, settings, flush, workload, team_id, readonly, ch_user)
+
     while True:
-        settings = {
-            **core_settings,
-            "log_comment": json.dumps(tags, separators=(",", ":")),
-            "query_id": query_id,
-        }
-        if workload == Workload.OFFLINE:
-            # disabling hedged requests for offline queries reduces the likelihood of these queries bleeding over into the
-            # online resource pool when the offline resource pool is under heavy load. this comes at the cost of higher and
-            # more variable latency and a higher likelihood of query failures - but offline workloads should be tolerant to
-            # these disruptions
-            settings["use_hedged_requests"] = "0"
         start_time = perf_counter()
         try:
-            QUERY_STARTED_COUNTER.labels(
-                team_id=str(tags.get("team_id", "0")),
-                access_method=tags.get("access_method", "other"),
-                chargeable=str(tags.get("chargeable", "0")),
-            ).inc()
-            with sync_client or get_client_from_pool(workload, team_id, readonly, ch_user) as client:
+            execution.record_started()
+            query_settings = execution.settings()
+            if columnar:
+                # Client side setting of clickhouse_driver, not sent to the server
+                query_settings["use_numpy"] = True
+            with execution.client(sync_client) as client:
                 result = client.execute(
-                    prepared_sql,
-                    params=prepared_args,
-                    settings=settings,
+                    execution.sql,
+                    params=execution.args,
+                    settings=query_settings,
                     with_column_types=with_column_types,
-                    query_id=query_id,
+                    query_id=execution.query_id,
+                    columnar=columnar,
                 )
         except Exception as e:
-            exception_type = ch_error_type(e)
-            QUERY_ERROR_COUNTER.labels(
-                exception_type=exception_type,
-                query_type=query_type,
-                workload=workload.value if workload else "None",
-                chargeable=chargeable,
-            ).inc()
-            err = wrap_query_error(e)
-            if isinstance(err, ClickhouseAtCapacity) and is_personal_api_key and workload == Workload.OFFLINE:
-                workload = Workload.ONLINE
-                tags["clickhouse_exception_type"] = exception_type
-                tags["workload"] = str(workload)
+            err = execution.handle_error(e)
+            if err is None:
                 continue
             raise err from e
         finally:
-            execution_time = perf_counter() - start_time
+            execution.record_finished(perf_counter() - start_time)
 
-            QUERY_FINISHED_COUNTER.labels(
-                team_id=str(tags.get("team_id", "0")),
-                access_method=tags.get("access_method", "other"),
-                chargeable=str(tags.get("chargeable", "0")),
-            ).inc()
+        break
 
-            if query_counter := getattr(thread_local_storage, "query_counter", None):
-                query_counter.total_query_time += execution_time
+    return result
 
-            if app_settings.SHELL_PLUS_PRINT_SQL:
-                print("Execution time: %.6fs" % (execution_time,))  # noqa T201
+
+def stream_execute(
+    query,
+    args=None,
+    settings=None,
+    with_column_types=False,
+    flush=True,
+    *,
+    workload: Workload = Workload.DEFAULT,
+    team_id: Optional[int] = None,
+    readonly=False,
+    sync_client: Optional[SyncClient] = None,
+    ch_user: ClickHouseUser = ClickHouseUser.DEFAULT,
+) -> Iterator[Any]:
+    """
+    Like `sync_execute`, but yields result rows as they arrive from ClickHouse instead of returning them all at once,
+    so that huge results can be processed without holding them in memory. With `with_column_types`, the first item
+    yielded is the list of `(name, type)` column types.
+
+    The connection stays checked out until the iterator is exhausted or closed, so consume it promptly. Queries are
+    only retried on another workload if they fail before yielding anything.
+    """
+    execution = _prepare_execution(query, args, settings, flush, workload, team_id, readonly, ch_user)
+
+    while True:
+        start_time = perf_counter()
+        started_yielding = False
+        try:
+            execution.record_started()
+            with execution.client(sync_client) as client:
+                rows = client.execute_iter(
+                    execution.sql,
+                    params=execution.args,
+                    settings=execution.settings(),
+                    with_column_types=with_column_types,
+                    query_id=execution.query_id,
+                )
+                try:
+                    for row in rows:
+                        started_yielding = True
+                        yield row
+                except GeneratorExit:
+                    _abort_stream(client, rows)
+                    raise
+        except Exception as e:
+            err = execution.handle_error(e)
+            if err is None and not started_yielding:
+                continue
+            raise (err or wrap_query_error(e)) from e
+        finally:
+            execution.record_finished(perf_counter() - start_time)
 
         break
 
-    return result
+
+def _abort_stream(client, rows) -> None:
+    # The rest of the result is still in flight, so the connection can't be reused as is
+    close = getattr(rows, "close", None)
+    if close is not None:
+        close()
+    disconnect = getattr(client, "disconnect", None)
+    if disconnect is not None:
+        disconnect()
 
 
 def query_with_columns(
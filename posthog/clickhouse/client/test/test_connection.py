@@ -1,6 +1,9 @@
+from unittest.mock import MagicMock, patch
+
 import pytest
 
 from posthog.clickhouse.client.connection import (
+    CLICKHOUSE_POOL_CONNECTIONS_GAUGE,
     Workload,
     get_pool,
     make_ch_pool,
@@ -51,6 +54,38 @@ def test_connection_pool_creation_with_team_id(settings):
     assert team_pool.connection_args["host"] == "clicky"
 
 
+def test_connection_pool_tracks_connections_in_use():
+    pool = make_ch_pool()
+    in_use = CLICKHOUSE_POOL_CONNECTIONS_GAUGE.labels(
+        host=pool.connection_args["host"], user=pool.connection_args["user"], state="in_use"
+    )
+    before = in_use._value.get()
+
+    with pool.get_client(workload=Workload.ONLINE):
+        assert in_use._value.get() == before + 1
+
+    assert in_use._value.get() == before
+
+
+def test_connection_pool_reaps_idle_connections(settings):
+    settings.CLICKHOUSE_CONN_POOL_IDLE_TIMEOUT_SECONDS = 10
+    pool = make_ch_pool()
+
+    with patch("posthog.clickhouse.client.connection.time.monotonic", return_value=1000):
+        with pool.get_client() as client:
+            client.connection.connected = True
+            client.disconnect = MagicMock()
+
+    with patch("posthog.clickhouse.client.connection.time.monotonic", return_value=1009):
+        pool._reap_idle()
+    client.disconnect.assert_not_called()
+
+    with patch("posthog.clickhouse.client.connection.time.monotonic", return_value=1011):
+        with pool.get_client():
+            pass
+    client.disconnect.assert_called_once()
+
+
 @pytest.fixture(autouse=True)
 def reset_state():
     make_ch_pool.cache_clear()
@@ -1,6 +1,7 @@
 import json
 from typing import Any
 
+import numpy as np
 from clickhouse_driver.errors import ServerException
 
 from posthog.clickhouse.client.async_task_chain import task_chain_context
@@ -11,7 +12,7 @@ from django.test import TestCase, SimpleTestCase
 from django.db import transaction
 
 from posthog.clickhouse.client import execute_async as client
-from posthog.clickhouse.client import sync_execute
+from posthog.clickhouse.client import stream_execute, sync_execute
 from posthog.clickhouse.query_tagging import tag_queries
 from posthog.errors import CHQueryErrorTooManySimultaneousQueries
 from posthog.models import Organization, Team
@@ -390,3 +391,47 @@ class ClickhouseClientTestCase(TestCase, ClickhouseTestMixin):
 
         # Verify final result
         self.assertEqual(result, "success")
+
+    def test_sync_execute_columnar(self):
+        columns, types = sync_execute(
+            "SELECT number, toString(number) FROM numbers(3)", with_column_types=True, columnar=True
+        )
+
+        self.assertEqual(types, [("number", "UInt64"), ("toString(number)", "String")])
+        self.assertIsInstance(columns[0], np.ndarray)
+        self.assertEqual(columns[0].dtype, np.uint64)
+        self.assertEqual(columns[0].tolist(), [0, 1, 2])
+        self.assertEqual(list(columns[1]), ["0", "1", "2"])
+
+    def test_stream_execute(self):
+        rows = stream_execute("SELECT number, toString(number) FROM numbers(3)", with_column_types=True)
+
+        self.assertEqual(next(rows), [("number", "UInt64"), ("toString(number)", "String")])
+        self.assertEqual(list(rows), [(0, "0"), (1, "1"), (2, "2")])
+
+    @patch("posthog.clickhouse.client.execute.get_client_from_pool")
+    def test_stream_execute_retries_online_before_yielding(self, mock_get_client):
+        mock_client1 = MagicMock()
+        mock_client2 = MagicMock()
+        mock_client1.__enter__.return_value.execute_iter.side_effect = ServerException("Test error", code=202)
+        mock_client2.__enter__.return_value.execute_iter.return_value = iter([(1,), (2,)])
+        mock_get_client.side_effect = [mock_client1, mock_client2]
+
+        tag_queries(access_method="personal_api_key")
+        result = list(stream_execute("SELECT 1"))
+
+        mock_get_client.assert_any_call(Workload.OFFLINE, None, False, ClickHouseUser.API)
+        mock_get_client.assert_any_call(Workload.ONLINE, None, False, ClickHouseUser.API)
+        self.assertEqual(result, [(1,), (2,)])
+
+    @patch("posthog.clickhouse.client.execute.get_client_from_pool")
+    def test_stream_execute_disconnects_when_closed_early(self, mock_get_client):
+        mock_client = MagicMock()
+        mock_client.__enter__.return_value.execute_iter.return_value = iter([(1,), (2,)])
+        mock_get_client.return_value = mock_client
+
+        rows = stream_execute("SELECT 1")
+        self.assertEqual(next(rows), (1,))
+        rows.close()
+
+        mock_client.__enter__.return_value.disconnect.assert_called_once()
@@ -1,4 +1,4 @@
-from typing import Protocol
+from typing import Protocol, get_args
 
 from posthog.models.instance_setting import get_instance_setting
 from posthog.models.property import PropertyName, TableColumn, TableWithProperties
@@ -24,9 +24,25 @@ if EE_AVAILABLE:
             return None
 
         return get_enabled_materialized_columns(table).get((property_name, table_column))
+
+    def get_materialized_columns_state() -> tuple[tuple[str, str, str, ColumnName, bool], ...]:
+        """The materialized columns that printing queries may use, e.g. for keying caches of printed queries."""
+        if not get_instance_setting("MATERIALIZED_COLUMNS_ENABLED"):
+            return ()
+
+        return tuple(
+            sorted(
+                (table, table_column, property_name, column.name, column.is_nullable)
+                for table in get_args(TablesWithMaterializedColumns)
+                for (property_name, table_column), column in get_enabled_materialized_columns(table).items()
+            )
+        )
 else:
 
     def get_materialized_column_for_property(
         table: TablesWithMaterializedColumns, table_column: TableColumn, property_name: PropertyName
     ) -> MaterializedColumn | None:
         return None
+
+    def get_materialized_columns_state() -> tuple[tuple[str, str, str, ColumnName, bool], ...]:
+        return ()
@@ -9,6 +9,7 @@ from django.db import transaction, IntegrityError
 
 from posthog.clickhouse.client import query_with_columns, sync_execute
 from posthog.demo.matrix.taxonomy_inference import infer_taxonomy_for_team
+from posthog.kafka_client.client import buffered_clickhouse_writes
 from posthog.models import (
     Cohort,
     Group,
@@ -149,30 +150,32 @@ class MatrixManager:
         bulk_group_type_mappings = []
         if len(self.matrix.groups.keys()) + self.matrix.group_type_index_offset > 5:
             raise ValueError("Too many group types! The maximum for a project is 5.")
-        for group_type_index, (group_type, groups) in enumerate(self.matrix.groups.items()):
-            group_type_index += self.matrix.group_type_index_offset  # Adjust
-            bulk_group_type_mappings.append(
-                GroupTypeMapping(
-                    team=data_team,
-                    project_id=data_team.project_id,
-                    group_type_index=group_type_index,
-                    group_type=group_type,
-                )
-            )
-            for group_key, group in groups.items():
-                self._save_sim_group(
-                    data_team,
-                    cast(Literal[0, 1, 2, 3, 4], group_type_index),
-                    group_key,
-                    group,
-                    self.matrix.now,
+        # Groups, persons and their past events are written to ClickHouse in batches rather than one by one
+        with buffered_clickhouse_writes():
+            for group_type_index, (group_type, groups) in enumerate(self.matrix.groups.items()):
+                group_type_index += self.matrix.group_type_index_offset  # Adjust
+                bulk_group_type_mappings.append(
+                    GroupTypeMapping(
+                        team=data_team,
+                        project_id=data_team.project_id,
+                        group_type_index=group_type_index,
+                        group_type=group_type,
+                    )
                 )
-        try:
-            GroupTypeMapping.objects.bulk_create(bulk_group_type_mappings)
-        except IntegrityError as e:
-            print(f"SKIPPING GROUP TYPE MAPPING CREATION: {e}")
-        for sim_person in sim_persons:
-            self._save_sim_person(data_team, sim_person)
+                for group_key, group in groups.items():
+                    self._save_sim_group(
+                        data_team,
+                        cast(Literal[0, 1, 2, 3, 4], group_type_index),
+                        group_key,
+                        group,
+                        self.matrix.now,
+                    )
+            try:
+                GroupTypeMapping.objects.bulk_create(bulk_group_type_mappings)
+            except IntegrityError as e:
+                print(f"SKIPPING GROUP TYPE MAPPING CREATION: {e}")
+            for sim_person in sim_persons:
+                self._save_sim_person(data_team, sim_person)
         # We need to wait a bit for data just queued into Kafka to show up in CH
         self._sleep_until_person_data_in_clickhouse(data_team.pk)
 
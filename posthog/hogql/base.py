@@ -1,7 +1,10 @@
 import re
+from collections.abc import Callable
 from dataclasses import dataclass, field
+from functools import cache
+from types import FunctionType
 
-from typing import TYPE_CHECKING, Literal, Optional, TypeVar
+from typing import TYPE_CHECKING, Any, Literal, Optional, TypeVar
 
 from posthog.hogql.constants import ConstantDataType
 from posthog.hogql.errors import NotImplementedError
@@ -13,26 +16,23 @@ if TYPE_CHECKING:
 camel_case_pattern = re.compile(r"(?<!^)(?<![A-Z])(?=[A-Z])")
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class AST:
     start: Optional[int] = field(default=None)
     end: Optional[int] = field(default=None)
 
     # This is part of the visitor pattern from visitor.py.
     def accept(self, visitor):
-        name = camel_case_pattern.sub("_", self.__class__.__name__).lower()
-
-        # NOTE: Sync with ./test/test_visitor.py#test_hogql_visitor_naming_exceptions
-        replacements = {"hog_qlxtag": "hogqlx_tag", "hog_qlxattribute": "hogqlx_attribute", "uuidtype": "uuid_type"}
-        for old, new in replacements.items():
-            name = name.replace(old, new)
-        method_name = f"visit_{name}"
-        if hasattr(visitor, method_name):
-            visit = getattr(visitor, method_name)
-            return visit(self)
-        if hasattr(visitor, "visit_unknown"):
-            return visitor.visit_unknown(self)
-        raise NotImplementedError(f"{visitor.__class__.__name__} has no method {method_name}")
+        visitor_class = visitor.__class__
+        # Each visitor class gets its own table (not inherited by subclasses), mapping node classes to visit functions
+        dispatch_table = visitor_class.__dict__.get(_DISPATCH_TABLE_ATTR)
+        if dispatch_table is None:
+            dispatch_table = {}
+            setattr(visitor_class, _DISPATCH_TABLE_ATTR, dispatch_table)
+        visit = dispatch_table.get(self.__class__)
+        if visit is None:
+            visit = dispatch_table[self.__class__] = _find_visit_function(visitor_class, self.__class__)
+        return visit(visitor, self)
 
     def to_hogql(self):
         from posthog.hogql.printer import print_prepared_ast
@@ -46,14 +46,45 @@ class AST:
 
     def __str__(self):
         if isinstance(self, Type):
-            return super().__str__()
+            # Not `super().__str__()`, as zero-argument `super()` doesn't work in slotted dataclasses
+            return repr(self)
         return f"sql({self.to_hogql()})"
 
 
 _T_AST = TypeVar("_T_AST", bound=AST)
 
+_DISPATCH_TABLE_ATTR = "_hogql_visit_dispatch_table"
+
+
+@cache
+def visit_method_name(node_class: type[AST]) -> str:
+    name = camel_case_pattern.sub("_", node_class.__name__).lower()
+
+    # NOTE: Sync with ./test/test_visitor.py#test_hogql_visitor_naming_exceptions
+    replacements = {"hog_qlxtag": "hogqlx_tag", "hog_qlxattribute": "hogqlx_attribute", "uuidtype": "uuid_type"}
+    for old, new in replacements.items():
+        name = name.replace(old, new)
+    return f"visit_{name}"
+
+
+def _find_visit_function(visitor_class: type, node_class: type[AST]) -> Callable[[Any, AST], Any]:
+    method_name = visit_method_name(node_class)
+    for name in (method_name, "visit_unknown"):
+        attribute = getattr(visitor_class, name, None)
+        if attribute is None:
+            continue
+        if isinstance(attribute, FunctionType):
+            return attribute
+        # Anything but a plain method (e.g. a staticmethod) is looked up on the instance every time
+        return lambda visitor, node, name=name: getattr(visitor, name)(node)
+
+    def not_implemented(visitor, node):
+        raise NotImplementedError(f"{visitor.__class__.__name__} has no method {method_name}")
+
+    return not_implemented
+
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Type(AST):
     def get_child(self, name: str, context: "HogQLContext") -> "Type":
         raise NotImplementedError("Type.get_child not overridden")
@@ -68,12 +99,12 @@ class Type(AST):
         raise NotImplementedError(f"{self.__class__.__name__}.resolve_column_constant_type not overridden")
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Expr(AST):
     type: Optional[Type] = field(default=None)
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class CTE(Expr):
     """A common table expression."""
 
@@ -83,7 +114,7 @@ class CTE(Expr):
     cte_type: Literal["column", "subquery"]
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class ConstantType(Type):
     data_type: ConstantDataType
     nullable: bool = field(default=True)
@@ -95,7 +126,7 @@ class ConstantType(Type):
         raise NotImplementedError("ConstantType.print_type not implemented")
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class UnknownType(ConstantType):
     data_type: ConstantDataType = field(default="unknown", init=False)
 
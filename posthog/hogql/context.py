@@ -57,6 +57,9 @@ class HogQLContext:
     debug: bool = False
 
     property_swapper: Optional["PropertySwapper"] = None
+    # Cleared when resolving the query depends on more than the query, its modifiers and the team's schema, e.g. on
+    # feature flags or the current time, so that it must not be printed from the cache
+    cacheable: bool = True
 
     def add_value(self, value: Any) -> str:
         key = f"hogql_val_{len(self.values)}"
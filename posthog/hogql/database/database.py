@@ -1,4 +1,7 @@
 import dataclasses
+import threading
+import time
+from collections import OrderedDict
 from collections.abc import Callable
 from typing import (
     TYPE_CHECKING,
@@ -12,7 +15,9 @@ from typing import (
 )
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
+from django.conf import settings
 from django.db.models import Prefetch, Q
+from prometheus_client import Counter
 from pydantic import BaseModel, ConfigDict
 
 from posthog.exceptions_capture import capture_exception
@@ -105,6 +110,7 @@ from posthog.hogql.errors import QueryError, ResolutionError
 from posthog.hogql.parser import parse_expr
 from posthog.hogql.timings import HogQLTimings
 from posthog.models.group_type_mapping import GroupTypeMapping
+from posthog.models.hogql_schema_version import get_hogql_schema_version
 from posthog.models.team.team import WeekStartDay
 from posthog.schema import (
     DatabaseSchemaDataWarehouseTable,
@@ -131,6 +137,12 @@ from products.revenue_analytics.backend.views.revenue_analytics_base_view import
 if TYPE_CHECKING:
     from posthog.models import Team
 
+DATABASE_CACHE_COUNTER = Counter(
+    "posthog_hogql_database_cache_total",
+    "Lookups in the per-process cache of HogQL databases, by outcome.",
+    labelnames=["result"],
+)
+
 
 class Database(BaseModel):
     model_config = ConfigDict(extra="allow")
@@ -374,12 +386,119 @@ def _use_error_tracking_issue_id_from_error_tracking_issue_overrides(database: D
 TableStore = dict[str, Table | TableGroup]
 
 
+class _DatabaseCache:
+    """
+    Per-process LRU of `Database` templates, keyed on (team_id, requested modifiers).
+
+    Each entry remembers the team's HogQL schema version it was built against, and is discarded once that changes or
+    it's older than the TTL. Templates are never handed out directly, callers always get a copy (see `_copy_database`)
+    they're free to add tables and fields to.
+    """
+
+    def __init__(self):
+        self._entries: OrderedDict[tuple[int, Optional[str]], tuple[int, float, Database]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[int, Optional[str]], schema_version: int, ttl: float) -> Optional[Database]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry_schema_version, created_at, database = entry
+            if entry_schema_version != schema_version or created_at + ttl <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return _copy_database(database)
+
+    def set(self, key: tuple[int, Optional[str]], schema_version: int, database: Database, max_entries: int) -> None:
+        template = _copy_database(database)
+        with self._lock:
+            self._entries[key] = (schema_version, time.monotonic(), template)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_database_cache = _DatabaseCache()
+
+
+def _copy_database(database: Database) -> Database:
+    """
+    Copy a database along with its tables, table groups and their `fields` and `tables` dicts, which is what callers
+    mutate. The fields themselves are shared, as they're only modified while the database is being built.
+    """
+    copied = database.model_copy(
+        update={
+            name: _copy_table(value)
+            for name, value in [*database.__dict__.items(), *(database.model_extra or {}).items()]
+            if isinstance(value, Table | TableGroup)
+        }
+    )
+    copied._warehouse_table_names = list(database._warehouse_table_names)
+    copied._warehouse_self_managed_table_names = list(database._warehouse_self_managed_table_names)
+    copied._view_table_names = list(database._view_table_names)
+    return copied
+
+
+def _copy_table(table: Table | TableGroup) -> Table | TableGroup:
+    if isinstance(table, TableGroup):
+        return table.model_copy(update={"tables": {name: _copy_table(child) for name, child in table.tables.items()}})
+    return table.model_copy(
+        update={
+            "fields": {
+                name: _copy_table(field) if isinstance(field, Table | TableGroup) else field
+                for name, field in table.fields.items()
+            }
+        }
+    )
+
+
 def create_hogql_database(
     team_id: Optional[int] = None,
     *,
     team: Optional["Team"] = None,
     modifiers: Optional[HogQLQueryModifiers] = None,
     timings: Optional[HogQLTimings] = None,
+) -> Database:
+    if timings is None:
+        timings = HogQLTimings()
+
+    ttl = settings.HOGQL_DATABASE_CACHE_TTL_SECONDS
+    resolved_team_id = team_id if team_id is not None else team.pk if team is not None else None
+    if ttl <= 0 or resolved_team_id is None:
+        return _build_hogql_database(team_id, team=team, modifiers=modifiers, timings=timings)
+
+    with timings.measure("database_cache"):
+        key = (resolved_team_id, modifiers.model_dump_json() if modifiers is not None else None)
+        try:
+            schema_version: Optional[int] = get_hogql_schema_version(resolved_team_id)
+        except Exception:
+            capture_exception()
+            schema_version = None
+        database = _database_cache.get(key, schema_version, ttl) if schema_version is not None else None
+    if database is not None:
+        DATABASE_CACHE_COUNTER.labels(result="hit").inc()
+        return database
+
+    DATABASE_CACHE_COUNTER.labels(result="miss").inc()
+    database = _build_hogql_database(team_id, team=team, modifiers=modifiers, timings=timings)
+    if schema_version is not None:
+        with timings.measure("database_cache_set"):
+            _database_cache.set(key, schema_version, database, settings.HOGQL_DATABASE_CACHE_MAX_ENTRIES)
+    return database
+
+
+def _build_hogql_database(
+    team_id: Optional[int] = None,
+    *,
+    team: Optional["Team"] = None,
+    modifiers: Optional[HogQLQueryModifiers] = None,
+    timings: Optional[HogQLTimings] = None,
 ) -> Database:
     from posthog.hogql.database.s3_table import S3Table
     from posthog.hogql.query import create_default_modifiers_for_team
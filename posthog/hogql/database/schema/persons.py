@@ -202,6 +202,7 @@ def join_with_persons_table(
     if organization is None:
         raise ResolutionError("Organization is required to join with persons table")
     # TODO: @raquelmsmith: Remove flag check and use left join for all once deletes are caught up
+    context.cacheable = False
     use_inner_join = (
         posthoganalytics.feature_enabled(
             "personless-events-not-supported",
@@ -49,6 +49,7 @@ def persons_pdi_join(
     if not organization:
         raise ResolutionError("Organization not found in context")
     # TODO: @raquelmsmith: Remove flag check and use left join for all once deletes are caught up
+    context.cacheable = False
     use_inner_join = (
         posthoganalytics.feature_enabled(
             "personless-events-not-supported",
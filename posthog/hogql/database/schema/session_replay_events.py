@@ -83,6 +83,7 @@ def join_with_events_table(
         requested_fields = {**join_to_add.fields_accessed, "$session_id": ["$session_id"]}
 
     clamp_to_ttl = _clamp_to_ttl(["events", "timestamp"])
+    context.cacheable = False
 
     select_fields: list[ast.Expr] = [
         ast.Alias(alias=name, expr=ast.Field(chain=chain)) for name, chain in requested_fields.items()
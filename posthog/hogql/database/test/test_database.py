@@ -7,14 +7,16 @@ from django.test import override_settings
 from parameterized import parameterized
 
 from posthog.hogql.constants import MAX_SELECT_RETURNED_ROWS
-from posthog.hogql.database.database import create_hogql_database, serialize_database
+from posthog.hogql.database.database import _database_cache, create_hogql_database, serialize_database
 from posthog.hogql.database.models import (
     FieldTraverser,
     LazyJoin,
     StringDatabaseField,
     ExpressionField,
     Table,
+    TableGroup,
 )
+from posthog.hogql.database.schema.numbers import NumbersTable
 from posthog.hogql.errors import ExposedHogQLError
 from posthog.hogql.modifiers import create_default_modifiers_for_team
 from posthog.hogql.parser import parse_expr, parse_select
@@ -390,6 +392,56 @@ class TestDatabase(BaseTest, QueryMatchingTest):
 
         assert db.events.fields["event"] == StringDatabaseField(name="event", nullable=False)
 
+    @override_settings(HOGQL_DATABASE_CACHE_TTL_SECONDS=60)
+    def test_database_is_reused_until_schema_changes(self):
+        _database_cache.clear()
+        db = create_hogql_database(team=self.team)
+        db.events.fields["mutated"] = StringDatabaseField(name="mutated")
+
+        with self.assertNumQueries(0):
+            cached_db = create_hogql_database(team=self.team)
+        assert cached_db is not db
+        assert "mutated" not in cached_db.events.fields
+
+        GroupTypeMapping.objects.create(
+            team=self.team, project_id=self.team.project_id, group_type="test", group_type_index=0
+        )
+        db = create_hogql_database(team=self.team)
+        assert db.events.fields["test"] == FieldTraverser(chain=["group_0"])
+
+    @override_settings(HOGQL_DATABASE_CACHE_TTL_SECONDS=60)
+    def test_cached_databases_do_not_share_tables(self):
+        _database_cache.clear()
+        db = create_hogql_database(team=self.team)
+        db.events.fields["poe"].fields["mutated"] = StringDatabaseField(name="mutated")
+        db.add_warehouse_tables(numbers_copy=NumbersTable(), group=TableGroup(tables={"numbers": NumbersTable()}))
+
+        cached_db = create_hogql_database(team=self.team)
+        cached_db.numbers.fields["mutated"] = StringDatabaseField(name="mutated")
+        other_cached_db = create_hogql_database(team=self.team)
+
+        assert "mutated" not in cached_db.events.fields["poe"].fields
+        assert not cached_db.has_table("numbers_copy") and cached_db.get_warehouse_tables() == []
+        assert "mutated" not in other_cached_db.numbers.fields
+        # Fields aren't modified once the database is built, so copies share them
+        assert other_cached_db.events.fields["event"] is cached_db.events.fields["event"]
+
+    @override_settings(HOGQL_DATABASE_CACHE_TTL_SECONDS=60)
+    def test_database_cache_is_keyed_on_modifiers(self):
+        _database_cache.clear()
+        db = create_hogql_database(
+            team=self.team, modifiers=HogQLQueryModifiers(personsOnEventsMode=PersonsOnEventsMode.DISABLED)
+        )
+        other_db = create_hogql_database(
+            team=self.team,
+            modifiers=HogQLQueryModifiers(
+                personsOnEventsMode=PersonsOnEventsMode.PERSON_ID_NO_OVERRIDE_PROPERTIES_ON_EVENTS
+            ),
+        )
+
+        assert db.events.fields["person_id"] == FieldTraverser(chain=["pdi", "person_id"])
+        assert other_db.events.fields["person_id"] == StringDatabaseField(name="person_id")
+
     def test_database_expression_fields(self):
         db = create_hogql_database(team=self.team)
         db.numbers.fields["expression"] = ExpressionField(name="expression", expr=parse_expr("1 + 1"))
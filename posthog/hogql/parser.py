@@ -1,8 +1,12 @@
-from typing import Literal, Optional, cast
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Literal, Optional, cast
 from collections.abc import Callable
 
 from antlr4 import CommonTokenStream, InputStream, ParseTreeVisitor, ParserRuleContext
 from antlr4.error.ErrorListener import ErrorListener
+from django.conf import settings
 from prometheus_client import Histogram
 
 from posthog.hogql import ast
@@ -15,6 +19,7 @@ from posthog.hogql.grammar.HogQLParser import HogQLParser
 from posthog.hogql.parse_string import parse_string_literal_text, parse_string_literal_ctx, parse_string_text_ctx
 from posthog.hogql.placeholders import replace_placeholders
 from posthog.hogql.timings import HogQLTimings
+from posthog.hogql.visitor import clone_expr
 from hogql_parser import (
     parse_expr as _parse_expr_cpp,
     parse_order_expr as _parse_order_expr_cpp,
@@ -63,11 +68,87 @@ RULE_TO_HISTOGRAM: dict[Literal["expr", "order_expr", "select", "full_template_s
     cast(Literal["expr", "order_expr", "select", "full_template_string"], rule): Histogram(
         f"parse_{rule}_seconds",
         f"Time to parse {rule} expression",
-        labelnames=["backend"],
+        labelnames=["backend", "cache_hit"],
     )
     for rule in ("expr", "order_expr", "select", "full_template_string")
 }
 
+# (rule, backend, string, start offset for expressions)
+ParseCacheKey = tuple[str, str, str, Optional[int]]
+
+
+class ParseCache:
+    """
+    Per-process LRU of parsed ASTs, keyed by what was parsed and how.
+
+    Cached nodes are shared between callers and must never be handed out as is. Callers get a clone, or the tree that
+    placeholder substitution builds from the cached one.
+    """
+
+    def __init__(self, *, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[ParseCacheKey, AST] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: ParseCacheKey) -> Optional[AST]:
+        with self._lock:
+            node = self._entries.get(key)
+            if node is not None:
+                self._entries.move_to_end(key)
+            return node
+
+    def set(self, key: ParseCacheKey, node: AST) -> None:
+        with self._lock:
+            self._entries[key] = node
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_parse_cache: Optional[ParseCache] = None
+
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """Return this process's parse cache, or None if it's disabled."""
+    global _parse_cache
+
+    max_entries = settings.HOGQL_PARSER_CACHE_MAX_ENTRIES
+    if max_entries <= 0:
+        return None
+    if _parse_cache is None or _parse_cache.max_entries != max_entries:
+        _parse_cache = ParseCache(max_entries=max_entries)
+    return _parse_cache
+
+
+def _parse(
+    rule: Literal["expr", "order_expr", "select", "full_template_string"],
+    backend: Literal["python", "cpp"],
+    string: str,
+    placeholders: Optional[dict[str, ast.Expr]],
+    timings: HogQLTimings,
+    *args: Any,
+) -> Any:
+    parse_cache = get_parse_cache()
+    cache_key: ParseCacheKey = (rule, backend, string, args[0] if args else None)
+    lookup_started = time.perf_counter()
+    node = parse_cache.get(cache_key) if parse_cache is not None else None
+    if node is not None:
+        RULE_TO_HISTOGRAM[rule].labels(backend=backend, cache_hit="true").observe(time.perf_counter() - lookup_started)
+    else:
+        with RULE_TO_HISTOGRAM[rule].labels(backend=backend, cache_hit="false").time():
+            node = RULE_TO_PARSE_FUNCTION[backend][rule](string, *args)
+        if parse_cache is not None:
+            parse_cache.set(cache_key, node)
+
+    if placeholders:
+        with timings.measure("replace_placeholders"):
+            # Builds a new tree, so a cached one stays untouched
+            return replace_placeholders(node, placeholders)
+    return clone_expr(node) if parse_cache is not None else node
+
 
 def parse_string_template(
     string: str,
@@ -80,11 +161,7 @@ def parse_string_template(
     if timings is None:
         timings = HogQLTimings()
     with timings.measure(f"parse_full_template_string_{backend}"):
-        with RULE_TO_HISTOGRAM["full_template_string"].labels(backend=backend).time():
-            node = RULE_TO_PARSE_FUNCTION[backend]["full_template_string"]("F'" + string)
-        if placeholders:
-            with timings.measure("replace_placeholders"):
-                node = replace_placeholders(node, placeholders)
+        node = _parse("full_template_string", backend, "F'" + string, placeholders, timings)
     return node
 
 
@@ -101,11 +178,7 @@ def parse_expr(
     if timings is None:
         timings = HogQLTimings()
     with timings.measure(f"parse_expr_{backend}"):
-        with RULE_TO_HISTOGRAM["expr"].labels(backend=backend).time():
-            node = RULE_TO_PARSE_FUNCTION[backend]["expr"](expr, start)
-        if placeholders:
-            with timings.measure("replace_placeholders"):
-                node = replace_placeholders(node, placeholders)
+        node = _parse("expr", backend, expr, placeholders, timings, start)
     return node
 
 
@@ -119,11 +192,7 @@ def parse_order_expr(
     if timings is None:
         timings = HogQLTimings()
     with timings.measure(f"parse_order_expr_{backend}"):
-        with RULE_TO_HISTOGRAM["order_expr"].labels(backend=backend).time():
-            node = RULE_TO_PARSE_FUNCTION[backend]["order_expr"](order_expr)
-        if placeholders:
-            with timings.measure("replace_placeholders"):
-                node = replace_placeholders(node, placeholders)
+        node = _parse("order_expr", backend, order_expr, placeholders, timings)
     return node
 
 
@@ -137,11 +206,7 @@ def parse_select(
     if timings is None:
         timings = HogQLTimings()
     with timings.measure(f"parse_select_{backend}"):
-        with RULE_TO_HISTOGRAM["select"].labels(backend=backend).time():
-            node = RULE_TO_PARSE_FUNCTION[backend]["select"](statement)
-        if placeholders:
-            with timings.measure("replace_placeholders"):
-                node = replace_placeholders(node, placeholders)
+        node = _parse("select", backend, statement, placeholders, timings)
     return node
 
 
@@ -154,7 +219,7 @@ def parse_program(
     if timings is None:
         timings = HogQLTimings()
     with timings.measure(f"parse_expr_{backend}"):
-        with RULE_TO_HISTOGRAM["expr"].labels(backend=backend).time():
+        with RULE_TO_HISTOGRAM["expr"].labels(backend=backend, cache_hit="false").time():
             node = RULE_TO_PARSE_FUNCTION[backend]["program"](source)
     return node
 
@@ -0,0 +1,131 @@
+import dataclasses
+import hashlib
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Optional
+from uuid import UUID
+
+import structlog
+from django.conf import settings
+from django.core.cache import cache
+from prometheus_client import Counter
+from pydantic import BaseModel
+
+from posthog.clickhouse.materialized_columns import get_materialized_columns_state
+from posthog.hogql.base import AST, Type
+from posthog.models.hogql_schema_version import get_hogql_schema_version
+
+logger = structlog.get_logger(__name__)
+
+PRINTED_QUERY_CACHE_COUNTER = Counter(
+    "posthog_hogql_printed_query_cache_total",
+    "Lookups in the printed HogQL query cache, by outcome.",
+    labelnames=["result"],
+)
+
+
+@dataclass
+class PrintedQuery:
+    """Everything `HogQLQueryExecutor` produces from resolving and printing a query."""
+
+    hogql: str
+    print_columns: list[str]
+    clickhouse_sql: str
+    values: dict[str, Any]
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+_AST_FIELDS: dict[type, tuple[str, ...]] = {}
+
+
+def _ast_field_names(cls: type) -> tuple[str, ...]:
+    names = _AST_FIELDS.get(cls)
+    if names is None:
+        names = tuple(field.name for field in dataclasses.fields(cls) if field.name not in ("start", "end"))
+        _AST_FIELDS[cls] = names
+    return names
+
+
+def _normalize(value: Any) -> Any:
+    """Turn an AST into nested tuples of plain values, leaving out source positions."""
+    if isinstance(value, AST):
+        if isinstance(value, Type):
+            # Already resolved nodes depend on the database they were resolved against
+            raise _Uncacheable()
+        normalized: list[Any] = [value.__class__.__name__]
+        for name in _ast_field_names(value.__class__):
+            child = getattr(value, name)
+            if name == "type" and child is not None:
+                raise _Uncacheable()
+            normalized.append((name, _normalize(child)))
+        return tuple(normalized)
+    if value is None or isinstance(value, str | int | float | bool):
+        return value
+    if isinstance(value, list | tuple):
+        return (value.__class__.__name__, *(_normalize(item) for item in value))
+    if isinstance(value, dict):
+        return ("dict", *((_normalize(key), _normalize(item)) for key, item in value.items()))
+    if isinstance(value, Enum):
+        return (value.__class__.__name__, value.value)
+    if isinstance(value, datetime | date):
+        return (value.__class__.__name__, value.isoformat(), str(getattr(value, "tzinfo", None)))
+    if isinstance(value, UUID | Decimal):
+        return (value.__class__.__name__, str(value))
+    if isinstance(value, BaseModel):
+        return (value.__class__.__name__, value.model_dump_json())
+    raise _Uncacheable()
+
+
+def ast_fingerprint(node: AST, *extra: Any) -> Optional[str]:
+    """
+    Hash of the structure of an (unresolved) AST, plus anything else that affects how it's printed.
+    Returns None if some part of it can't be fingerprinted reliably.
+    """
+    try:
+        normalized = (_normalize(node), *(_normalize(item) for item in extra))
+    except _Uncacheable:
+        return None
+    return hashlib.sha256(repr(normalized).encode("utf-8")).hexdigest()
+
+
+def get_printed_query_cache_key(team_id: int, node: AST, *extra: Any) -> Optional[str]:
+    if settings.HOGQL_PRINTED_QUERY_CACHE_TTL_SECONDS <= 0:
+        return None
+    try:
+        # Properties are printed as their materialized columns if there are any, which isn't part of the schema version
+        materialized_columns = get_materialized_columns_state()
+    except Exception:
+        logger.exception("hogql_materialized_columns_lookup_failed", team_id=team_id)
+        return None
+    fingerprint = ast_fingerprint(node, *extra, materialized_columns)
+    if fingerprint is None:
+        PRINTED_QUERY_CACHE_COUNTER.labels(result="uncacheable").inc()
+        return None
+    try:
+        schema_version = get_hogql_schema_version(team_id)
+    except Exception:
+        logger.exception("hogql_schema_version_lookup_failed", team_id=team_id)
+        return None
+    return f"hogql_printed_query:{team_id}:{schema_version}:{fingerprint}"
+
+
+def get_printed_query(cache_key: str) -> Optional[PrintedQuery]:
+    try:
+        printed_query = cache.get(cache_key)
+    except Exception:
+        logger.exception("hogql_printed_query_cache_get_failed")
+        printed_query = None
+    PRINTED_QUERY_CACHE_COUNTER.labels(result="hit" if printed_query is not None else "miss").inc()
+    return printed_query
+
+
+def set_printed_query(cache_key: str, printed_query: PrintedQuery) -> None:
+    try:
+        cache.set(cache_key, printed_query, settings.HOGQL_PRINTED_QUERY_CACHE_TTL_SECONDS)
+    except Exception:
+        logger.exception("hogql_printed_query_cache_set_failed")
@@ -13,6 +13,12 @@ from posthog.hogql.hogql import HogQLContext
 from posthog.hogql.modifiers import create_default_modifiers_for_team
 from posthog.hogql.parser import parse_select
 from posthog.hogql.placeholders import find_placeholders, replace_placeholders
+from posthog.hogql.printed_query_cache import (
+    PrintedQuery,
+    get_printed_query,
+    get_printed_query_cache_key,
+    set_printed_query,
+)
 from posthog.hogql.printer import (
     prepare_ast_for_printing,
     print_ast,
@@ -34,6 +40,14 @@ from posthog.schema import (
 )
 from posthog.settings import HOGQL_INCREASED_MAX_EXECUTION_TIME
 
+# Queries in these contexts may run for up to HOGQL_INCREASED_MAX_EXECUTION_TIME
+INCREASED_MAX_EXECUTION_TIME_LIMIT_CONTEXTS = (
+    LimitContext.EXPORT,
+    LimitContext.COHORT_CALCULATION,
+    LimitContext.QUERY_ASYNC,
+    LimitContext.SAVED_QUERY,
+)
+
 
 @dataclasses.dataclass
 class HogQLQueryExecutor:
@@ -170,12 +184,7 @@ class HogQLQueryExecutor:
 
     def _generate_clickhouse_sql(self):
         settings = self.settings or HogQLGlobalSettings()
-        if self.limit_context in (
-            LimitContext.EXPORT,
-            LimitContext.COHORT_CALCULATION,
-            LimitContext.QUERY_ASYNC,
-            LimitContext.SAVED_QUERY,
-        ):
+        if self.limit_context in INCREASED_MAX_EXECUTION_TIME_LIMIT_CONTEXTS:
             settings.max_execution_time = max(settings.max_execution_time or 0, HOGQL_INCREASED_MAX_EXECUTION_TIME)
 
         if self.query_modifiers.formatCsvAllowDoubleQuotes is not None:
@@ -262,15 +271,71 @@ class HogQLQueryExecutor:
                     HogQLMetadata(language=HogLanguage.HOG_QL, query=self.hogql, debug=True), self.team
                 )
 
+    def _get_printed_query_cache_key(self) -> Optional[str]:
+        if self.debug or self.context.database is not None or self.context.values:
+            # Debug output, a custom database or pre-existing values aren't captured by the cached result
+            return None
+        return get_printed_query_cache_key(
+            self.team.pk,
+            self.select_query,
+            self.query_modifiers,
+            self.settings,
+            self.limit_context,
+            self.pretty,
+            self.context.limit_top_select,
+            self.context.output_format,
+            self.context.within_non_hogql_query,
+            self.context.globals,
+        )
+
+    def _load_printed_query(self, printed_query: PrintedQuery):
+        self.hogql_context = dataclasses.replace(
+            self.context,
+            team_id=self.team.pk,
+            team=self.team,
+            enable_select_queries=True,
+            timings=self.timings,
+            modifiers=self.query_modifiers,
+        )
+        self.clickhouse_context = dataclasses.replace(self.hogql_context)
+        self.clickhouse_context.values.update(printed_query.values)
+        self.hogql = printed_query.hogql
+        self.print_columns = list(printed_query.print_columns)
+        self.clickhouse_sql = printed_query.clickhouse_sql
+
     def generate_clickhouse_sql(self) -> tuple[str, HogQLContext]:
         self._parse_query()
         self._process_variables()
         self._process_placeholders()
         self._apply_limit()
+
+        with self.timings.measure("printed_query_cache"):
+            printed_query_cache_key = self._get_printed_query_cache_key()
+            printed_query = get_printed_query(printed_query_cache_key) if printed_query_cache_key else None
+        if printed_query is not None:
+            self._load_printed_query(printed_query)
+            return self.clickhouse_sql, self.clickhouse_context
+
         with self.timings.measure("_generate_hogql"):
             self._generate_hogql()
         with self.timings.measure("_generate_clickhouse_sql"):
             self._generate_clickhouse_sql()
+
+        if (
+            printed_query_cache_key
+            and self.error is None
+            and self.hogql_context.cacheable
+            and self.clickhouse_context.cacheable
+        ):
+            set_printed_query(
+                printed_query_cache_key,
+                PrintedQuery(
+                    hogql=self.hogql,
+                    print_columns=self.print_columns,
+                    clickhouse_sql=self.clickhouse_sql,
+                    values=dict(self.clickhouse_context.values),
+                ),
+            )
         return self.clickhouse_sql, self.clickhouse_context
 
     def execute(self) -> HogQLQueryResponse:
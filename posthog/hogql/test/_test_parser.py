@@ -1,6 +1,9 @@
 from typing import Literal, cast, Optional
+from unittest.mock import Mock, patch
 
 import math
+from django.test import override_settings
+
 from posthog.hogql.ast import (
     VariableAssignment,
     Constant,
@@ -28,7 +31,13 @@ from posthog.hogql.ast import (
 from posthog.hogql.parser import parse_program
 from posthog.hogql import ast
 from posthog.hogql.errors import ExposedHogQLError, SyntaxError
-from posthog.hogql.parser import parse_expr, parse_order_expr, parse_select, parse_string_template
+from posthog.hogql.parser import (
+    RULE_TO_PARSE_FUNCTION,
+    parse_expr,
+    parse_order_expr,
+    parse_select,
+    parse_string_template,
+)
 from posthog.hogql.visitor import clear_locations
 from posthog.test.base import BaseTest, MemoryLeakTestMixin
 
@@ -2674,4 +2683,34 @@ def parser_test_factory(backend: Literal["python", "cpp"]):
             )
             self.assertEqual(program, expected)
 
+        @override_settings(HOGQL_PARSER_CACHE_MAX_ENTRIES=10)
+        def test_parse_cache_hands_out_copies(self):
+            first = parse_select("select event from events where 1 = {a}", backend=backend)
+            assert isinstance(first, ast.SelectQuery)
+            first.select.append(ast.Field(chain=["timestamp"]))
+
+            with patch.dict(RULE_TO_PARSE_FUNCTION[backend], {"select": Mock(side_effect=Exception("not cached"))}):
+                second = parse_select("select event from events where 1 = {a}", backend=backend)
+                third = parse_select(
+                    "select event from events where 1 = {a}", placeholders={"a": ast.Constant(value=1)}, backend=backend
+                )
+
+            assert isinstance(second, ast.SelectQuery)
+            assert clear_locations(second).select == [ast.Field(chain=["event"])]
+            assert isinstance(second.where, ast.CompareOperation)
+            assert isinstance(second.where.right, ast.Placeholder)
+            assert isinstance(third, ast.SelectQuery)
+            assert isinstance(third.where, ast.CompareOperation)
+            assert third.where.right == ast.Constant(value=1)
+
+        @override_settings(HOGQL_PARSER_CACHE_MAX_ENTRIES=1)
+        def test_parse_cache_evicts_least_recently_used(self):
+            parse_expr("1 + 1", backend=backend)
+            parse_expr("2 + 2", backend=backend)
+
+            with patch.dict(RULE_TO_PARSE_FUNCTION[backend], {"expr": Mock(side_effect=Exception("not cached"))}):
+                parse_expr("2 + 2", backend=backend)
+                with self.assertRaisesMessage(Exception, "not cached"):
+                    parse_expr("1 + 1", backend=backend)
+
     return TestParser
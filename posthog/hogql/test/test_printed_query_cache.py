@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from posthog.hogql import ast
+from posthog.hogql.parser import parse_select
+from posthog.hogql.printed_query_cache import ast_fingerprint
+from posthog.hogql.query import HogQLQueryExecutor
+from posthog.models import Cohort, PropertyDefinition
+from posthog.models.hogql_schema_version import get_hogql_schema_version
+from posthog.test.base import BaseTest
+
+
+class TestPrintedQueryCache(BaseTest):
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_fingerprint_ignores_source_positions(self):
+        assert ast_fingerprint(parse_select("select event from events")) == ast_fingerprint(
+            parse_select("select   event   from events")
+        )
+        assert ast_fingerprint(parse_select("select event from events")) != ast_fingerprint(
+            parse_select("select distinct_id from events")
+        )
+        assert ast_fingerprint(ast.Constant(value=1)) != ast_fingerprint(ast.Constant(value=True))
+
+    def test_fingerprint_includes_extra_parts(self):
+        query = parse_select("select event from events")
+
+        assert ast_fingerprint(query, "a") != ast_fingerprint(query, "b")
+
+    def test_fingerprint_of_resolved_ast_is_none(self):
+        assert ast_fingerprint(ast.Constant(value=1, type=ast.IntegerType())) is None
+
+    def test_schema_changes_bump_version(self):
+        version = get_hogql_schema_version(self.team.pk)
+        PropertyDefinition.objects.create(team=self.team, name="$browser")
+
+        assert get_hogql_schema_version(self.team.pk) > version
+
+    @override_settings(HOGQL_PRINTED_QUERY_CACHE_TTL_SECONDS=60)
+    def test_repeated_queries_skip_printing(self):
+        sql, context = HogQLQueryExecutor(
+            query="select event from events where event = 'a'", team=self.team
+        ).generate_clickhouse_sql()
+
+        with patch("posthog.hogql.query.print_ast") as print_ast:
+            cached_sql, cached_context = HogQLQueryExecutor(
+                query="select event from events where event = 'a'", team=self.team
+            ).generate_clickhouse_sql()
+            print_ast.assert_not_called()
+
+        assert cached_sql == sql
+        assert cached_context.values == context.values
+
+        PropertyDefinition.objects.create(team=self.team, name="$browser")
+        with patch("posthog.hogql.query.print_ast", return_value="") as print_ast:
+            HogQLQueryExecutor(
+                query="select event from events where event = 'a'", team=self.team
+            ).generate_clickhouse_sql()
+            print_ast.assert_called_once()
+
+    @override_settings(HOGQL_PRINTED_QUERY_CACHE_TTL_SECONDS=60)
+    def test_materializing_a_column_changes_printed_query(self):
+        try:
+            from ee.clickhouse.materialized_columns.analyze import materialize
+        except ModuleNotFoundError:
+            # EE not available? Assume we're good
+            self.assertEqual(1 + 2, 3)
+            return
+
+        query = "select properties.$browser from events"
+        sql, _ = HogQLQueryExecutor(query=query, team=self.team).generate_clickhouse_sql()
+        assert "mat_$browser" not in sql
+
+        materialize("events", "$browser")
+        sql, _ = HogQLQueryExecutor(query=query, team=self.team).generate_clickhouse_sql()
+        assert "mat_$browser" in sql
+
+    @override_settings(HOGQL_PRINTED_QUERY_CACHE_TTL_SECONDS=60)
+    def test_queries_depending_on_feature_flags_are_not_cached(self):
+        query = "select pdi.distinct_id from persons"
+        HogQLQueryExecutor(query=query, team=self.team).generate_clickhouse_sql()
+
+        with patch("posthog.hogql.query.print_ast", return_value="") as print_ast:
+            HogQLQueryExecutor(query=query, team=self.team).generate_clickhouse_sql()
+            print_ast.assert_called_once()
+
+    def test_recalculating_cohorts_does_not_bump_version(self):
+        cohort = Cohort.objects.create(team=self.team, groups=[{"properties": [{"key": "$os", "value": "Mac"}]}])
+        version = get_hogql_schema_version(self.team.pk)
+
+        cohort.is_calculating = True
+        cohort.save(update_fields=["is_calculating"])
+        assert get_hogql_schema_version(self.team.pk) == version
+
+        cohort.name = "Mac users"
+        cohort.save()
+        assert get_hogql_schema_version(self.team.pk) > version
+
+    def test_only_team_changes_affecting_hogql_bump_version(self):
+        version = get_hogql_schema_version(self.team.pk)
+
+        self.team.name = "Renamed"
+        self.team.save()
+        assert get_hogql_schema_version(self.team.pk) == version
+
+        self.team.timezone = "Europe/Berlin"
+        self.team.save()
+        assert get_hogql_schema_version(self.team.pk) > version
@@ -2,7 +2,7 @@ from posthog.hogql import ast
 from posthog.hogql.ast import UUIDType, HogQLXTag, HogQLXAttribute
 from posthog.hogql.errors import InternalHogQLError
 from posthog.hogql.parser import parse_expr
-from posthog.hogql.visitor import CloningVisitor, Visitor, TraversingVisitor
+from posthog.hogql.visitor import CloningVisitor, Visitor, TraversingVisitor, clone_expr
 from posthog.test.base import BaseTest
 
 
@@ -140,6 +140,23 @@ class TestVisitor(BaseTest):
         self.assertEqual(e.exception.start, 4)
         self.assertEqual(e.exception.end, 7)
 
+    def test_visitor_dispatch_respects_subclasses(self):
+        class ParentVisitor(Visitor):
+            def visit_constant(self, node: ast.Constant):
+                return "parent"
+
+            def visit_unknown(self, node: ast.AST):
+                return "unknown"
+
+        class ChildVisitor(ParentVisitor):
+            def visit_constant(self, node: ast.Constant):
+                return "child"
+
+        assert ParentVisitor().visit(ast.Constant(value=1)) == "parent"
+        assert ChildVisitor().visit(ast.Constant(value=1)) == "child"
+        assert ParentVisitor().visit(ast.Constant(value=1)) == "parent"
+        assert ChildVisitor().visit(ast.Field(chain=["a"])) == "unknown"
+
     def test_hogql_visitor_naming_exceptions(self):
         class NamingCheck(Visitor):
             def visit_uuid_type(self, node: ast.Constant):
@@ -158,3 +175,19 @@ class TestVisitor(BaseTest):
     def test_visit_interval_type(self):
         # Just ensure ``IntervalType`` can be visited without throwing ``NotImplementedError``
         TraversingVisitor().visit(ast.IntervalType())
+
+    def test_clone_expr_copies_nodes_and_shares_types(self):
+        node = ast.Call(name="f", args=[ast.Constant(value=1, type=ast.IntegerType())])
+        clone = clone_expr(node)
+
+        assert clone == node
+        assert clone.args is not node.args
+        assert clone.args[0] is not node.args[0]
+        assert clone.args[0].type is node.args[0].type
+
+    def test_ast_nodes_are_slotted(self):
+        node = ast.Constant(value=1)
+
+        assert not hasattr(node, "__dict__")
+        with self.assertRaises(AttributeError):
+            node.some_attribute = 1  # type: ignore
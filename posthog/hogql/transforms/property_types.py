@@ -1,7 +1,5 @@
 from typing import Literal, cast, Optional
 
-from django.db.models.functions.comparison import Coalesce
-
 from posthog.clickhouse.materialized_columns import (
     MaterializedColumn,
     TablesWithMaterializedColumns,
@@ -19,11 +17,11 @@ from posthog.models import Team
 from posthog.models.property import PropertyName, TableColumn
 from posthog.schema import PersonsOnEventsMode
 from posthog.hogql.database.s3_table import S3Table
-from django.db import models
 
 
 def build_property_swapper(node: ast.AST, context: HogQLContext) -> None:
     from posthog.models import PropertyDefinition
+    from posthog.models.property_type_cache import get_property_types
 
     if not context or not context.team_id:
         return
@@ -38,55 +36,29 @@ def build_property_swapper(node: ast.AST, context: HogQLContext) -> None:
     property_finder = PropertyFinder(context)
     property_finder.visit(node)
 
-    event_property_values = (
-        PropertyDefinition.objects.alias(
-            effective_project_id=Coalesce("project_id", "team_id", output_field=models.BigIntegerField())
-        )
-        .filter(
-            effective_project_id=context.team.project_id,  # type: ignore
-            name__in=property_finder.event_properties,
-            type__in=[None, PropertyDefinition.Type.EVENT],
-        )
-        .values_list("name", "property_type")
-        if property_finder.event_properties
-        else []
-    )
-    event_properties = {name: property_type for name, property_type in event_property_values if property_type}
-
-    person_property_values = (
-        PropertyDefinition.objects.alias(
-            effective_project_id=Coalesce("project_id", "team_id", output_field=models.BigIntegerField())
-        )
-        .filter(
-            effective_project_id=context.team.project_id,  # type: ignore
-            name__in=property_finder.person_properties,
-            type=PropertyDefinition.Type.PERSON,
-        )
-        .values_list("name", "property_type")
-        if property_finder.person_properties
-        else []
+    property_types = get_property_types(
+        context.team.project_id,
+        [(PropertyDefinition.Type.EVENT, None, name) for name in property_finder.event_properties]
+        + [(PropertyDefinition.Type.PERSON, None, name) for name in property_finder.person_properties]
+        + [
+            (PropertyDefinition.Type.GROUP, group_id, name)
+            for group_id, properties in property_finder.group_properties.items()
+            for name in properties
+        ],
     )
-    person_properties = {name: property_type for name, property_type in person_property_values if property_type}
 
-    group_properties = {}
-    for group_id, properties in property_finder.group_properties.items():
-        if not properties:
+    event_properties: dict[str, str] = {}
+    person_properties: dict[str, str] = {}
+    group_properties: dict[str, str] = {}
+    for (type, group_id, name), property_type in property_types.items():
+        if not property_type:
             continue
-        group_property_values = (
-            PropertyDefinition.objects.alias(
-                effective_project_id=Coalesce("project_id", "team_id", output_field=models.BigIntegerField())
-            )
-            .filter(
-                effective_project_id=context.team.project_id,  # type: ignore
-                name__in=properties,
-                type=PropertyDefinition.Type.GROUP,
-                group_type_index=group_id,
-            )
-            .values_list("name", "property_type")
-        )
-        group_properties.update(
-            {f"{group_id}_{name}": property_type for name, property_type in group_property_values if property_type}
-        )
+        if type == PropertyDefinition.Type.EVENT:
+            event_properties[name] = property_type
+        elif type == PropertyDefinition.Type.PERSON:
+            person_properties[name] = property_type
+        else:
+            group_properties[f"{group_id}_{name}"] = property_type
 
     timezone = context.database.get_timezone() if context and context.database else "UTC"
     context.property_swapper = PropertySwapper(
@@ -4,12 +4,14 @@ import re
 
 from django.test import override_settings
 
+from posthog import redis
 from posthog.hogql.context import HogQLContext
 from posthog.hogql.parser import parse_select
 from posthog.hogql.printer import print_ast
 from posthog.hogql.test.utils import pretty_print_in_tests
 from posthog.models import PropertyDefinition, GroupTypeMapping
 from posthog.models.group.util import create_group
+from posthog.models.property_type_cache import PROPERTY_TYPE_CACHE_KEY, get_property_types
 from posthog.test.base import BaseTest
 
 from posthog.warehouse.models import DataWarehouseTable, DataWarehouseJoin, DataWarehouseCredential
@@ -211,3 +213,62 @@ class TestPropertyTypes(BaseTest):
             "clickhouse",
         )
         return pretty_print_in_tests(query, self.team.pk)
+
+
+@override_settings(HOGQL_PROPERTY_TYPE_CACHE_TTL_SECONDS=60)
+class TestPropertyTypeCache(BaseTest):
+    def test_looks_up_all_property_types_in_one_query(self):
+        PropertyDefinition.objects.create(
+            team=self.team, type=PropertyDefinition.Type.EVENT, name="$screen_width", property_type="Numeric"
+        )
+        PropertyDefinition.objects.create(
+            team=self.team, type=PropertyDefinition.Type.PERSON, name="tickets", property_type="Numeric"
+        )
+        PropertyDefinition.objects.create(
+            team=self.team,
+            type=PropertyDefinition.Type.GROUP,
+            group_type_index=1,
+            name="inty",
+            property_type="Numeric",
+        )
+        lookups = [
+            (PropertyDefinition.Type.EVENT, None, "$screen_width"),
+            (PropertyDefinition.Type.EVENT, None, "tickets"),
+            (PropertyDefinition.Type.PERSON, None, "tickets"),
+            (PropertyDefinition.Type.GROUP, 0, "inty"),
+            (PropertyDefinition.Type.GROUP, 1, "inty"),
+        ]
+        expected = {
+            (PropertyDefinition.Type.EVENT, None, "$screen_width"): "Numeric",
+            (PropertyDefinition.Type.EVENT, None, "tickets"): None,
+            (PropertyDefinition.Type.PERSON, None, "tickets"): "Numeric",
+            (PropertyDefinition.Type.GROUP, 0, "inty"): None,
+            (PropertyDefinition.Type.GROUP, 1, "inty"): "Numeric",
+        }
+
+        with self.assertNumQueries(1):
+            assert get_property_types(self.team.project_id, lookups) == expected
+        with self.assertNumQueries(0):
+            assert get_property_types(self.team.project_id, lookups) == expected
+
+    def test_changed_definitions_are_refreshed(self):
+        lookups = [(PropertyDefinition.Type.EVENT, None, "bool"), (PropertyDefinition.Type.EVENT, None, "other")]
+        assert get_property_types(self.team.project_id, lookups) == {lookups[0]: None, lookups[1]: None}
+
+        definition = PropertyDefinition.objects.create(
+            team=self.team, type=PropertyDefinition.Type.EVENT, name="bool", property_type="Boolean"
+        )
+        with self.assertNumQueries(1):
+            assert get_property_types(self.team.project_id, lookups) == {lookups[0]: "Boolean", lookups[1]: None}
+
+        definition.delete()
+        assert get_property_types(self.team.project_id, lookups) == {lookups[0]: None, lookups[1]: None}
+
+    def test_misses_dont_extend_the_expiry(self):
+        key = PROPERTY_TYPE_CACHE_KEY.format(project_id=self.team.project_id)
+        get_property_types(self.team.project_id, [(PropertyDefinition.Type.EVENT, None, "bool")])
+        assert 0 < redis.get_client().ttl(key) <= 60
+
+        redis.get_client().expire(key, 10)
+        get_property_types(self.team.project_id, [(PropertyDefinition.Type.EVENT, None, "other")])
+        assert 0 < redis.get_client().ttl(key) <= 10
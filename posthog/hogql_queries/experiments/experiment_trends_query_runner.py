@@ -1,6 +1,5 @@
 import json
 from zoneinfo import ZoneInfo
-from django.conf import settings
 from posthog.constants import ExperimentNoResultsErrorKeys
 from posthog.clickhouse.query_tagging import tag_queries
 from posthog.hogql import ast
@@ -23,6 +22,7 @@ from posthog.hogql_queries.experiments.trends_statistics_v2_continuous import (
 )
 from posthog.hogql_queries.insights.trends.trends_query_runner import TrendsQueryRunner
 from posthog.hogql_queries.query_runner import QueryRunner
+from posthog.hogql_queries.utils.query_executor import run_in_parallel
 from posthog.models.experiment import Experiment
 from posthog.queries.trends.util import ALL_SUPPORTED_MATH_FUNCTIONS
 from rest_framework.exceptions import ValidationError
@@ -47,8 +47,8 @@ from posthog.schema import (
     TrendsQueryResponse,
 )
 from typing import Any, Optional
-import threading
 from datetime import datetime, timedelta, UTC
+from functools import partial
 
 
 class ExperimentTrendsQueryRunner(QueryRunner):
@@ -251,36 +251,17 @@ class ExperimentTrendsQueryRunner(QueryRunner):
         )
 
         shared_results: dict[str, Optional[Any]] = {"count_result": None, "exposure_result": None}
-        errors = []
-
-        def run(query_runner: TrendsQueryRunner, result_key: str, is_parallel: bool):
-            try:
-                result = query_runner.calculate()
-                shared_results[result_key] = result
-            except Exception as e:
-                errors.append(e)
-            finally:
-                if is_parallel:
-                    from django.db import connection
-
-                    # This will only close the DB connection for the newly spawned thread and not the whole app
-                    connection.close()
-
-        # This exists so that we're not spawning threads during unit tests
-        if settings.IN_UNIT_TESTING:
-            run(self.count_query_runner, "count_result", False)
-            run(self.exposure_query_runner, "exposure_result", False)
-        else:
-            jobs = [
-                threading.Thread(target=run, args=(self.count_query_runner, "count_result", True)),
-                threading.Thread(target=run, args=(self.exposure_query_runner, "exposure_result", True)),
-            ]
-            [j.start() for j in jobs]  # type: ignore
-            [j.join() for j in jobs]  # type: ignore
 
-        # Raise any errors raised in a separate thread
-        if errors:
-            raise errors[0]
+        def run(query_runner: TrendsQueryRunner, result_key: str) -> None:
+            shared_results[result_key] = query_runner.calculate()
+
+        run_in_parallel(
+            [
+                partial(run, self.count_query_runner, "count_result"),
+                partial(run, self.exposure_query_runner, "exposure_result"),
+            ],
+            team_id=self.team.pk,
+        )
 
         count_result = shared_results["count_result"]
         exposure_result = shared_results["exposure_result"]
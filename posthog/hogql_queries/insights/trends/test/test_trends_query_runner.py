@@ -578,6 +578,55 @@ class TestTrendsQueryRunner(ClickhouseTestMixin, APIBaseTest):
         assert response_groups[2] == "series_1"
         assert response_groups[3] == ""
 
+    def test_trends_combined_series_query_matches_query_per_series(self):
+        self._create_test_events()
+        series: list[EventsNode | ActionsNode] = [
+            EventsNode(event="$pageview"),
+            EventsNode(event="$pageleave", math=BaseMathType.DAU),
+            EventsNode(
+                event="$pageview",
+                properties=[EventPropertyFilter(key="$browser", value="Chrome", operator=PropertyOperator.EXACT)],
+            ),
+            EventsNode(event=None, math=BaseMathType.DAU),
+        ]
+
+        for trends_filters, compare_filters in [
+            (None, None),
+            (TrendsFilter(display=ChartDisplayType.BOLD_NUMBER), None),
+            (None, CompareFilter(compare=True)),
+        ]:
+            with self.subTest(trends_filters=trends_filters, compare_filters=compare_filters):
+                runner = self._create_query_runner(
+                    self.default_date_from,
+                    self.default_date_to,
+                    IntervalType.DAY,
+                    series,
+                    trends_filters,
+                    compare_filters=compare_filters,
+                )
+                combined_queries = runner.to_combined_queries()
+                assert combined_queries is not None
+                self.assertEqual(len(combined_queries), 2 if compare_filters else 1)
+
+                response_per_series = runner.calculate()
+                with override_settings(TRENDS_COMBINED_SERIES_QUERIES=True):
+                    combined_response = runner.calculate()
+
+                self.assertEqual(combined_response.results, response_per_series.results)
+
+    def test_trends_combined_series_query_falls_back_for_series_that_cant_be_combined(self):
+        for series, breakdown in [
+            ([EventsNode(event="$pageview"), EventsNode(event="$pageview", math=BaseMathType.WEEKLY_ACTIVE)], None),
+            (
+                [EventsNode(event="$pageview"), EventsNode(event="$pageleave")],
+                BreakdownFilter(breakdown="$browser", breakdown_type=BreakdownType.EVENT),
+            ),
+        ]:
+            runner = self._create_query_runner(
+                self.default_date_from, self.default_date_to, IntervalType.DAY, series, None, breakdown
+            )
+            self.assertIsNone(runner.to_combined_queries())
+
     def test_formula(self):
         self._create_test_events()
 
@@ -0,0 +1,156 @@
+from posthog.hogql import ast
+from posthog.hogql.parser import parse_expr
+from posthog.hogql.visitor import clone_expr
+from posthog.hogql_queries.insights.trends.trends_query_builder import TrendsQueryBuilder
+from posthog.schema import DataWarehouseNode, HogQLQueryResponse
+
+# Math whose aggregation counts matching events (or distinct values of them), so that it can be made conditional
+# without changing its result, including for intervals without any matching events
+COMBINABLE_MATH = {None, "total", "dau", "unique_session", "unique_group"}
+
+
+class TrendsCombinedQueryBuilder:
+    """
+    Builds a single query for multiple series over the same date range, scanning events once for all of them.
+
+    Each series is computed with a conditional aggregate over the events matching any of the series, so the query
+    returns a `total_{index}` column per series. `split_response` turns its response into what the query of each series
+    on its own would have returned. Only series with simple counting math, without breakdowns, can be combined.
+    """
+
+    def __init__(self, query_builders: list[TrendsQueryBuilder]):
+        self.query_builders = query_builders
+
+    @staticmethod
+    def can_combine(query_builder: TrendsQueryBuilder) -> bool:
+        series = query_builder.series
+        trends_filter = query_builder.query.trendsFilter
+        return (
+            not isinstance(series, DataWarehouseNode)
+            and series.math in COMBINABLE_MATH
+            and (series.math != "unique_group" or series.math_group_type_index is not None)
+            and not query_builder.breakdown.enabled
+            and not query_builder._trends_display.should_wrap_inner_query()
+            and not (
+                trends_filter is not None
+                and trends_filter.smoothingIntervals is not None
+                and trends_filter.smoothingIntervals > 1
+            )
+        )
+
+    def build_query(self) -> ast.SelectQuery:
+        query_builder = self.query_builders[0]
+        series_filters = [series_query_builder._series_filter() for series_query_builder in self.query_builders]
+
+        events_query = ast.SelectQuery(
+            select=[
+                ast.Alias(
+                    alias=f"total_{index}",
+                    expr=self._conditional_aggregation(
+                        series_query_builder._aggregation_operation.select_aggregation(), clone_expr(series_filter)
+                    ),
+                )
+                for index, (series_query_builder, series_filter) in enumerate(zip(self.query_builders, series_filters))
+            ],
+            select_from=ast.JoinExpr(
+                table=query_builder._table_expr,
+                alias="e",
+                sample=ast.SampleExpr(sample_value=query_builder._sample_value()),
+            ),
+            where=ast.And(
+                exprs=[
+                    query_builder._events_filter(is_actors_query=False, breakdown=None, ignore_series=True),
+                    ast.Or(exprs=series_filters),
+                ]
+            ),
+        )
+
+        if query_builder._trends_display.is_total_value():
+            return events_query
+
+        events_query.select.append(
+            ast.Alias(
+                alias="day_start",
+                expr=ast.Call(
+                    name=f"toStartOf{query_builder.query_date_range.interval_name.title()}",
+                    args=[ast.Field(chain=["timestamp"])],
+                ),
+            )
+        )
+        events_query.group_by = [ast.Field(chain=["day_start"])]
+
+        inner_query = ast.SelectQuery(
+            select=[
+                *(
+                    ast.Alias(
+                        alias=f"count_{index}", expr=ast.Call(name="sum", args=[ast.Field(chain=[f"total_{index}"])])
+                    )
+                    for index in range(len(self.query_builders))
+                ),
+                ast.Field(chain=["day_start"]),
+            ],
+            select_from=ast.JoinExpr(table=events_query),
+            group_by=[ast.Field(chain=["day_start"])],
+            order_by=[ast.OrderExpr(expr=ast.Field(chain=["day_start"]), order="ASC")],
+        )
+
+        return ast.SelectQuery(
+            select=[
+                query_builder._get_date_subqueries(),
+                *(
+                    ast.Alias(alias=f"total_{index}", expr=self._total_array(index))
+                    for index in range(len(self.query_builders))
+                ),
+            ],
+            select_from=ast.JoinExpr(table=inner_query),
+        )
+
+    @staticmethod
+    def split_response(response: HogQLQueryResponse, index: int) -> HogQLQueryResponse:
+        """The response of the series at `index`, with its `total_{index}` column as `total`, like its own query's."""
+        columns = response.columns or []
+        kept = [
+            column_index
+            for column_index, column in enumerate(columns)
+            if not column.startswith("total_") or column == f"total_{index}"
+        ]
+        return response.model_copy(
+            update={
+                "columns": [
+                    "total" if columns[column_index] == f"total_{index}" else columns[column_index]
+                    for column_index in kept
+                ],
+                "results": [[row[column_index] for column_index in kept] for row in response.results],
+                "types": (
+                    [response.types[column_index] for column_index in kept] if response.types is not None else None
+                ),
+            }
+        )
+
+    @staticmethod
+    def _conditional_aggregation(aggregation: ast.Expr, condition: ast.Expr) -> ast.Expr:
+        if not isinstance(aggregation, ast.Call) or aggregation.name != "count" or aggregation.params:
+            raise ValueError("Only count aggregations can be combined")
+        if aggregation.distinct:
+            # `count(DISTINCT x)` is `uniqExact(x)` in ClickHouse
+            return ast.Call(name="uniqExactIf", args=[*aggregation.args, condition])
+        return ast.Call(name="countIf", args=[*aggregation.args, condition])
+
+    @staticmethod
+    def _total_array(index: int) -> ast.Expr:
+        # Same as the total of a series on its own, see `TrendsQueryBuilder._outer_select_query`
+        return parse_expr(
+            f"""
+            arrayMap(
+                _match_date ->
+                    arraySum(
+                        arraySlice(
+                            groupArray(ifNull(count_{index}, 0)),
+                            indexOf(groupArray(day_start) as _days_for_count_{index}, _match_date) as _index_{index},
+                            arrayLastIndex(x -> x = _match_date, _days_for_count_{index}) - _index_{index} + 1
+                        )
+                    ),
+                date
+            )
+        """
+        )
@@ -663,6 +663,7 @@ class TrendsQueryBuilder(DataWarehouseInsightQueryMixin):
         breakdown: Breakdown | None,
         ignore_breakdowns: bool = False,
         actors_query_time_frame: Optional[str] = None,
+        ignore_series: bool = False,
     ) -> ast.Expr:
         series = self.series
         filters: list[ast.Expr] = []
@@ -687,7 +688,7 @@ class TrendsQueryBuilder(DataWarehouseInsightQueryMixin):
             )
 
         # Filter by event or action name
-        if not self._aggregation_operation.is_first_time_ever_math():
+        if not ignore_series and not self._aggregation_operation.is_first_time_ever_math():
             event_or_action = self._event_or_action_where_expr()
             if event_or_action is not None:
                 filters.append(event_or_action)
@@ -730,7 +731,7 @@ class TrendsQueryBuilder(DataWarehouseInsightQueryMixin):
                 filters.append(property_to_expr(self.query.properties, self.team))
 
         # Series Filters
-        if series.properties is not None and series.properties != []:
+        if not ignore_series and series.properties is not None and series.properties != []:
             filters.append(property_to_expr(series.properties, self.team))
 
         # Breakdown
@@ -741,20 +742,44 @@ class TrendsQueryBuilder(DataWarehouseInsightQueryMixin):
                     filters.append(breakdown_filter)
 
         # Ignore empty groups
-        if series.math == "unique_group" and series.math_group_type_index is not None:
-            filters.append(
-                ast.CompareOperation(
-                    op=ast.CompareOperationOp.NotEq,
-                    left=ast.Field(chain=["e", f"$group_{int(series.math_group_type_index)}"]),
-                    right=ast.Constant(value=""),
-                )
-            )
+        empty_group_filter = self._empty_group_filter()
+        if not ignore_series and empty_group_filter is not None:
+            filters.append(empty_group_filter)
 
         if len(filters) == 0:
             return ast.Constant(value=True)
 
         return ast.And(exprs=filters)
 
+    def _series_filter(self) -> ast.Expr:
+        """The filters of the series itself, which `_events_filter` leaves out with `ignore_series`."""
+        filters: list[ast.Expr] = []
+
+        event_or_action = self._event_or_action_where_expr()
+        if event_or_action is not None:
+            filters.append(event_or_action)
+
+        if self.series.properties is not None and self.series.properties != []:
+            filters.append(property_to_expr(self.series.properties, self.team))
+
+        empty_group_filter = self._empty_group_filter()
+        if empty_group_filter is not None:
+            filters.append(empty_group_filter)
+
+        if len(filters) == 0:
+            return ast.Constant(value=True)
+
+        return ast.And(exprs=filters)
+
+    def _empty_group_filter(self) -> ast.Expr | None:
+        if self.series.math == "unique_group" and self.series.math_group_type_index is not None:
+            return ast.CompareOperation(
+                op=ast.CompareOperationOp.NotEq,
+                left=ast.Field(chain=["e", f"$group_{int(self.series.math_group_type_index)}"]),
+                right=ast.Constant(value=""),
+            )
+        return None
+
     def _event_or_action_where_expr(self) -> ast.Expr | None:
         # Event name
         if series_event_name(self.series) is not None:
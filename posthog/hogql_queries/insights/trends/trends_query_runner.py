@@ -1,6 +1,6 @@
-import threading
 from copy import deepcopy
 from datetime import timedelta, datetime
+from functools import partial
 from math import ceil
 from operator import itemgetter
 from typing import Any, Optional, Union
@@ -9,13 +9,13 @@ from django.conf import settings
 from django.db import models
 from django.db.models.functions import Coalesce
 from natsort import natsorted, ns
+import numpy as np
 
 from posthog.caching.insights_api import (
     BASE_MINIMUM_INSIGHT_REFRESH_INTERVAL,
     REAL_TIME_INSIGHT_REFRESH_INTERVAL,
     REDUCED_MINIMUM_INSIGHT_REFRESH_INTERVAL,
 )
-from posthog.clickhouse import query_tagging
 from posthog.hogql import ast
 from posthog.hogql.constants import MAX_SELECT_RETURNED_ROWS, LimitContext
 from posthog.hogql.printer import to_printed_hogql
@@ -31,11 +31,13 @@ from posthog.hogql_queries.insights.trends.breakdown import (
 from posthog.hogql_queries.insights.trends.display import TrendsDisplay
 from posthog.hogql_queries.insights.trends.series_with_extras import SeriesWithExtras
 from posthog.hogql_queries.insights.trends.trends_actors_query_builder import TrendsActorsQueryBuilder
+from posthog.hogql_queries.insights.trends.trends_combined_query_builder import TrendsCombinedQueryBuilder
 from posthog.hogql_queries.insights.trends.trends_query_builder import TrendsQueryBuilder
 from posthog.hogql_queries.query_runner import QueryRunner
 from posthog.hogql_queries.utils.formula_ast import FormulaAST
 from posthog.hogql_queries.utils.query_compare_to_date_range import QueryCompareToDateRange
 from posthog.hogql_queries.utils.query_date_range import QueryDateRange
+from posthog.hogql_queries.utils.query_executor import run_in_parallel
 from posthog.hogql_queries.utils.query_previous_period_date_range import (
     QueryPreviousPeriodDateRange,
 )
@@ -151,6 +153,47 @@ class TrendsQueryRunner(QueryRunner):
 
         return queries
 
+    def to_combined_queries(self) -> Optional[list[tuple[ast.SelectQuery, list[int]]]]:
+        """
+        One query per date range (i.e. also for the previous period when comparing) computing all of its series at once,
+        with the indexes of the series each computes. None if any of the series can't be combined with others.
+        """
+        if len(self.series) < 2:
+            return None
+
+        with self.timings.measure("trends_to_combined_query"):
+            query_builders_per_date_range: dict[bool, list[tuple[int, TrendsQueryBuilder]]] = {}
+            for index, series in enumerate(self.series):
+                if series.overriden_query is not None:
+                    return None
+
+                query_builder = TrendsQueryBuilder(
+                    trends_query=self.query,
+                    team=self.team,
+                    query_date_range=(
+                        self.query_previous_date_range if series.is_previous_period_series else self.query_date_range
+                    ),
+                    series=series.series,
+                    timings=self.timings,
+                    modifiers=self.modifiers,
+                    limit_context=self.limit_context,
+                )
+                if not TrendsCombinedQueryBuilder.can_combine(query_builder):
+                    return None
+                query_builders_per_date_range.setdefault(bool(series.is_previous_period_series), []).append(
+                    (index, query_builder)
+                )
+
+            queries: list[tuple[ast.SelectQuery, list[int]]] = []
+            for indexed_query_builders in query_builders_per_date_range.values():
+                query = TrendsCombinedQueryBuilder(
+                    [query_builder for _, query_builder in indexed_query_builders]
+                ).build_query()
+                query.limit = ast.Constant(value=MAX_SELECT_RETURNED_ROWS)
+                queries.append((query, [index for index, _ in indexed_query_builders]))
+
+        return queries
+
     def to_events_query(self, *args, **kwargs) -> ast.SelectQuery:
         with self.timings.measure("trends_to_events_query"):
             query_builder = self._get_trends_actors_query_builder(*args, **kwargs)
@@ -314,7 +357,14 @@ class TrendsQueryRunner(QueryRunner):
         )
 
     def calculate(self):
-        queries = self.to_queries()
+        combined_queries = self.to_combined_queries() if settings.TRENDS_COMBINED_SERIES_QUERIES else None
+        queries: list[ast.SelectQuery | ast.SelectSetQuery]
+        if combined_queries is not None:
+            queries = [query for query, _ in combined_queries]
+            series_indexes = [indexes for _, indexes in combined_queries]
+        else:
+            queries = self.to_queries()
+            series_indexes = [[index] for index in range(len(queries))]
 
         if len(queries) == 0:
             response_hogql = ""
@@ -327,75 +377,44 @@ class TrendsQueryRunner(QueryRunner):
             with self.timings.measure("printing_hogql_for_response"):
                 response_hogql = to_printed_hogql(response_hogql_query, self.team, self.modifiers)
 
-        res_matrix: list[list[Any] | Any | None] = [None] * len(queries)
+        res_matrix: list[list[Any] | Any | None] = [None] * len(self.series)
         timings_matrix: list[list[QueryTiming] | None] = [None] * (2 + len(queries))
-        errors: list[Exception] = []
         debug_errors: list[str] = []
 
-        def run(
-            index: int,
-            query: ast.SelectQuery | ast.SelectSetQuery,
-            timings: HogQLTimings,
-            is_parallel: bool,
-            query_tags: Optional[dict] = None,
-        ):
-            try:
-                if query_tags:
-                    query_tagging.tag_queries(**query_tags)
-
-                series_with_extra = self.series[index]
+        def run(index: int, query: ast.SelectQuery | ast.SelectSetQuery, timings: HogQLTimings) -> None:
+            response = execute_hogql_query(
+                query_type="TrendsQuery",
+                query=query,
+                team=self.team,
+                timings=timings,
+                modifiers=self.modifiers,
+                limit_context=self.limit_context,
+            )
 
-                response = execute_hogql_query(
-                    query_type="TrendsQuery",
-                    query=query,
-                    team=self.team,
-                    timings=timings,
-                    modifiers=self.modifiers,
-                    limit_context=self.limit_context,
+            timings_matrix[index + 1] = response.timings
+            for position, series_index in enumerate(series_indexes[index]):
+                series_response = (
+                    TrendsCombinedQueryBuilder.split_response(response, position)
+                    if combined_queries is not None
+                    else response
                 )
-
-                timings_matrix[index + 1] = response.timings
-                res_matrix[index] = self.build_series_response(response, series_with_extra, len(queries))
-                if response.error:
-                    debug_errors.append(response.error)
-            except Exception as e:
-                errors.append(e)
-            finally:
-                if is_parallel:
-                    from django.db import connection
-
-                    # This will only close the DB connection for the newly spawned thread and not the whole app
-                    connection.close()
+                res_matrix[series_index] = self.build_series_response(
+                    series_response, self.series[series_index], len(self.series)
+                )
+            if response.error:
+                debug_errors.append(response.error)
 
         with self.timings.measure("execute_queries"):
             timings_matrix[0] = self.timings.to_list(back_out_stack=False)
             self.timings.clear_timings()
 
-            # This exists so that we're not spawning threads during unit tests. We can't do
-            # this right now due to the lack of multithreaded support of Django
-            if len(queries) == 1 or settings.IN_UNIT_TESTING:
-                for index, query in enumerate(queries):
-                    run(index, query, self.timings.clone_for_subquery(index), False)
-            else:
-                jobs = [
-                    threading.Thread(
-                        target=run,
-                        args=(
-                            index,
-                            query,
-                            self.timings.clone_for_subquery(index),
-                            True,
-                            query_tagging.get_query_tags(),
-                        ),
-                    )
+            run_in_parallel(
+                [
+                    partial(run, index, query, self.timings.clone_for_subquery(index))
                     for index, query in enumerate(queries)
-                ]
-                [j.start() for j in jobs]  # type:ignore
-                [j.join() for j in jobs]  # type:ignore
-
-        # Raise any errors raised in a seperate thread
-        if len(errors) > 0:
-            raise errors[0]
+                ],
+                team_id=self.team.pk,
+            )
 
         # Flatten res and timings
         returned_results: list[list[dict[str, Any]]] = []
@@ -799,17 +818,23 @@ class TrendsQueryRunner(QueryRunner):
         if has_compare or has_breakdown:
             keys = ["breakdown_value"] if has_breakdown else ["compare_label"]
 
+            # index the results of each series by their breakdown value, keeping the first result of each value
             all_breakdown_values = set()
+            results_by_breakdown_value: list[dict[Any, dict[str, Any]]] = []
             for result in results:
+                result_by_breakdown_value: dict[Any, dict[str, Any]] = {}
                 if isinstance(result, list):
                     for item in result:
                         data = itemgetter(*keys)(item)
-                        all_breakdown_values.add(tuple(data) if isinstance(data, list) else data)
+                        key = tuple(data) if isinstance(data, list) else data
+                        all_breakdown_values.add(key)
+                        result_by_breakdown_value.setdefault(key, item)
+                results_by_breakdown_value.append(result_by_breakdown_value)
 
             # sort the results so that the breakdown values are in the correct order
             sorted_breakdown_values = natsorted(list(all_breakdown_values), alg=ns.IGNORECASE)
 
-            computed_results = []
+            results_groups = []
             for single_or_multiple_breakdown_value in sorted_breakdown_values:
                 breakdown_value = (
                     list(single_or_multiple_breakdown_value)
@@ -817,20 +842,18 @@ class TrendsQueryRunner(QueryRunner):
                     else single_or_multiple_breakdown_value
                 )
 
-                any_result: Optional[dict[str, Any]] = None
-                for result in results:
-                    matching_result = [item for item in result if itemgetter(*keys)(item) == breakdown_value]
-                    if matching_result:
-                        any_result = matching_result[0]
-                        break
+                matching_results = [
+                    result_by_breakdown_value.get(single_or_multiple_breakdown_value)
+                    for result_by_breakdown_value in results_by_breakdown_value
+                ]
+                any_result = next((result for result in matching_results if result is not None), None)
                 if not any_result:
                     continue
                 row_results = []
-                for result in results:
-                    matching_result = [item for item in result if itemgetter(*keys)(item) == breakdown_value]
-                    if matching_result:
+                for matching_result in matching_results:
+                    if matching_result is not None:
                         # Create a deep copy of the matching result to avoid modifying shared data
-                        row_results.append(deepcopy(matching_result[0]))
+                        row_results.append(deepcopy(matching_result))
                     else:
                         row_results.append(
                             {
@@ -844,10 +867,11 @@ class TrendsQueryRunner(QueryRunner):
                                 "days": any_result.get("days"),
                             }
                         )
-                new_result = self.apply_formula_to_results_group(
-                    row_results, formula_node, breakdown_value=breakdown_value, aggregate_values=is_total_value
-                )
-                computed_results.append(new_result)
+                results_groups.append(row_results)
+
+            computed_results = self.apply_formula_to_results_groups(
+                results_groups, formula_node, aggregate_values=is_total_value
+            )
 
             if has_compare:
                 return multisort(computed_results, (("compare_label", False), ("count", True)))
@@ -887,24 +911,47 @@ class TrendsQueryRunner(QueryRunner):
         """
         Applies the formula to a list of results, resulting in a single, computed result.
         """
-        formula = formula_node.formula
-        base_result = results_group[0]
-        base_result["label"] = formula_node.custom_name or f"Formula ({formula})"
-        base_result["action"] = None
+        return TrendsQueryRunner.apply_formula_to_results_groups(
+            [results_group], formula_node, aggregate_values=aggregate_values
+        )[0]
 
+    @staticmethod
+    def apply_formula_to_results_groups(
+        results_groups: list[list[dict[str, Any]]],
+        formula_node: TrendsFormulaNode,
+        *,
+        aggregate_values: Optional[bool] = False,
+    ) -> list[dict[str, Any]]:
+        """
+        Applies the formula to each list of results, e.g. one per breakdown value, resulting in a computed result for
+        each. When all of their series have as many values, the formula is evaluated for all of them at once.
+        """
+        formula = formula_node.formula
         if aggregate_values:
-            series_data = [[s["aggregated_value"]] for s in results_group]
-            new_series_data = FormulaAST(series_data).call(formula)
-            base_result["aggregated_value"] = float(sum(new_series_data))
-            base_result["data"] = None
-            base_result["count"] = 0
+            series_values = [[[s["aggregated_value"]] for s in results_group] for results_group in results_groups]
+        else:
+            series_values = [[s["data"] for s in results_group] for results_group in results_groups]
+
+        if len({len(values) for results_values in series_values for values in results_values}) == 1:
+            # shape (series, groups, values), for the formula to be evaluated over each series as a whole
+            new_series_values = FormulaAST(np.array(series_values, dtype=np.float64).transpose(1, 0, 2)).call(formula)
         else:
-            series_data = [s["data"] for s in results_group]
-            new_series_data = FormulaAST(series_data).call(formula)
-            base_result["data"] = new_series_data
-            base_result["count"] = float(sum(new_series_data))
+            new_series_values = [FormulaAST(results_values).call(formula) for results_values in series_values]
+
+        for results_group, new_series_data in zip(results_groups, new_series_values):
+            base_result = results_group[0]
+            base_result["label"] = formula_node.custom_name or f"Formula ({formula})"
+            base_result["action"] = None
+
+            if aggregate_values:
+                base_result["aggregated_value"] = float(sum(new_series_data))
+                base_result["data"] = None
+                base_result["count"] = 0
+            else:
+                base_result["data"] = new_series_data
+                base_result["count"] = float(sum(new_series_data))
 
-        return base_result
+        return [results_group[0] for results_group in results_groups]
 
     def _is_breakdown_filter_field_boolean(self):
         if (
@@ -1,13 +1,152 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, UTC
-from typing import Optional
+from typing import Any, Optional
 
 from django.conf import settings
 from django.core.cache import cache
+from prometheus_client import Counter
+from redis.lock import Lock
 
 from posthog import redis
-from posthog.cache_utils import OrjsonJsonSerializer
+from posthog.hogql_queries.query_cache_codec import decode_query_cache_data, encode_query_cache_data
 from posthog.utils import get_safe_cache
 
+LOCAL_QUERY_CACHE_COUNTER = Counter(
+    "posthog_query_cache_local_total",
+    "Lookups in the in-process query cache tier, by outcome.",
+    labelnames=["result"],
+)
+
+LOCAL_QUERY_CACHE_EVICTION_COUNTER = Counter(
+    "posthog_query_cache_local_evictions_total",
+    "Entries dropped from the in-process query cache tier, by reason.",
+    labelnames=["reason"],
+)
+
+
+def _parse_last_refresh(last_refresh: Any) -> Optional[datetime]:
+    if isinstance(last_refresh, str):
+        try:
+            last_refresh = datetime.fromisoformat(last_refresh)
+        except ValueError:
+            return None
+    if not isinstance(last_refresh, datetime):
+        return None
+    # Naive timestamps are in UTC, and need a timezone to be comparable with aware ones
+    if last_refresh.tzinfo is None:
+        return last_refresh.replace(tzinfo=UTC)
+    return last_refresh.astimezone(UTC)
+
+
+@dataclass
+class _LocalCacheEntry:
+    payload: bytes
+    expires_at: float
+    last_refresh: Optional[datetime]
+
+
+class LocalQueryCache:
+    """
+    Per-process LRU of serialized query responses, sitting in front of Redis.
+
+    Entries are kept as the same payload that's stored in Redis, and decoded on every hit, so callers get their own
+    response they're free to modify, exactly as they would from Redis. The budget is counted in payload bytes.
+    Entries expire after `ttl_seconds`, as another worker may have written a fresher result to Redis in the meantime.
+    An entry is never replaced by one with an older `last_refresh`.
+    """
+
+    def __init__(self, *, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.current_bytes = 0
+        self._entries: OrderedDict[str, _LocalCacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                LOCAL_QUERY_CACHE_COUNTER.labels(result="miss").inc()
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key, reason="expired")
+                LOCAL_QUERY_CACHE_COUNTER.labels(result="miss").inc()
+                return None
+            self._entries.move_to_end(key)
+        LOCAL_QUERY_CACHE_COUNTER.labels(result="hit").inc()
+        return decode_query_cache_data(entry.payload)
+
+    def set(self, key: str, payload: bytes, *, last_refresh: Any) -> None:
+        """Store the encoded response for `key`, along with the response's `last_refresh`."""
+        if len(payload) > self.max_bytes:
+            # Would evict everything else and still not fit
+            self.invalidate(key)
+            return
+
+        parsed_last_refresh = _parse_last_refresh(last_refresh)
+        with self._lock:
+            existing = self._entries.get(key)
+            if (
+                existing is not None
+                and existing.last_refresh is not None
+                and (parsed_last_refresh is None or parsed_last_refresh < existing.last_refresh)
+            ):
+                # Don't let a slow reader clobber a newer result written in this process
+                return
+            if existing is not None:
+                self._remove(key, reason=None)
+
+            self._entries[key] = _LocalCacheEntry(
+                payload=payload, expires_at=time.monotonic() + self.ttl_seconds, last_refresh=parsed_last_refresh
+            )
+            self.current_bytes += len(payload)
+
+            while self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key, reason="size")
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, reason="invalidated")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: str, *, reason: Optional[str]) -> None:
+        entry = self._entries.pop(key)
+        self.current_bytes -= len(entry.payload)
+        if reason:
+            LOCAL_QUERY_CACHE_EVICTION_COUNTER.labels(reason=reason).inc()
+
+
+_local_query_cache: Optional[LocalQueryCache] = None
+
+
+def get_local_query_cache() -> Optional[LocalQueryCache]:
+    """Return this process's local query cache tier, or None if it's disabled."""
+    global _local_query_cache
+
+    max_bytes = settings.QUERY_CACHE_LOCAL_MAX_BYTES
+    ttl_seconds = settings.QUERY_CACHE_LOCAL_TTL_SECONDS
+    if max_bytes <= 0 or ttl_seconds <= 0:
+        return None
+    if (
+        _local_query_cache is None
+        or _local_query_cache.max_bytes != max_bytes
+        or _local_query_cache.ttl_seconds != ttl_seconds
+    ):
+        _local_query_cache = LocalQueryCache(max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+    return _local_query_cache
+
 
 class QueryCacheManager:
     """
@@ -18,6 +157,8 @@ class QueryCacheManager:
 
     Sorted sets are keyed by team_id.
     'cache_timestamps:{team_id}' -> '{self.insight_id}:{self.dashboard_id or ''}' -> timestamp (epoch time when calculated)
+
+    When enabled, an in-process LRU (see `LocalQueryCache`) is consulted before Redis.
     """
 
     def __init__(
@@ -93,17 +234,38 @@ class QueryCacheManager:
         self.redis_client.zrem(f"cache_timestamps:{self.team_id}", self.identifier)
 
     def set_cache_data(self, *, response: dict, target_age: Optional[datetime]) -> None:
-        fresh_response_serialized = OrjsonJsonSerializer({}).dumps(response)
+        fresh_response_serialized = encode_query_cache_data(response)
         cache.set(self.cache_key, fresh_response_serialized, settings.CACHED_RESULTS_TTL)
 
+        local_cache = get_local_query_cache()
+        if local_cache is not None:
+            local_cache.set(self.cache_key, fresh_response_serialized, last_refresh=response.get("last_refresh"))
+
         if target_age:
             self.update_target_age(target_age)
         else:
             self.remove_last_refresh()
 
-    def get_cache_data(self) -> Optional[dict]:
+    def calculation_lease(self, *, ttl: int) -> Lock:
+        """
+        Redis lease marking that this cache key is being calculated somewhere. Used to coalesce identical concurrent
+        calculations: only the lease holder runs the query, others wait for its result to land in the cache.
+        The lease expires after `ttl` seconds, in case the holder dies without releasing it.
+        """
+        return self.redis_client.lock(f"query_calculation_lease:{self.cache_key}", timeout=ttl, blocking=False)
+
+    def get_cache_data(self, *, use_local_cache: bool = True) -> Optional[dict]:
+        local_cache = get_local_query_cache() if use_local_cache else None
+        if local_cache is not None:
+            local_response = local_cache.get(self.cache_key)
+            if local_response is not None:
+                return local_response
+
         cached_response_bytes: Optional[bytes] = get_safe_cache(self.cache_key)
         if not cached_response_bytes:
             return None
 
-        return OrjsonJsonSerializer({}).loads(cached_response_bytes)
+        cached_response: Any = decode_query_cache_data(cached_response_bytes)
+        if local_cache is not None and isinstance(cached_response, dict):
+            local_cache.set(self.cache_key, cached_response_bytes, last_refresh=cached_response.get("last_refresh"))
+        return cached_response
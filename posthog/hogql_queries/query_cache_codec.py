@@ -0,0 +1,117 @@
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+from django.conf import settings
+
+from posthog.cache_utils import OrjsonJsonSerializer
+
+# Versioned payloads start with this header, followed by a single version byte.
+# Legacy payloads are plain orjson, which can never start with a NUL byte.
+CODEC_HEADER = b"\x00phqc"
+
+
+class QueryCacheCodec(ABC):
+    """Encodes query responses for storage in the query results cache."""
+
+    version: int
+
+    @abstractmethod
+    def encode(self, response: dict) -> bytes:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def decode(self, payload: bytes) -> Any:
+        raise NotImplementedError()
+
+
+class OrjsonQueryCacheCodec(QueryCacheCodec):
+    """The original format: the whole response as orjson, without a header."""
+
+    version = 0
+
+    def encode(self, response: dict) -> bytes:
+        return OrjsonJsonSerializer({}).dumps(response)
+
+    def decode(self, payload: bytes) -> Any:
+        return OrjsonJsonSerializer({}).loads(payload)
+
+
+class ColumnarQueryCacheCodec(QueryCacheCodec):
+    """
+    Stores `results` column by column when it's tabular.
+
+    Handles both lists of equal-length rows (e.g. `HogQLQueryResponse`) and lists of dicts sharing the same keys
+    (e.g. trends series). Dict keys are then stored once instead of once per row, and values of the same column end
+    up next to each other, which the zstd compression of the Redis cache client (see `TolerantZlibCompressor`) picks
+    up much better on large breakdowns. Anything else is stored as-is.
+    """
+
+    version = 1
+
+    def encode(self, response: dict) -> bytes:
+        results = response.get("results")
+        layout, keys, columns = self._to_columns(results)
+        envelope = {
+            "layout": layout,
+            "keys": keys,
+            "columns": columns if layout != "raw" else results,
+            "response": {key: value for key, value in response.items() if key != "results"},
+            "has_results": "results" in response,
+        }
+        return CODEC_HEADER + bytes([self.version]) + OrjsonJsonSerializer({}).dumps(envelope)
+
+    def decode(self, payload: bytes) -> Any:
+        envelope = OrjsonJsonSerializer({}).loads(payload[len(CODEC_HEADER) + 1 :])
+        response = envelope["response"]
+        if envelope["has_results"]:
+            layout, columns = envelope["layout"], envelope["columns"]
+            if layout == "rows":
+                response["results"] = [list(row) for row in zip(*columns)]
+            elif layout == "records":
+                keys = envelope["keys"]
+                response["results"] = [dict(zip(keys, row)) for row in zip(*columns)]
+            else:
+                response["results"] = columns
+        return response
+
+    @staticmethod
+    def _to_columns(results: Any) -> tuple[str, Optional[list[str]], Optional[list[list]]]:
+        if not isinstance(results, list) or len(results) == 0:
+            return "raw", None, None
+
+        first = results[0]
+        if isinstance(first, list | tuple):
+            width = len(first)
+            if width > 0 and all(isinstance(row, list | tuple) and len(row) == width for row in results):
+                return "rows", None, [list(column) for column in zip(*results)]
+        elif isinstance(first, dict):
+            keys = list(first.keys())
+            if all(isinstance(key, str) for key in keys) and all(
+                isinstance(row, dict) and list(row.keys()) == keys for row in results
+            ):
+                return "records", keys, [[row[key] for row in results] for key in keys]
+
+        return "raw", None, None
+
+
+QUERY_CACHE_CODECS: dict[str, QueryCacheCodec] = {
+    "orjson": OrjsonQueryCacheCodec(),
+    "columnar": ColumnarQueryCacheCodec(),
+}
+
+_CODECS_BY_VERSION: dict[int, QueryCacheCodec] = {codec.version: codec for codec in QUERY_CACHE_CODECS.values()}
+
+
+def encode_query_cache_data(response: dict) -> bytes:
+    return QUERY_CACHE_CODECS[settings.QUERY_CACHE_CODEC].encode(response)
+
+
+def decode_query_cache_data(payload: bytes) -> Any:
+    """Decode a cached response, whichever codec it was written with."""
+    if payload.startswith(CODEC_HEADER):
+        version = payload[len(CODEC_HEADER)]
+        codec = _CODECS_BY_VERSION.get(version)
+        if codec is None:
+            raise ValueError(f"Unknown query cache codec version: {version}")
+        return codec.decode(payload)
+    return _CODECS_BY_VERSION[OrjsonQueryCacheCodec.version].decode(payload)
@@ -1,4 +1,7 @@
+import time
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import UTC, datetime, timedelta
 from enum import StrEnum
 from types import UnionType
@@ -7,6 +10,8 @@ from typing import Any, Generic, Optional, TypeGuard, TypeVar, Union, cast, get_
 import structlog
 from prometheus_client import Counter
 from pydantic import BaseModel, ConfigDict
+from redis.exceptions import LockError, RedisError
+from redis.lock import Lock
 from sentry_sdk import get_traceparent, push_scope, set_tag
 
 from posthog import settings
@@ -18,15 +23,16 @@ from posthog.clickhouse.client.limit import (
     get_app_org_rate_limiter,
     get_app_dashboard_queries_rate_limiter,
 )
+from posthog.clickhouse.cluster import ExponentialBackoff
 from posthog.clickhouse.query_tagging import get_query_tag_value, tag_queries
 from posthog.exceptions_capture import capture_exception
 from posthog.hogql import ast
-from posthog.hogql.constants import LimitContext
+from posthog.hogql.constants import HogQLGlobalSettings, LimitContext
 from posthog.hogql.context import HogQLContext
 from posthog.hogql.database.database import Database, create_hogql_database
 from posthog.hogql.modifiers import create_default_modifiers_for_user
 from posthog.hogql.printer import print_ast
-from posthog.hogql.query import create_default_modifiers_for_team
+from posthog.hogql.query import INCREASED_MAX_EXECUTION_TIME_LIMIT_CONTEXTS, create_default_modifiers_for_team
 from posthog.hogql.timings import HogQLTimings
 from posthog.hogql_queries.query_cache import QueryCacheManager
 from posthog.metrics import LABEL_TEAM_ID
@@ -92,8 +98,16 @@ QUERY_CACHE_HIT_COUNTER = Counter(
     labelnames=[LABEL_TEAM_ID, "cache_hit", "trigger"],
 )
 
+QUERY_CALCULATION_COALESCING_COUNTER = Counter(
+    "posthog_query_calculation_coalescing_total",
+    "Outcome of coalescing identical concurrent query calculations.",
+    labelnames=["outcome"],
+)
+
 EXTENDED_CACHE_AGE = timedelta(days=1)
 
+COALESCING_POLL_BACKOFF = ExponentialBackoff(0.1, max_delay=1.0, exp=1.5)
+
 
 class ExecutionMode(StrEnum):
     CALCULATE_BLOCKING_ALWAYS = "force_blocking"
@@ -862,65 +876,160 @@ class QueryRunner(ABC, Generic[Q, R, CR]):
             if results:
                 return results
 
-        last_refresh = datetime.now(UTC)
-        target_age = self.cache_target_age(last_refresh=last_refresh)
+        with self._coalesce_calculation(cache_manager) as coalesced_response:
+            if coalesced_response is not None:
+                return coalesced_response
 
-        # Avoid affecting cache key
-        # Add user based modifiers here, primarily for user specific feature flagging
-        if user:
-            self.modifiers = create_default_modifiers_for_user(user, self.team, self.modifiers)
-            self.modifiers.useMaterializedViews = True
+            last_refresh = datetime.now(UTC)
+            target_age = self.cache_target_age(last_refresh=last_refresh)
 
-        concurrency_limit = self.get_api_queries_concurrency_limit()
-        with get_api_personal_rate_limiter().run(
-            is_api=self.is_query_service,
-            team_id=self.team.pk,
-            org_id=self.team.organization_id,
-            task_id=self.query_id,
-            limit=concurrency_limit,
-        ):
-            if self.is_query_service:
-                tag_queries(chargeable=1)
+            # Avoid affecting cache key
+            # Add user based modifiers here, primarily for user specific feature flagging
+            if user:
+                self.modifiers = create_default_modifiers_for_user(user, self.team, self.modifiers)
+                self.modifiers.useMaterializedViews = True
 
-            with get_app_org_rate_limiter().run(
+            concurrency_limit = self.get_api_queries_concurrency_limit()
+            with get_api_personal_rate_limiter().run(
+                is_api=self.is_query_service,
+                team_id=self.team.pk,
                 org_id=self.team.organization_id,
                 task_id=self.query_id,
-                team_id=self.team.id,
-                is_api=get_query_tag_value("access_method") == "personal_api_key",
+                limit=concurrency_limit,
             ):
-                with get_app_dashboard_queries_rate_limiter().run(
+                if self.is_query_service:
+                    tag_queries(chargeable=1)
+
+                with get_app_org_rate_limiter().run(
                     org_id=self.team.organization_id,
-                    dashboard_id=dashboard_id,
                     task_id=self.query_id,
                     team_id=self.team.id,
                     is_api=get_query_tag_value("access_method") == "personal_api_key",
                 ):
-                    fresh_response_dict = {
-                        **self.calculate().model_dump(),
-                        "is_cached": False,
-                        "last_refresh": last_refresh,
-                        "next_allowed_client_refresh": last_refresh + self._refresh_frequency(),
-                        "cache_key": cache_key,
-                        "timezone": self.team.timezone,
-                        "cache_target_age": target_age,
-                    }
-        if get_query_tag_value("trigger"):
-            fresh_response_dict["calculation_trigger"] = get_query_tag_value("trigger")
-        fresh_response = CachedResponse(**fresh_response_dict)
-
-        # Don't cache debug queries with errors and export queries
-        has_error: Optional[list] = fresh_response_dict.get("error", None)
-        if (has_error is None or len(has_error) == 0) and self.limit_context != LimitContext.EXPORT:
-            cache_manager.set_cache_data(
-                response=fresh_response_dict,
-                # This would be a possible place to decide to not ever keep this cache warm
-                # Example: Not for super quickly calculated insights
-                # Set target_age to None in that case
-                target_age=target_age,
-            )
-            QUERY_CACHE_WRITE_COUNTER.labels(team_id=self.team.pk).inc()
+                    with get_app_dashboard_queries_rate_limiter().run(
+                        org_id=self.team.organization_id,
+                        dashboard_id=dashboard_id,
+                        task_id=self.query_id,
+                        team_id=self.team.id,
+                        is_api=get_query_tag_value("access_method") == "personal_api_key",
+                    ):
+                        fresh_response_dict = {
+                            **self.calculate().model_dump(),
+                            "is_cached": False,
+                            "last_refresh": last_refresh,
+                            "next_allowed_client_refresh": last_refresh + self._refresh_frequency(),
+                            "cache_key": cache_key,
+                            "timezone": self.team.timezone,
+                            "cache_target_age": target_age,
+                        }
+            if get_query_tag_value("trigger"):
+                fresh_response_dict["calculation_trigger"] = get_query_tag_value("trigger")
+            fresh_response = CachedResponse(**fresh_response_dict)
+
+            # Don't cache debug queries with errors and export queries
+            has_error: Optional[list] = fresh_response_dict.get("error", None)
+            if (has_error is None or len(has_error) == 0) and self.limit_context != LimitContext.EXPORT:
+                cache_manager.set_cache_data(
+                    response=fresh_response_dict,
+                    # This would be a possible place to decide to not ever keep this cache warm
+                    # Example: Not for super quickly calculated insights
+                    # Set target_age to None in that case
+                    target_age=target_age,
+                )
+                QUERY_CACHE_WRITE_COUNTER.labels(team_id=self.team.pk).inc()
 
-        return fresh_response
+            return fresh_response
+
+    @contextmanager
+    def _coalesce_calculation(self, cache_manager: QueryCacheManager) -> Iterator[Optional[CR]]:
+        """
+        Single-flight for identical calculations across processes, keyed on the cache key.
+
+        The first caller takes a lease in Redis and calculates, while the others wait (bounded by
+        QUERY_CALCULATION_COALESCING_WAIT_SECONDS) for the result to land in the cache and yield it instead.
+        If the lease holder fails or dies, or the wait times out, waiters fall back to calculating themselves.
+        """
+        wait_seconds = settings.QUERY_CALCULATION_COALESCING_WAIT_SECONDS
+        if wait_seconds <= 0 or self.limit_context == LimitContext.EXPORT:
+            # Export results aren't cached, so there would be nothing to wait for
+            yield None
+            return
+
+        lease = cache_manager.calculation_lease(ttl=self._calculation_lease_ttl())
+        try:
+            has_lease = lease.acquire()
+        except RedisError:
+            # Coalescing is an optimization, don't fail the query because of it
+            logger.exception("query_calculation_lease_failed", cache_key=cache_manager.cache_key)
+            yield None
+            return
+
+        if not has_lease:
+            coalesced_response = self._wait_for_coalesced_calculation(cache_manager, lease, wait_seconds)
+            if coalesced_response is not None:
+                QUERY_CALCULATION_COALESCING_COUNTER.labels(outcome="waited_for_result").inc()
+                yield coalesced_response
+                return
+            try:
+                has_lease = lease.acquire()
+            except RedisError:
+                logger.exception("query_calculation_lease_failed", cache_key=cache_manager.cache_key)
+                has_lease = False
+            QUERY_CALCULATION_COALESCING_COUNTER.labels(outcome="fallback").inc()
+        else:
+            QUERY_CALCULATION_COALESCING_COUNTER.labels(outcome="leader").inc()
+
+        try:
+            yield None
+        finally:
+            if has_lease:
+                try:
+                    lease.release()
+                except LockError:
+                    # The lease expired while calculating, someone else may hold it now
+                    pass
+
+    def _calculation_lease_ttl(self) -> int:
+        """
+        How long a calculation lease is held at most, i.e. as long as the query may run in ClickHouse, plus a margin
+        for the rest of the calculation. So a dead lease holder doesn't block others for longer than needed, while a
+        long but healthy calculation isn't duplicated.
+        """
+        max_execution_time = HogQLGlobalSettings().max_execution_time or 0
+        if self.limit_context in INCREASED_MAX_EXECUTION_TIME_LIMIT_CONTEXTS:
+            max_execution_time = max(max_execution_time, settings.HOGQL_INCREASED_MAX_EXECUTION_TIME)
+        return max_execution_time + settings.QUERY_CALCULATION_LEASE_MARGIN_SECONDS
+
+    def _wait_for_coalesced_calculation(
+        self, cache_manager: QueryCacheManager, lease: Lock, wait_seconds: float
+    ) -> Optional[CR]:
+        previous_response = cache_manager.get_cache_data(use_local_cache=False)
+        previous_last_refresh = previous_response.get("last_refresh") if isinstance(previous_response, dict) else None
+
+        deadline = time.monotonic() + wait_seconds
+        attempt = 1
+        while time.monotonic() < deadline:
+            time.sleep(min(COALESCING_POLL_BACKOFF(attempt), max(deadline - time.monotonic(), 0)))
+            attempt += 1
+
+            cached_response_candidate = cache_manager.get_cache_data(use_local_cache=False)
+            if (
+                self.is_cached_response(cached_response_candidate)
+                and cached_response_candidate.get("last_refresh") != previous_last_refresh
+            ):
+                # The lease holder has written a fresh result
+                cached_response_candidate["is_cached"] = True
+                try:
+                    return self.cached_response_type(**cached_response_candidate)
+                except Exception as e:
+                    capture_exception(Exception(f"Error parsing cached response: {e}"))
+                    return None
+
+            if not lease.locked():
+                # The lease holder is done, but didn't cache anything (e.g. it errored or died)
+                return None
+
+        return None
 
     def get_api_queries_concurrency_limit(self):
         """
@@ -0,0 +1,172 @@
+from datetime import UTC, datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from posthog.hogql_queries.query_cache import LocalQueryCache, QueryCacheManager
+from posthog.hogql_queries.query_cache_codec import (
+    CODEC_HEADER,
+    ColumnarQueryCacheCodec,
+    OrjsonQueryCacheCodec,
+    decode_query_cache_data,
+    encode_query_cache_data,
+)
+from posthog.test.base import BaseTest
+
+
+class TestLocalQueryCache(BaseTest):
+    def test_get_returns_copy(self):
+        local_cache = LocalQueryCache(max_bytes=100, ttl_seconds=10)
+        local_cache.set("key", encode_query_cache_data({"results": [[1, 2], [3]]}), last_refresh=None)
+
+        response = local_cache.get("key")
+        assert response == {"results": [[1, 2], [3]]}
+        response["is_cached"] = True
+        response["results"][0].append(4)
+
+        assert local_cache.get("key") == {"results": [[1, 2], [3]]}
+
+    def test_evicts_least_recently_used_when_over_budget(self):
+        payloads = {key: encode_query_cache_data({"results": key}) for key in ("a", "b", "c")}
+        size = len(payloads["a"])
+        local_cache = LocalQueryCache(max_bytes=size * 2 + 1, ttl_seconds=10)
+        local_cache.set("a", payloads["a"], last_refresh=None)
+        local_cache.set("b", payloads["b"], last_refresh=None)
+        local_cache.get("a")
+        local_cache.set("c", payloads["c"], last_refresh=None)
+
+        assert local_cache.get("a") == {"results": "a"}
+        assert local_cache.get("b") is None
+        assert local_cache.get("c") == {"results": "c"}
+        assert local_cache.current_bytes == size * 2
+
+    def test_skips_entries_larger_than_budget(self):
+        local_cache = LocalQueryCache(max_bytes=100, ttl_seconds=10)
+        local_cache.set("a", encode_query_cache_data({"results": "a"}), last_refresh=None)
+        local_cache.set("b", encode_query_cache_data({"results": "b" * 100}), last_refresh=None)
+
+        assert local_cache.get("a") == {"results": "a"}
+        assert local_cache.get("b") is None
+
+    def test_expires_entries(self):
+        local_cache = LocalQueryCache(max_bytes=100, ttl_seconds=10)
+        with mock.patch("posthog.hogql_queries.query_cache.time.monotonic", return_value=1000):
+            local_cache.set("a", encode_query_cache_data({"results": "a"}), last_refresh=None)
+        with mock.patch("posthog.hogql_queries.query_cache.time.monotonic", return_value=1009):
+            assert local_cache.get("a") == {"results": "a"}
+        with mock.patch("posthog.hogql_queries.query_cache.time.monotonic", return_value=1011):
+            assert local_cache.get("a") is None
+        assert local_cache.current_bytes == 0
+
+    def test_does_not_replace_newer_result(self):
+        local_cache = LocalQueryCache(max_bytes=100, ttl_seconds=10)
+        local_cache.set("a", encode_query_cache_data({"results": "new"}), last_refresh="2024-01-02T00:00:00Z")
+        local_cache.set("a", encode_query_cache_data({"results": "old"}), last_refresh="2024-01-01T00:00:00Z")
+
+        response = local_cache.get("a")
+        assert response is not None
+        assert response["results"] == "new"
+
+        payload = encode_query_cache_data({"results": "newer"})
+        local_cache.set("a", payload, last_refresh="2024-01-03T00:00:00.123Z")
+        response = local_cache.get("a")
+        assert response is not None
+        assert response["results"] == "newer"
+        assert local_cache.current_bytes == len(payload)
+
+    def test_compares_naive_and_aware_last_refresh(self):
+        local_cache = LocalQueryCache(max_bytes=100, ttl_seconds=10)
+        local_cache.set("a", encode_query_cache_data({"results": "new"}), last_refresh=datetime(2024, 1, 2, tzinfo=UTC))
+        local_cache.set("a", encode_query_cache_data({"results": "old"}), last_refresh="2024-01-01T00:00:00")
+        local_cache.set("a", encode_query_cache_data({"results": "old"}), last_refresh=datetime(2024, 1, 1, 12))
+
+        response = local_cache.get("a")
+        assert response is not None
+        assert response["results"] == "new"
+
+        local_cache.set("a", encode_query_cache_data({"results": "newer"}), last_refresh="2024-01-02T01:00:00+01:00")
+        local_cache.set("a", encode_query_cache_data({"results": "newest"}), last_refresh="2024-01-02T00:30:00")
+
+        response = local_cache.get("a")
+        assert response is not None
+        assert response["results"] == "newest"
+
+
+@override_settings(QUERY_CACHE_LOCAL_MAX_BYTES=10_000, QUERY_CACHE_LOCAL_TTL_SECONDS=60)
+class TestQueryCacheManagerLocalTier(BaseTest):
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_local_tier_serves_repeated_reads(self):
+        manager = QueryCacheManager(team_id=self.team.pk, cache_key="local_tier_test")
+        manager.set_cache_data(response={"results": [1], "last_refresh": "2024-01-01T00:00:00Z"}, target_age=None)
+
+        with mock.patch("posthog.hogql_queries.query_cache.get_safe_cache") as mock_get_safe_cache:
+            assert manager.get_cache_data() == {"results": [1], "last_refresh": "2024-01-01T00:00:00Z"}
+            mock_get_safe_cache.assert_not_called()
+
+    def test_local_tier_hands_out_separate_responses(self):
+        manager = QueryCacheManager(team_id=self.team.pk, cache_key="local_tier_test_copies")
+        manager.set_cache_data(response={"results": [[1, 2]]}, target_age=None)
+
+        response = manager.get_cache_data()
+        assert response is not None
+        response["results"][0].append(3)
+
+        assert manager.get_cache_data() == {"results": [[1, 2]]}
+
+    def test_newer_write_replaces_local_entry(self):
+        manager = QueryCacheManager(team_id=self.team.pk, cache_key="local_tier_test_replace")
+        manager.set_cache_data(response={"results": [1], "last_refresh": "2024-01-01T00:00:00Z"}, target_age=None)
+        manager.get_cache_data()
+        manager.set_cache_data(response={"results": [2], "last_refresh": "2024-01-01T00:05:00Z"}, target_age=None)
+
+        response = manager.get_cache_data()
+        assert response is not None
+        assert response["results"] == [2]
+
+
+class TestQueryCacheCodec(BaseTest):
+    def test_columnar_round_trips_tabular_results(self):
+        response = {"results": [["a", 1, None], ["b", 2, [1, 2]]], "columns": ["x", "y", "z"], "is_cached": False}
+        payload = ColumnarQueryCacheCodec().encode(response)
+
+        assert payload.startswith(CODEC_HEADER)
+        assert decode_query_cache_data(payload) == response
+
+    def test_columnar_round_trips_series_results(self):
+        response = {
+            "results": [
+                {"data": [1, 2], "days": ["2024-01-01", "2024-01-02"], "label": "a"},
+                {"data": [3, 4], "days": ["2024-01-01", "2024-01-02"], "label": "b"},
+            ],
+            "last_refresh": datetime(2024, 1, 2, tzinfo=UTC),
+        }
+
+        assert decode_query_cache_data(ColumnarQueryCacheCodec().encode(response)) == {
+            **response,
+            "last_refresh": "2024-01-02T00:00:00Z",
+        }
+
+    def test_columnar_stores_irregular_results_as_is(self):
+        for results in [[], [["a", 1], ["b"]], [{"a": 1}, {"b": 2}], [1, 2, 3], {"a": 1}]:
+            response = {"results": results}
+            assert decode_query_cache_data(ColumnarQueryCacheCodec().encode(response)) == response
+
+        assert decode_query_cache_data(ColumnarQueryCacheCodec().encode({"error": "x"})) == {"error": "x"}
+
+    def test_reads_legacy_payloads(self):
+        response = {"results": [["a", 1]], "is_cached": False}
+
+        assert decode_query_cache_data(OrjsonQueryCacheCodec().encode(response)) == response
+
+    @override_settings(QUERY_CACHE_CODEC="columnar")
+    def test_query_cache_manager_writes_with_configured_codec(self):
+        manager = QueryCacheManager(team_id=self.team.pk, cache_key="codec_test")
+        manager.set_cache_data(response={"results": [["a", 1]]}, target_age=None)
+
+        assert cache.get("codec_test").startswith(CODEC_HEADER)
+        assert manager.get_cache_data() == {"results": [["a", 1]]}
+        cache.clear()
@@ -6,7 +6,12 @@ from zoneinfo import ZoneInfo
 from django.core.cache import cache
 from freezegun import freeze_time
 from pydantic import BaseModel
+from redis.exceptions import RedisError
+from redis.lock import Lock
 
+from posthog import settings
+from posthog.hogql.constants import LimitContext
+from posthog.hogql_queries.query_cache import QueryCacheManager
 from posthog.hogql_queries.query_runner import ExecutionMode, QueryRunner
 from posthog.models.team.team import Team
 from posthog.schema import (
@@ -249,6 +254,70 @@ class TestQueryRunner(BaseTest):
             self.assertEqual(response.last_refresh.isoformat(), "2023-02-04T13:37:42+00:00")
             mock_on_commit.assert_called_once()
 
+    @mock.patch("posthog.hogql_queries.query_runner.time.sleep")
+    def test_coalesces_identical_calculations(self, mock_sleep):
+        TestQueryRunner = self.setup_test_query_runner_class()
+        runner = TestQueryRunner(query={"some_attr": "bla"}, team=self.team)
+        other_runner = TestQueryRunner(query={"some_attr": "bla"}, team=self.team)
+
+        lease = QueryCacheManager(team_id=self.team.pk, cache_key=runner.get_cache_key()).calculation_lease(ttl=60)
+        self.assertTrue(lease.acquire())
+
+        def finish_calculation_elsewhere(_):
+            with mock.patch.object(settings, "QUERY_CALCULATION_COALESCING_WAIT_SECONDS", 0):
+                other_runner.run(execution_mode=ExecutionMode.CALCULATE_BLOCKING_ALWAYS)
+            lease.release()
+
+        mock_sleep.side_effect = finish_calculation_elsewhere
+
+        with mock.patch.object(settings, "QUERY_CALCULATION_COALESCING_WAIT_SECONDS", 5):
+            response = runner.run(execution_mode=ExecutionMode.RECENT_CACHE_CALCULATE_BLOCKING_IF_STALE)
+
+        self.assertIsInstance(response, TestCachedBasicQueryResponse)
+        self.assertEqual(response.is_cached, True)
+        mock_sleep.assert_called_once()
+
+    @mock.patch("posthog.hogql_queries.query_runner.time.sleep")
+    def test_coalescing_falls_back_to_calculating_when_lease_holder_fails(self, mock_sleep):
+        TestQueryRunner = self.setup_test_query_runner_class()
+        runner = TestQueryRunner(query={"some_attr": "bla"}, team=self.team)
+
+        lease = QueryCacheManager(team_id=self.team.pk, cache_key=runner.get_cache_key()).calculation_lease(ttl=60)
+        self.assertTrue(lease.acquire())
+        mock_sleep.side_effect = lambda _: lease.release()
+
+        with mock.patch.object(settings, "QUERY_CALCULATION_COALESCING_WAIT_SECONDS", 5):
+            response = runner.run(execution_mode=ExecutionMode.RECENT_CACHE_CALCULATE_BLOCKING_IF_STALE)
+
+        self.assertIsInstance(response, TestCachedBasicQueryResponse)
+        self.assertEqual(response.is_cached, False)
+
+    @mock.patch("posthog.hogql_queries.query_runner.time.sleep")
+    def test_coalescing_falls_back_to_calculating_when_lease_fails_after_waiting(self, mock_sleep):
+        TestQueryRunner = self.setup_test_query_runner_class()
+        runner = TestQueryRunner(query={"some_attr": "bla"}, team=self.team)
+
+        with (
+            mock.patch.object(settings, "QUERY_CALCULATION_COALESCING_WAIT_SECONDS", 5),
+            mock.patch.object(Lock, "acquire", side_effect=[False, RedisError("Connection reset by peer")]),
+        ):
+            response = runner.run(execution_mode=ExecutionMode.RECENT_CACHE_CALCULATE_BLOCKING_IF_STALE)
+
+        self.assertIsInstance(response, TestCachedBasicQueryResponse)
+        self.assertEqual(response.is_cached, False)
+
+    def test_calculation_lease_lasts_as_long_as_the_query_may_run(self):
+        TestQueryRunner = self.setup_test_query_runner_class()
+
+        runner = TestQueryRunner(query={"some_attr": "bla"}, team=self.team)
+        self.assertEqual(runner._calculation_lease_ttl(), 60 + settings.QUERY_CALCULATION_LEASE_MARGIN_SECONDS)
+
+        runner = TestQueryRunner(query={"some_attr": "bla"}, team=self.team, limit_context=LimitContext.QUERY_ASYNC)
+        self.assertEqual(
+            runner._calculation_lease_ttl(),
+            settings.HOGQL_INCREASED_MAX_EXECUTION_TIME + settings.QUERY_CALCULATION_LEASE_MARGIN_SECONDS,
+        )
+
     def test_modifier_passthrough(self):
         try:
             from ee.clickhouse.materialized_columns.analyze import materialize
@@ -2,9 +2,43 @@ import ast
 import operator
 from typing import Any
 
+import numpy as np
+
+
+def _pow(left: Any, right: Any) -> Any:
+    try:
+        return left**right
+    except ZeroDivisionError:
+        return 0
+
+
+class _ComplexValuesError(Exception):
+    pass
+
 
 class FormulaAST:
+    """
+    Evaluates a formula over series, named `A`, `B`, ... in order, for all of their points at once.
+
+    `data` is either a list of series, of which only as many points as the shortest series has are used, or an array
+    with the series on its first axis, e.g. of shape `(series, breakdown values, points)` to evaluate the formula for
+    many breakdown values in one go. Points where the formula divides by zero are 0. All values are floats, including
+    those of formulas with integers only (`2` is `2.0`), except for complex powers (e.g. `(-8)**(1/3)`), as in Python.
+    Formulas with complex powers are evaluated point by point with Python's operators, so that they behave just as in
+    Python (e.g. `%` of a complex number raises) while points with real values stay floats.
+    """
+
     op_map = {
+        ast.Add: np.add,
+        ast.Sub: np.subtract,
+        ast.Mult: np.multiply,
+        ast.Div: np.true_divide,
+        ast.Mod: np.mod,
+        # Python's `**` point by point, as `np.power` differs in precision (`5**-1` isn't exactly 0.2) and returns nan
+        # for complex powers
+        ast.Pow: np.frompyfunc(_pow, 2, 1),
+    }
+    python_op_map = {
         ast.Add: operator.add,
         ast.Sub: operator.sub,
         ast.Mult: operator.mul,
@@ -12,20 +46,59 @@ class FormulaAST:
         ast.Mod: operator.mod,
         ast.Pow: operator.pow,
     }
-    zipped_data: list[tuple[float]]
+    data: np.ndarray
+
+    def __init__(self, data: list[list[float]] | np.ndarray):
+        if isinstance(data, np.ndarray):
+            self.data = data.astype(np.float64, copy=False)
+        else:
+            length = min((len(series) for series in data), default=0)
+            self.data = np.array([series[:length] for series in data], dtype=np.float64).reshape(len(data), length)
+
+    def call(self, node: str) -> list:
+        return self.evaluate(node).tolist()
+
+    def evaluate(self, node: str) -> np.ndarray:
+        """The values of the formula, as an array of the shape of the data without its first (series) axis."""
+        shape = self.data.shape[1:]
+        if self.data.size == 0:
+            return np.zeros(shape)
+        # `[index, ...]` keeps series of one dimensional data arrays, as opposed to the scalars iterating would give
+        const_map = {chr(ord("`") + index + 1): self.data[index, ...] for index in range(len(self.data))}
+        try:
+            return self._broadcast(self._evaluate(node.lower(), const_map), shape)
+        except _ComplexValuesError:
+            return self._evaluate_points(node.lower(), shape)
+
+    def _evaluate_points(self, node: str, shape: tuple[int, ...]) -> np.ndarray:
+        points = []
+        for index in np.ndindex(shape):
+            const_map = {
+                chr(ord("`") + series + 1): self.data[(series, *index)].item() for series in range(len(self.data))
+            }
+            points.append(self._real_as_float(self._evaluate(node, const_map)))
+        values = np.array(points, dtype=object)
+        return values.reshape(shape + values.shape[1:])
+
+    @classmethod
+    def _real_as_float(cls, value: Any) -> Any:
+        if isinstance(value, list):
+            return [cls._real_as_float(sub_value) for sub_value in value]
+        return value if isinstance(value, complex) else float(value)
 
-    def __init__(self, data: list[list[float]]):
-        self.zipped_data = list(zip(*data))
+    @classmethod
+    def _broadcast(cls, values: Any, shape: tuple[int, ...]) -> np.ndarray:
+        if isinstance(values, list):
+            # A formula with multiple expressions has a list of their values for each point
+            return np.stack([cls._broadcast(value, shape) for value in values], axis=-1)
+        return np.broadcast_to(np.asarray(values, dtype=np.result_type(values, np.float64)), shape)
 
-    def call(self, node: str):
-        res = []
-        for consts in self.zipped_data:
-            map = {}
-            for index, value in enumerate(consts):
-                map[chr(ord("`") + index + 1)] = value
-            result = self._evaluate(node.lower(), map)
-            res.append(result)
-        return res
+    @staticmethod
+    def _from_python_values(values: Any) -> np.ndarray:
+        try:
+            return np.asarray(values, dtype=object).astype(np.float64)
+        except TypeError:
+            raise _ComplexValuesError()
 
     def _evaluate(self, node, const_map: dict[str, Any]):
         if isinstance(node, list | tuple):
@@ -49,12 +122,28 @@ class FormulaAST:
             left = self._evaluate(node.left, const_map)
             op = node.op
             right = self._evaluate(node.right, const_map)
+            if not isinstance(left, np.ndarray | np.generic) and not isinstance(right, np.ndarray | np.generic):
+                # Constants, or points evaluated one by one
+                try:
+                    return self.python_op_map[type(op)](left, right)
+                except ZeroDivisionError:
+                    return 0
+                except KeyError:
+                    raise ValueError(f"Operator {op.__class__.__name__} not supported")
+            if np.iscomplexobj(left) or np.iscomplexobj(right):
+                raise _ComplexValuesError()
             try:
-                return self.op_map[type(op)](left, right)
-            except ZeroDivisionError:
-                return 0
+                operation = self.op_map[type(op)]
             except KeyError:
                 raise ValueError(f"Operator {op.__class__.__name__} not supported")
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                result = operation(left, right)
+            # 0 for the points where the operation is a division by zero, like for `ZeroDivisionError` in Python
+            if isinstance(op, ast.Div | ast.Mod):
+                return np.where(np.equal(right, 0), 0, result)
+            if isinstance(op, ast.Pow):
+                return self._from_python_values(result)
+            return result
 
         elif isinstance(node, ast.UnaryOp):
             operand = self._evaluate(node.operand, const_map)
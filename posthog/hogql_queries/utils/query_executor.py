@@ -0,0 +1,172 @@
+"""
+Running the queries of a query runner in parallel, e.g. one per series of a trends query.
+
+All runners share one process-wide pool of threads, so a worker doesn't spawn (and thrash) a thread per query. On top of
+the size of the pool, how many queries of a single call run at once and how many of a team's queries run at once across
+the process are capped, so that a single insight with many series can't spike ClickHouse concurrency on its own.
+"""
+
+import contextvars
+import threading
+from collections import deque
+from collections.abc import Callable, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Optional, TypeVar
+
+from django.conf import settings
+
+from posthog.clickhouse import query_tagging
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# The slots of the teams with queries running, along with how many calls and jobs are using them
+_team_slots: dict[int, tuple[threading.BoundedSemaphore, int]] = {}
+_team_slots_lock = threading.Lock()
+
+# Whether the current thread is one of the pool's, running a job
+_thread_local = threading.local()
+
+
+class QueryCancelledException(Exception):
+    """Raised for queries that weren't run because another query of the same call failed."""
+
+
+def get_query_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.QUERY_RUNNER_EXECUTOR_MAX_WORKERS, thread_name_prefix="query_runner"
+            )
+        return _executor
+
+
+def _get_team_slots(team_id: int) -> threading.BoundedSemaphore:
+    """The slots of the team, which are kept around until each `_get_team_slots` is matched by a `_put_team_slots`."""
+    with _team_slots_lock:
+        slots, users = _team_slots.get(team_id) or (
+            threading.BoundedSemaphore(settings.QUERY_RUNNER_MAX_PARALLEL_QUERIES_PER_TEAM),
+            0,
+        )
+        _team_slots[team_id] = (slots, users + 1)
+        return slots
+
+
+def _put_team_slots(team_id: int) -> None:
+    with _team_slots_lock:
+        slots, users = _team_slots[team_id]
+        if users > 1:
+            _team_slots[team_id] = (slots, users - 1)
+        else:
+            # Nothing of the team is running anymore, so that the slots of all teams ever seen don't pile up
+            del _team_slots[team_id]
+
+
+def _release_team_slot(team_id: int, team_slots: threading.BoundedSemaphore) -> None:
+    team_slots.release()
+    _put_team_slots(team_id)
+
+
+def _run_job(
+    job: Callable[[], T],
+    context: contextvars.Context,
+    query_tags: dict,
+    cancelled: threading.Event,
+    team_id: int,
+    team_slots: threading.BoundedSemaphore,
+) -> T:
+    try:
+        if cancelled.is_set():
+            raise QueryCancelledException()
+        # Threads of the pool are reused, so tags of whatever ran in them before must not leak into this job
+        query_tagging.reset_query_tags()
+        query_tagging.tag_queries(**query_tags)
+        _thread_local.running_job = True
+        return context.run(job)
+    finally:
+        _thread_local.running_job = False
+        query_tagging.reset_query_tags()
+        _release_team_slot(team_id, team_slots)
+
+        from django.db import connection
+
+        # This will only close the DB connection of this thread of the pool, and not the whole app
+        connection.close()
+
+
+def run_in_parallel(jobs: Sequence[Callable[[], T]], team_id: int, parallel: Optional[bool] = None) -> list[T]:
+    """
+    Run the jobs in the shared pool, returning their results in order, and raising the first exception of any of them.
+
+    Jobs run with the query tags and context variables of the caller. Once a job fails, jobs that haven't started yet
+    aren't run, while the running ones are left to finish. Unless `parallel` says otherwise, jobs run one after another
+    in the calling thread if there's only one, in unit tests (as Django's test database doesn't support being used from
+    multiple threads), or if called from a job already running in the pool, which could otherwise wait for its own jobs
+    forever once all threads of the pool (or all slots of the team) are taken by jobs like it.
+    """
+    if parallel is None:
+        parallel = len(jobs) > 1 and not settings.IN_UNIT_TESTING and not getattr(_thread_local, "running_job", False)
+    if not parallel:
+        return [job() for job in jobs]
+
+    executor = get_query_executor()
+    team_slots = _get_team_slots(team_id)
+    max_running = max(settings.QUERY_RUNNER_MAX_PARALLEL_QUERIES_PER_REQUEST, 1)
+    query_tags = dict(query_tagging.get_query_tags())
+    cancelled = threading.Event()
+
+    results: list[Optional[T]] = [None] * len(jobs)
+    error: Optional[BaseException] = None
+    pending = deque(enumerate(jobs))
+    running: dict[Future, int] = {}
+
+    try:
+        while pending or running:
+            # Take a team slot for each job before submitting it, waiting for one only if none of ours are running,
+            # as otherwise one of them finishing is as good a reason to continue as a slot freeing up
+            while (
+                error is None
+                and pending
+                and len(running) < max_running
+                and team_slots.acquire(blocking=len(running) == 0)
+            ):
+                index, job = pending.popleft()
+                # The job keeps the slots around until it's done, even if this call is interrupted before that
+                _get_team_slots(team_id)
+                try:
+                    future = executor.submit(
+                        _run_job, job, contextvars.copy_context(), query_tags, cancelled, team_id, team_slots
+                    )
+                except BaseException:
+                    _release_team_slot(team_id, team_slots)
+                    raise
+                running[future] = index
+
+            if error is not None:
+                pending.clear()
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                exception = future.exception()
+                if exception is None:
+                    results[index] = future.result()
+                elif error is None:
+                    error = exception
+                    cancelled.set()
+    except BaseException:
+        # E.g. the request was interrupted while waiting, don't start any more jobs
+        cancelled.set()
+        raise
+    finally:
+        _put_team_slots(team_id)
+
+    if error is not None:
+        raise error
+    return results  # type: ignore[return-value]
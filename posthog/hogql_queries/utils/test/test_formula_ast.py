@@ -1,3 +1,5 @@
+import numpy as np
+
 from posthog.hogql_queries.utils.formula_ast import FormulaAST
 from posthog.test.base import APIBaseTest
 
@@ -66,3 +68,37 @@ class TestFormulaAST(APIBaseTest):
         formula = self._get_formula_ast()
         response = formula.call("+A")
         self.assertListEqual([1, 2, 3, 4], response)
+
+    def test_division_zero_for_some_values(self):
+        formula = FormulaAST(data=[[1, 2, 3, 4], [0, 2, 0, 4]])
+        response = formula.call("A/B + A%B + B**-1")
+        self.assertListEqual([0, 1.5, 0, 1.25], response)
+
+    def test_series_of_different_lengths(self):
+        formula = FormulaAST(data=[[1, 2, 3, 4], [1, 2]])
+        response = formula.call("A+B")
+        self.assertListEqual([2, 4], response)
+
+    def test_array_of_series(self):
+        formula = FormulaAST(data=np.array([[[1, 2], [3, 4], [5, 6]], [[1, 1], [2, 0], [3, 3]]]))
+        response = formula.call("A/B")
+        self.assertListEqual([[1, 2], [1.5, 0], [5 / 3, 2]], response)
+
+    def test_power_is_python_power(self):
+        formula = FormulaAST(data=[[5, 0, -8], [-1, -1, 1]])
+        self.assertListEqual([0.2, 0, -8], formula.call("A**B"))
+        self.assertListEqual([1.0000000000000002 + 1.7320508075688772j], FormulaAST(data=[[-8]]).call("A**(1/3)"))
+
+    def test_complex_powers_are_evaluated_point_by_point(self):
+        formula = FormulaAST(data=[[-8, -8, 8], [2, 0, 2]])
+        response = formula.call("A**(1/3) / B")
+        self.assertListEqual([0.5000000000000001 + 0.8660254037844386j, 0, 1], response)
+        self.assertIsInstance(response[2], float)
+        with self.assertRaises(TypeError):
+            formula.call("A**(1/3) % B")
+
+    def test_values_are_floats(self):
+        formula = self._get_formula_ast()
+        response = formula.call("2")
+        self.assertListEqual([2.0, 2.0, 2.0, 2.0], response)
+        self.assertTrue(all(isinstance(value, float) for value in response))
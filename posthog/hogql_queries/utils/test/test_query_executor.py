@@ -0,0 +1,108 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from posthog.clickhouse import query_tagging
+from posthog.hogql_queries.utils.query_executor import _get_team_slots, _put_team_slots, _team_slots, run_in_parallel
+
+
+class TestQueryExecutor(SimpleTestCase):
+    def tearDown(self):
+        query_tagging.reset_query_tags()
+
+    def test_returns_results_in_order_with_query_tags_of_caller(self):
+        query_tagging.tag_queries(kind="TrendsQuery")
+
+        def job(index: int):
+            time.sleep(0.01 * (5 - index))
+            return index, query_tagging.get_query_tags(), threading.current_thread().name
+
+        results = run_in_parallel([lambda index=index: job(index) for index in range(5)], team_id=1, parallel=True)
+
+        self.assertEqual([index for index, _, _ in results], [0, 1, 2, 3, 4])
+        self.assertTrue(all(tags == {"kind": "TrendsQuery"} for _, tags, _ in results))
+        self.assertTrue(all(thread_name.startswith("query_runner") for _, _, thread_name in results))
+
+    @override_settings(QUERY_RUNNER_MAX_PARALLEL_QUERIES_PER_REQUEST=2)
+    def test_limits_parallel_queries_per_request(self):
+        lock = threading.Lock()
+        running = 0
+        max_running = 0
+
+        def job():
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+
+        run_in_parallel([job] * 6, team_id=2, parallel=True)
+
+        self.assertEqual(max_running, 2)
+
+    @override_settings(QUERY_RUNNER_MAX_PARALLEL_QUERIES_PER_REQUEST=4, QUERY_RUNNER_MAX_PARALLEL_QUERIES_PER_TEAM=3)
+    def test_limits_parallel_queries_per_team(self):
+        lock = threading.Lock()
+        running = 0
+        max_running = 0
+
+        def job():
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+
+        requests = [
+            threading.Thread(target=run_in_parallel, args=([job] * 4,), kwargs={"team_id": 5, "parallel": True})
+            for _ in range(2)
+        ]
+        for request in requests:
+            request.start()
+        for request in requests:
+            request.join()
+
+        self.assertEqual(max_running, 3)
+        # The slots of teams without queries running aren't kept around
+        self.assertNotIn(5, _team_slots)
+
+    @override_settings(QUERY_RUNNER_MAX_PARALLEL_QUERIES_PER_TEAM=1)
+    def test_team_slot_is_released_when_submitting_fails(self):
+        team_slots = _get_team_slots(6)
+
+        with patch.object(ThreadPoolExecutor, "submit", side_effect=RuntimeError("cannot schedule new futures")):
+            with self.assertRaisesMessage(RuntimeError, "cannot schedule new futures"):
+                run_in_parallel([lambda: None] * 2, team_id=6, parallel=True)
+
+        self.assertTrue(team_slots.acquire(blocking=False))
+        team_slots.release()
+        _put_team_slots(6)
+        self.assertNotIn(6, _team_slots)
+
+    @override_settings(QUERY_RUNNER_MAX_PARALLEL_QUERIES_PER_REQUEST=1)
+    def test_failing_query_cancels_the_rest(self):
+        ran = []
+
+        def failing_job():
+            raise ValueError("Query failed")
+
+        def job():
+            ran.append(True)
+
+        with self.assertRaisesMessage(ValueError, "Query failed"):
+            run_in_parallel([failing_job, job, job], team_id=3, parallel=True)
+
+        self.assertEqual(ran, [])
+
+    @override_settings(IN_UNIT_TESTING=True)
+    def test_runs_in_calling_thread_in_unit_tests(self):
+        results = run_in_parallel([lambda: threading.current_thread()] * 2, team_id=4)
+
+        self.assertEqual(results, [threading.current_thread()] * 2)
@@ -1,7 +1,13 @@
 import json
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from enum import StrEnum
-from typing import Any, Optional
-from collections.abc import Callable
+from typing import Any, NamedTuple, Optional
+from collections.abc import Callable, Iterable, Iterator
+
+import orjson
 
 from django.conf import settings
 from kafka import KafkaConsumer as KC
@@ -83,6 +89,15 @@ class KafkaConsumerForTests:
         return
 
 
+class ProducerMessage(NamedTuple):
+    """A message serialized and encoded ahead of handing it to the producer, see `_KafkaProducer.produce_many`."""
+
+    topic: str
+    value: bytes
+    key: Optional[bytes] = None
+    headers: Optional[list[tuple[str, bytes]]] = None
+
+
 class _KafkaSecurityProtocol(StrEnum):
     PLAINTEXT = "PLAINTEXT"
     SSL = "SSL"
@@ -147,6 +162,14 @@ class _KafkaProducer:
         b = json.dumps(d).encode("utf-8")
         return b
 
+    @staticmethod
+    def orjson_serializer(d):
+        try:
+            return orjson.dumps(d)
+        except orjson.JSONEncodeError:
+            # e.g. integers that don't fit in 64 bits, which the standard library serializes fine
+            return _KafkaProducer.json_serializer(d)
+
     def on_send_success(self, record_metadata: RecordMetadata):
         statsd.incr("posthog_cloud_kafka_send_success", tags={"topic": record_metadata.topic})
 
@@ -177,6 +200,17 @@ class _KafkaProducer:
         future.add_callback(self.on_send_success).add_errback(lambda exc: self.on_send_failure(topic=topic, exc=exc))
         return future
 
+    def produce_many(self, messages: Iterable[ProducerMessage]) -> list[FutureRecordMetadata]:
+        """Send messages that are already serialized, e.g. all events of a request, returning the future of each."""
+        futures = []
+        for message in messages:
+            future = self.producer.send(message.topic, value=message.value, key=message.key, headers=message.headers)
+            future.add_callback(self.on_send_success).add_errback(
+                lambda exc, topic=message.topic: self.on_send_failure(topic=topic, exc=exc)
+            )
+            futures.append(future)
+        return futures
+
     def flush(self, timeout=None):
         self.producer.flush(timeout)
 
@@ -258,14 +292,144 @@ def build_kafka_consumer(
     return consumer
 
 
+_SQL_PARAMETER = re.compile(r"%\((\w+)\)s")
+_INSERT_VALUES_SQL = re.compile(r"^(?P<insert>.*?\bVALUES)(?P<row>\s*\(.*\))\s*$", re.DOTALL | re.IGNORECASE)
+# Some of these inserts end in a stray `VALUES`, which would otherwise be an alias of the last column of each row
+_INSERT_SELECT_SQL = re.compile(r"^(?P<insert>.*?)(?P<row>\bSELECT\b.*?)(?:\bVALUES)?\s*$", re.DOTALL | re.IGNORECASE)
+
+# The producer that `ClickhouseProducer`s buffer their writes with, in a `buffered_clickhouse_writes` block
+_buffering_clickhouse_producer: ContextVar[Optional["ClickhouseProducer"]] = ContextVar(
+    "buffering_clickhouse_producer", default=None
+)
+
+
 class ClickhouseProducer:
+    """
+    Writes rows to ClickHouse, via Kafka, or with `INSERT`s when there's no Kafka (in tests, or with
+    CLICKHOUSE_PRODUCER_WRITE_DIRECTLY).
+
+    Rows are written right away, unless buffered: when the producer is used as a context manager, or within a
+    `buffered_clickhouse_writes` block. Buffered rows are grouped per topic and insert, and written together once there
+    are `max_buffered_rows` of them, on the first write after they've been buffered for `max_buffer_seconds`, on
+    `flush()`, or at the end of the block. Rows written with `sync` are never buffered: buffered rows are written
+    first, to keep writes in order, and then the row is written and acknowledged before `produce` returns.
+    """
+
     producer: Optional[_KafkaProducer]
 
-    def __init__(self):
-        self.producer = KafkaProducer() if not settings.TEST else None
+    def __init__(
+        self,
+        max_buffered_rows: Optional[int] = None,
+        max_buffer_seconds: Optional[float] = None,
+    ):
+        self.producer = (
+            KafkaProducer() if not settings.TEST and not settings.CLICKHOUSE_PRODUCER_WRITE_DIRECTLY else None
+        )
+        self.buffered = False
+        self.max_buffered_rows = (
+            max_buffered_rows if max_buffered_rows is not None else settings.CLICKHOUSE_PRODUCER_MAX_BUFFERED_ROWS
+        )
+        self.max_buffer_seconds = (
+            max_buffer_seconds if max_buffer_seconds is not None else settings.CLICKHOUSE_PRODUCER_MAX_BUFFER_SECONDS
+        )
+        self._buffer: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        self._buffered_rows = 0
+        self._buffer_started_at: Optional[float] = None
 
-    def produce(self, sql: str, topic: str, data: dict[str, Any], sync: bool = True):
-        if self.producer is not None:  # TODO: this should be not sync and
-            self.producer.produce(topic=topic, data=data)
-        else:
-            sync_execute(sql, data)
+    def __enter__(self) -> "ClickhouseProducer":
+        self.buffered = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # Rows buffered before an error would have been written already without the buffer, so write them regardless
+        self.buffered = False
+        self.flush()
+
+    def produce(self, sql: str, topic: str, data: dict[str, Any], sync: bool = False):
+        buffering_producer = self if self.buffered else _buffering_clickhouse_producer.get()
+        if buffering_producer is not None and not sync:
+            buffering_producer._buffer_row(sql, topic, data)
+            return
+
+        if buffering_producer is not None:
+            buffering_producer.flush()
+        self._write(sql, topic, [data], sync=sync)
+
+    def flush(self) -> None:
+        """Write all buffered rows, with one message batch or insert per topic and insert."""
+        buffer, self._buffer = self._buffer, {}
+        self._buffered_rows = 0
+        self._buffer_started_at = None
+        for (sql, topic), rows in buffer.items():
+            self._write(sql, topic, rows, sync=False)
+
+    def _buffer_row(self, sql: str, topic: str, data: dict[str, Any]) -> None:
+        if self._buffer_started_at is None:
+            self._buffer_started_at = time.monotonic()
+        self._buffer.setdefault((sql, topic), []).append(data)
+        self._buffered_rows += 1
+        if (
+            self._buffered_rows >= self.max_buffered_rows
+            or time.monotonic() - self._buffer_started_at >= self.max_buffer_seconds
+        ):
+            self.flush()
+
+    def _write(self, sql: str, topic: str, rows: list[dict[str, Any]], sync: bool) -> None:
+        if self.producer is not None:
+            if len(rows) == 1:
+                future = self.producer.produce(topic=topic, data=rows[0])
+                if sync:
+                    future.get(timeout=settings.KAFKA_PRODUCE_ACK_TIMEOUT_SECONDS)
+            else:
+                self.producer.produce_many(
+                    ProducerMessage(topic=topic, value=self.producer.orjson_serializer(row)) for row in rows
+                )
+            return
+
+        batch = _batch_insert_sql(sql, rows) if len(rows) > 1 else None
+        if batch is None:
+            for row in rows:
+                sync_execute(sql, row)
+            return
+        batch_sql, batch_args = batch
+        # With `INSERT ... SELECT`, rows are part of the query itself, so allow for it being as large as they are
+        max_query_size = len(batch_sql) + 4 * sum(len(str(value)) + 2 for value in batch_args.values())
+        sync_execute(batch_sql, batch_args, settings={"max_query_size": max(max_query_size, 256 * 1024)})
+
+
+def _batch_insert_sql(sql: str, rows: list[dict[str, Any]]) -> Optional[tuple[str, dict[str, Any]]]:
+    """
+    Turn an insert of one row into a single insert of all rows, with their parameters suffixed by their index.
+
+    Works for `INSERT ... VALUES (%(param)s, ...)`, listing all rows after `VALUES`, and for
+    `INSERT ... SELECT %(param)s, ...`, selecting each row with `UNION ALL`. Returns nothing for other inserts.
+    """
+    values_match = _INSERT_VALUES_SQL.match(sql)
+    match = values_match or _INSERT_SELECT_SQL.match(sql)
+    if match is None:
+        return None
+
+    batch_rows = []
+    args: dict[str, Any] = {}
+    for index, row in enumerate(rows):
+        batch_rows.append(
+            _SQL_PARAMETER.sub(lambda parameter, index=index: f"%({parameter.group(1)}_{index})s", match["row"])
+        )
+        args.update({f"{key}_{index}": value for key, value in row.items()})
+    return match["insert"] + ("," if values_match else " UNION ALL ").join(batch_rows), args
+
+
+@contextmanager
+def buffered_clickhouse_writes(
+    max_buffered_rows: Optional[int] = None, max_buffer_seconds: Optional[float] = None
+) -> Iterator[ClickhouseProducer]:
+    """
+    Buffer the rows written by any `ClickhouseProducer` in the block, e.g. of `create_person` calls in a loop, so that
+    they cost a round trip per batch instead of per row. Buffered rows are written at the end of the block.
+    """
+    with ClickhouseProducer(max_buffered_rows=max_buffered_rows, max_buffer_seconds=max_buffer_seconds) as producer:
+        token = _buffering_clickhouse_producer.set(producer)
+        try:
+            yield producer
+        finally:
+            _buffering_clickhouse_producer.reset(token)
@@ -1,9 +1,14 @@
-from unittest.mock import patch
+from unittest.mock import MagicMock, call, patch
 
 import kafka
 from django.test import TestCase, override_settings
 
-from posthog.kafka_client.client import _KafkaProducer, build_kafka_consumer
+from posthog.kafka_client.client import (
+    ClickhouseProducer,
+    _KafkaProducer,
+    buffered_clickhouse_writes,
+    build_kafka_consumer,
+)
 
 
 @override_settings(TEST=False)
@@ -75,3 +80,93 @@ class KafkaClientTestCase(TestCase):
             producer = _KafkaProducer(test=False)
         for key, value in expected_sasl_config.items():
             self.assertEqual(value, producer.producer.config[key])  # type: ignore
+
+
+INSERT_SQL = "INSERT INTO test_table (a, b, _offset) SELECT %(a)s, %(b)s, 0"
+
+
+@override_settings(TEST=True)
+@patch("posthog.kafka_client.client.sync_execute")
+class ClickhouseProducerTestCase(TestCase):
+    def test_writes_right_away_unless_buffered(self, sync_execute):
+        ClickhouseProducer().produce(sql=INSERT_SQL, topic="test_topic", data={"a": 1, "b": 2})
+
+        self.assertEqual(sync_execute.call_args_list, [call(INSERT_SQL, {"a": 1, "b": 2})])
+
+    def test_buffered_writes_are_inserted_at_once(self, sync_execute):
+        with buffered_clickhouse_writes():
+            ClickhouseProducer().produce(sql=INSERT_SQL, topic="test_topic", data={"a": 1, "b": 2})
+            ClickhouseProducer().produce(sql=INSERT_SQL, topic="test_topic", data={"a": 3, "b": 4})
+            self.assertEqual(sync_execute.call_count, 0)
+
+        self.assertEqual(
+            sync_execute.call_args_list,
+            [
+                call(
+                    "INSERT INTO test_table (a, b, _offset) SELECT %(a_0)s, %(b_0)s, 0 "
+                    "UNION ALL SELECT %(a_1)s, %(b_1)s, 0",
+                    {"a_0": 1, "b_0": 2, "a_1": 3, "b_1": 4},
+                    settings={"max_query_size": 256 * 1024},
+                )
+            ],
+        )
+
+    def test_buffered_values_writes_are_inserted_at_once(self, sync_execute):
+        sql = "INSERT INTO test_table (a, _offset) VALUES (%(a)s, 0)"
+        with ClickhouseProducer() as producer:
+            producer.produce(sql=sql, topic="test_topic", data={"a": 1})
+            producer.produce(sql=sql, topic="test_topic", data={"a": 2})
+
+        self.assertEqual(
+            sync_execute.call_args_list,
+            [
+                call(
+                    "INSERT INTO test_table (a, _offset) VALUES (%(a_0)s, 0), (%(a_1)s, 0)",
+                    {"a_0": 1, "a_1": 2},
+                    settings={"max_query_size": 256 * 1024},
+                )
+            ],
+        )
+
+    def test_sync_writes_are_not_buffered(self, sync_execute):
+        with ClickhouseProducer() as producer:
+            producer.produce(sql=INSERT_SQL, topic="test_topic", data={"a": 1, "b": 2})
+            producer.produce(sql=INSERT_SQL, topic="test_topic", data={"a": 3, "b": 4}, sync=True)
+
+            # Rows buffered before are written first
+            self.assertEqual(
+                sync_execute.call_args_list,
+                [call(INSERT_SQL, {"a": 1, "b": 2}), call(INSERT_SQL, {"a": 3, "b": 4})],
+            )
+
+    def test_flushes_when_buffer_is_full(self, sync_execute):
+        with ClickhouseProducer(max_buffered_rows=2) as producer:
+            for a in range(5):
+                producer.produce(sql=INSERT_SQL, topic="test_topic", data={"a": a, "b": a})
+            self.assertEqual(sync_execute.call_count, 2)
+
+        self.assertEqual(sync_execute.call_count, 3)
+        self.assertEqual(sync_execute.call_args_list[2], call(INSERT_SQL, {"a": 4, "b": 4}))
+
+    @override_settings(TEST=False)
+    @patch("posthog.kafka_client.client.KafkaProducer")
+    def test_produces_to_kafka(self, kafka_producer, sync_execute):
+        producer = kafka_producer.return_value
+        producer.orjson_serializer = _KafkaProducer.orjson_serializer
+        future = MagicMock()
+        producer.produce.return_value = future
+
+        ClickhouseProducer().produce(sql=INSERT_SQL, topic="test_topic", data={"a": 1, "b": 2}, sync=True)
+        future.get.assert_called_once()
+
+        with buffered_clickhouse_writes():
+            ClickhouseProducer().produce(sql=INSERT_SQL, topic="test_topic", data={"a": 3, "b": 4})
+            ClickhouseProducer().produce(sql=INSERT_SQL, topic="test_topic", data={"a": 5, "b": 6})
+
+        self.assertEqual(producer.produce.call_count, 1)
+        messages = list(producer.produce_many.call_args[0][0])
+        self.assertEqual(
+            [(message.topic, message.value) for message in messages],
+            [("test_topic", b'{"a":3,"b":4}'), ("test_topic", b'{"a":5,"b":6}')],
+        )
+        self.assertEqual(sync_execute.call_count, 0)
@@ -6,7 +6,7 @@ import structlog
 from django.core.management.base import BaseCommand
 
 from posthog.clickhouse.client import sync_execute
-from posthog.kafka_client.client import KafkaProducer
+from posthog.kafka_client.client import KafkaProducer, buffered_clickhouse_writes
 from posthog.models.group.group import Group
 from posthog.models.group.util import raw_create_group_ch
 from posthog.models.person import PersonDistinctId
@@ -54,14 +54,15 @@ def run(options, sync: bool = False):  # sync used for unittests
 
     team_id = options["team_id"]
 
-    if options["person"]:
-        run_person_sync(team_id, live_run, deletes, sync)
+    with buffered_clickhouse_writes():
+        if options["person"]:
+            run_person_sync(team_id, live_run, deletes, sync)
 
-    if options["person_distinct_id"]:
-        run_distinct_id_sync(team_id, live_run, deletes, sync)
+        if options["person_distinct_id"]:
+            run_distinct_id_sync(team_id, live_run, deletes, sync)
 
-    if options["group"]:
-        run_group_sync(team_id, live_run, sync)
+        if options["group"]:
+            run_group_sync(team_id, live_run, sync)
 
     logger.info("Waiting on Kafka producer flush, for up to 5 minutes")
     KafkaProducer().flush(5 * 60)
@@ -59,6 +59,8 @@ from .filters import Filter, RetentionFilter
 from .group import Group
 from .group_type_mapping import GroupTypeMapping
 from .host_definition import HostDefinition
+from . import hogql_schema_version  # noqa: F401 - registers signal receivers
+from . import property_type_cache  # noqa: F401 - registers signal receivers
 from .hog_functions import HogFunction
 from .hog_function_template import HogFunctionTemplate
 from .insight import Insight, InsightViewed
@@ -14,6 +14,7 @@ from posthog.exceptions_capture import capture_exception
 from posthog.constants import PropertyOperatorType
 from posthog.models.file_system.file_system_mixin import FileSystemSyncMixin
 from posthog.models.filters.filter import Filter
+from posthog.models.hogql_schema_version import bump_hogql_schema_version
 from posthog.models.person import Person
 from posthog.models.person.person import READ_DB_FOR_PERSONS
 from posthog.models.property import BehavioralPropertyType, Property, PropertyGroup
@@ -311,6 +312,8 @@ class Cohort(FileSystemSyncMixin, RootTeamMixin, models.Model):
         Cohort.objects.filter(pk=self.pk).filter(Q(version__lt=pending_version) | Q(version__isnull=True)).update(
             version=pending_version, count=count
         )
+        # HogQL inlines the cohort version when printing queries, and `update` doesn't send signals
+        bump_hogql_schema_version(self.team_id)
         self.refresh_from_db()
 
         logger.warn(
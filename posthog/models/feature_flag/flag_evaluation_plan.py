@@ -0,0 +1,193 @@
+"""
+Per-project plans for matching persons and groups against feature flag conditions in Postgres.
+
+`FeatureFlagMatcher.query_conditions` turns every flag condition into a Django expression and annotates a single person
+(and group) query with all of them. For projects with many flags, building those expressions takes more CPU than running
+the query. A plan keeps the parsed properties and built expressions of each condition around in the process, so each
+request only has to bind its distinct_id or group key and run the query.
+
+Conditions are compiled without request-supplied property overrides, so a compiled condition is only used by requests
+that don't override any of the properties it depends on. Cohorts are compiled into the conditions that use them, so
+saving or deleting a flag or a cohort drops the project's version in Redis, which invalidates the plans of all processes.
+Processes only check the version once every `FLAG_EVALUATION_PLAN_VERSION_CHECK_INTERVAL_SECONDS`, so other processes can
+use an outdated plan for that long.
+Conditions comparing dates relative to now (e.g. `-7d`) are resolved when compiled, so they're never kept in a plan.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional
+
+import structlog
+from django.conf import settings
+from django.db.models import Expression, Q
+from django.db.models.signals import post_delete, post_save
+
+from posthog import redis
+from posthog.models.property.property import Property
+from posthog.models.signals import mutable_receiver
+
+if TYPE_CHECKING:
+    from posthog.models.feature_flag.feature_flag import FeatureFlag
+
+logger = structlog.get_logger(__name__)
+
+FLAG_EVALUATION_PLAN_VERSION_KEY = "flag_evaluation_plan_version:{project_id}"
+# Versions of projects whose flags haven't changed in a while expire, which only means their plans are compiled again
+FLAG_EVALUATION_PLAN_VERSION_TTL_SECONDS = 7 * 24 * 60 * 60
+# How long a process trusts a plan before checking its version in Redis again
+FLAG_EVALUATION_PLAN_VERSION_CHECK_INTERVAL_SECONDS = 1.0
+
+# Saving a cohort with only these fields changed (e.g. when it's recalculated) doesn't change how flags match it
+COHORT_FIELDS_NOT_AFFECTING_FLAGS = frozenset(
+    {"count", "is_calculating", "last_calculation", "errors_calculating", "version", "pending_version", "last_error_at"}
+)
+
+
+@dataclass(frozen=True)
+class ConditionPlan:
+    properties: list[Property]
+    # Keys of all properties the condition depends on, including those of its cohorts, as overriding any changes `expr`
+    property_keys: frozenset[str]
+    # Annotations `expr` relies on, i.e. the JSONB types of properties compared with math operators
+    annotations: dict[str, Expression]
+    expr: Optional[Q]
+    # Whether `expr` compares dates relative to when it was built, so that it must not be reused later
+    uses_relative_dates: bool = False
+
+
+@dataclass
+class FlagPlan:
+    # What the flag was compiled from, so that flags that differ (e.g. read from a stale cache) aren't matched against it
+    filters: dict
+    aggregation_group_type_index: Optional[int]
+    conditions: dict[str, ConditionPlan] = field(default_factory=dict)
+
+    def matches(self, feature_flag: "FeatureFlag") -> bool:
+        return (
+            self.aggregation_group_type_index == feature_flag.aggregation_group_type_index
+            and self.filters == feature_flag.filters
+        )
+
+
+@dataclass
+class FlagEvaluationPlan:
+    project_id: int
+    version: str
+    flags: dict[int, FlagPlan] = field(default_factory=dict)
+    # `time.monotonic()` of when `version` was last checked against Redis
+    checked_at: float = 0.0
+
+    def get_flag_plan(self, feature_flag: "FeatureFlag") -> Optional[FlagPlan]:
+        """Plan of the flag, compiled lazily by the matcher. None for flags that aren't saved."""
+        if feature_flag.pk is None:
+            return None
+        flag_plan = self.flags.get(feature_flag.pk)
+        if flag_plan is None or not flag_plan.matches(feature_flag):
+            flag_plan = FlagPlan(
+                filters=copy.deepcopy(feature_flag.filters),
+                aggregation_group_type_index=feature_flag.aggregation_group_type_index,
+            )
+            self.flags[feature_flag.pk] = flag_plan
+        return flag_plan
+
+
+class FlagEvaluationPlanCache:
+    """Per-process LRU of evaluation plans, one per project."""
+
+    def __init__(self, *, max_projects: int):
+        self.max_projects = max_projects
+        self._plans: OrderedDict[int, FlagEvaluationPlan] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def get(self, project_id: int, version: str) -> FlagEvaluationPlan:
+        with self._lock:
+            plan = self._plans.get(project_id)
+            if plan is None or plan.version != version:
+                plan = FlagEvaluationPlan(project_id=project_id, version=version)
+                self._plans[project_id] = plan
+            plan.checked_at = time.monotonic()
+            self._plans.move_to_end(project_id)
+            while len(self._plans) > self.max_projects:
+                self._plans.popitem(last=False)
+            return plan
+
+    def get_recently_checked(self, project_id: int, max_age_seconds: float) -> Optional[FlagEvaluationPlan]:
+        """The project's plan if its version was checked within `max_age_seconds`, so it can be used without Redis."""
+        with self._lock:
+            plan = self._plans.get(project_id)
+            if plan is None or time.monotonic() - plan.checked_at >= max_age_seconds:
+                return None
+            self._plans.move_to_end(project_id)
+            return plan
+
+    def discard(self, project_id: int) -> None:
+        with self._lock:
+            self._plans.pop(project_id, None)
+
+
+_plan_cache: Optional[FlagEvaluationPlanCache] = None
+
+
+def get_flag_evaluation_plan_version(project_id: int) -> str:
+    """
+    Current version of the project's plans. Versions are never reused, so that a plan built before the key was dropped
+    (or evicted) can't be mistaken for a current one.
+    """
+    client = redis.get_client()
+    key = FLAG_EVALUATION_PLAN_VERSION_KEY.format(project_id=project_id)
+    version = client.get(key)
+    if version is None:
+        client.set(key, str(time.time_ns()), nx=True, ex=FLAG_EVALUATION_PLAN_VERSION_TTL_SECONDS)
+        version = client.get(key)
+    return version.decode("utf-8") if isinstance(version, bytes) else str(version)
+
+
+def get_flag_evaluation_plan(project_id: int) -> Optional[FlagEvaluationPlan]:
+    """Return this process's plan for the project, or None if plans are disabled or Redis is unavailable."""
+    global _plan_cache
+
+    max_projects = settings.FLAG_EVALUATION_PLAN_CACHE_MAX_PROJECTS
+    if max_projects <= 0:
+        return None
+    if _plan_cache is None or _plan_cache.max_projects != max_projects:
+        _plan_cache = FlagEvaluationPlanCache(max_projects=max_projects)
+
+    plan = _plan_cache.get_recently_checked(project_id, FLAG_EVALUATION_PLAN_VERSION_CHECK_INTERVAL_SECONDS)
+    if plan is not None:
+        return plan
+    try:
+        version = get_flag_evaluation_plan_version(project_id)
+    except Exception:
+        logger.exception("flag_evaluation_plan_version_get_failed", project_id=project_id)
+        return None
+    return _plan_cache.get(project_id, version)
+
+
+def invalidate_flag_evaluation_plans(project_id: int) -> None:
+    if _plan_cache is not None:
+        _plan_cache.discard(project_id)
+    try:
+        redis.get_client().delete(FLAG_EVALUATION_PLAN_VERSION_KEY.format(project_id=project_id))
+    except Exception:
+        # Don't fail model saves because of this. Flags themselves are checked against what their plan was compiled from,
+        # but cohort changes only reach plans once Redis is back.
+        logger.exception("flag_evaluation_plan_invalidation_failed", project_id=project_id)
+
+
+@mutable_receiver([post_save, post_delete], sender="posthog.FeatureFlag")
+def feature_flag_changed(sender, instance, **kwargs):
+    invalidate_flag_evaluation_plans(instance.team.project_id)
+
+
+@mutable_receiver([post_save, post_delete], sender="posthog.Cohort")
+def cohort_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= COHORT_FIELDS_NOT_AFFECTING_FLAGS:
+        return
+    invalidate_flag_evaluation_plans(instance.team.project_id)
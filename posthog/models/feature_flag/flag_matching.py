@@ -4,8 +4,9 @@ from enum import StrEnum
 import time
 import structlog
 from typing import Literal, Optional, Union, cast
+from collections.abc import Iterable
 
-from prometheus_client import Counter
+from prometheus_client import Counter, Histogram
 from django.conf import settings
 from django.db import DatabaseError, IntegrityError
 from django.db.models.expressions import ExpressionWrapper, RawSQL
@@ -29,7 +30,12 @@ from posthog.models.property.property import Property
 from posthog.models.cohort import Cohort, CohortOrEmpty
 from posthog.models.team.team import Team
 from posthog.models.utils import execute_with_timeout
-from posthog.queries.base import match_property, properties_to_Q, sanitize_property_key
+from posthog.queries.base import (
+    match_property,
+    properties_to_Q,
+    relative_date_parse_for_feature_flag_matching,
+    sanitize_property_key,
+)
 from posthog.database_healthcheck import (
     DATABASE_FOR_FLAG_MATCHING,
 )
@@ -42,6 +48,7 @@ from .feature_flag import (
     get_feature_flags_for_team_in_cache,
     set_feature_flags_for_team_in_cache,
 )
+from .flag_evaluation_plan import ConditionPlan, FlagEvaluationPlan, FlagPlan, get_flag_evaluation_plan
 
 logger = structlog.get_logger(__name__)
 
@@ -68,6 +75,19 @@ FLAG_CACHE_HIT_COUNTER = Counter(
     labelnames=[LABEL_TEAM_ID, "cache_hit"],
 )
 
+FLAG_EVALUATION_SOURCE_HISTOGRAM = Histogram(
+    "flag_evaluation_flags_per_request",
+    "Flags evaluated per request, by whether they were resolved from request properties alone or needed the database.",
+    labelnames=["source"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf")),
+)
+
+FLAG_EVALUATION_PLAN_COUNTER = Counter(
+    "flag_evaluation_plan_conditions_total",
+    "Flag conditions matched in the database, by whether they were already compiled in the project's evaluation plan.",
+    labelnames=["cache_hit"],
+)
+
 ENTITY_EXISTS_PREFIX = "flag_entity_exists_"
 PERSON_KEY = "person"
 
@@ -157,6 +177,53 @@ class FlagsMatcherCache:
         return {value: key for key, value in self.group_types_to_indexes.items()}
 
 
+HashKey = tuple[str, Optional[str], str]
+
+
+def calculate_hashes(keys: Iterable[HashKey]) -> list[float]:
+    """
+    `FeatureFlagMatcher.calculate_hash` of each (prefix, identifier, salt), computed in one pass.
+
+    The first 15 hex digits of the SHA1 are the top 60 bits of its first 8 bytes, so they're read from the digest
+    directly rather than formatted as hex and parsed back.
+    """
+    sha1 = hashlib.sha1
+    from_bytes = int.from_bytes
+    return [
+        0
+        if hash_identifier is None
+        else (from_bytes(sha1(f"{prefix}{hash_identifier}{salt}".encode()).digest()[:8], "big") >> 4) / __LONG_SCALE__
+        for prefix, hash_identifier, salt in keys
+    ]
+
+
+class FlagHashCache:
+    """
+    Memoized hashes of (prefix, identifier, salt), for a request or all distinct_ids of a batch.
+
+    The same hashes are needed repeatedly: the rollout hash for each condition of a flag, the holdout hash for each flag
+    of a person, and the hashes of group flags for each person in the group.
+    """
+
+    def __init__(self):
+        self._hashes: dict[HashKey, float] = {}
+
+    def get(self, prefix: str, hash_identifier: Optional[str], salt: str = "") -> float:
+        key = (prefix, hash_identifier, salt)
+        value = self._hashes.get(key)
+        if value is None:
+            value = calculate_hashes([key])[0]
+            self._hashes[key] = value
+        return value
+
+    def get_many(self, keys: Iterable[HashKey]) -> list[float]:
+        keys = list(keys)
+        missing = [key for key in dict.fromkeys(keys) if key not in self._hashes]
+        if missing:
+            self._hashes.update(zip(missing, calculate_hashes(missing)))
+        return [self._hashes[key] for key in keys]
+
+
 class FeatureFlagMatcher:
     failed_to_fetch_conditions = False
 
@@ -173,6 +240,9 @@ class FeatureFlagMatcher:
         group_property_value_overrides: Optional[dict[str, dict[str, Union[str, int]]]] = None,
         skip_database_flags: bool = False,
         cohorts_cache: Optional[dict[int, CohortOrEmpty]] = None,
+        evaluation_plan: Optional[FlagEvaluationPlan] = None,
+        prefetched_query_conditions: Optional[dict[str, bool]] = None,
+        hash_cache: Optional[FlagHashCache] = None,
     ):
         if group_property_value_overrides is None:
             group_property_value_overrides = {}
@@ -198,6 +268,15 @@ class FeatureFlagMatcher:
         else:
             self.cohorts_cache = cohorts_cache
 
+        # Loaded along with the query conditions (unless passed in), so that matching flags locally doesn't need Redis
+        self.evaluation_plan = evaluation_plan
+        # Query conditions already fetched for this distinct_id, e.g. along with others in a batch. Only the conditions
+        # missing from them are queried.
+        self.prefetched_query_conditions = prefetched_query_conditions
+        self.hash_cache = hash_cache or FlagHashCache()
+        # How many times query conditions were looked up, i.e. flag conditions were resolved via the database
+        self.query_condition_lookups = 0
+
     def get_match(self, feature_flag: FeatureFlag) -> FeatureFlagMatch:
         # If aggregating flag by groups and relevant group type is not passed - flag is off!
         if self.hashed_identifier(feature_flag) is None:
@@ -300,6 +379,9 @@ class FeatureFlagMatcher:
         flag_evaluation_reasons = {}
         faced_error_computing_flags = False
         flag_payloads = {}
+        flags_resolved_locally = 0
+        flags_resolved_via_database = 0
+        self.hash_cache.get_many(self.get_rollout_hash_keys())
         for feature_flag in self.feature_flags:
             if self.skip_database_flags:
                 # both group based and experience continuity based flags need a database connection
@@ -307,7 +389,12 @@ class FeatureFlagMatcher:
                     faced_error_computing_flags = True
                     continue
             try:
+                query_condition_lookups = self.query_condition_lookups
                 flag_match = self.get_match(feature_flag)
+                if self.query_condition_lookups > query_condition_lookups:
+                    flags_resolved_via_database += 1
+                else:
+                    flags_resolved_locally += 1
 
                 flags_details[feature_flag.key] = FeatureFlagDetails(
                     match=flag_match,
@@ -332,6 +419,9 @@ class FeatureFlagMatcher:
                 faced_error_computing_flags = True
                 handle_feature_flag_exception(err, "[Feature Flags] Error computing flags")
 
+        FLAG_EVALUATION_SOURCE_HISTOGRAM.labels(source="local").observe(flags_resolved_locally)
+        FLAG_EVALUATION_SOURCE_HISTOGRAM.labels(source="database").observe(flags_resolved_via_database)
+
         return (
             flag_values,
             flag_evaluation_reasons,
@@ -429,7 +519,9 @@ class FeatureFlagMatcher:
     ) -> tuple[bool, FeatureFlagMatchReason]:
         rollout_percentage = condition.get("rollout_percentage")
         if len(condition.get("properties", [])) > 0:
-            properties = Filter(data=condition).property_groups.flat
+            properties = self._get_condition_properties(
+                feature_flag, f"flag_{feature_flag.pk}_condition_{condition_index}", condition
+            )
             if self.can_compute_locally(properties, feature_flag.aggregation_group_type_index):
                 # :TRICKY: If overrides are enough to determine if a condition is a match,
                 # we can skip checking the query.
@@ -477,9 +569,59 @@ class FeatureFlagMatcher:
             f"flag_{feature_flag.pk}_condition_{condition_index}", match_if_entity_doesnt_exist, group_type_index
         )
 
+    def _get_flag_plan(self, feature_flag: FeatureFlag) -> Optional[FlagPlan]:
+        if self.evaluation_plan is None:
+            return None
+        return self.evaluation_plan.get_flag_plan(feature_flag)
+
+    def _is_flag_compiled(self, feature_flag: FeatureFlag, flag_plan: Optional[FlagPlan]) -> bool:
+        return flag_plan is not None and all(
+            f"flag_{feature_flag.pk}_condition_{index}" in flag_plan.conditions
+            for index, condition in enumerate(feature_flag.conditions)
+        )
+
+    def _is_condition_matched_locally(self, feature_flag: FeatureFlag, key: str, condition: dict) -> bool:
+        """Whether `is_condition_match` matches the properties of the condition from request properties alone."""
+        if len(condition.get("properties", [])) == 0:
+            return False
+        group_type_index = feature_flag.aggregation_group_type_index
+        if group_type_index is not None and group_type_index not in self.cache.group_type_index_to_name:
+            return False
+        return self.can_compute_locally(self._get_condition_properties(feature_flag, key, condition), group_type_index)
+
+    def _get_condition_properties(self, feature_flag: FeatureFlag, key: str, condition: dict) -> list[Property]:
+        flag_plan = self._get_flag_plan(feature_flag)
+        condition_plan = flag_plan.conditions.get(key) if flag_plan is not None else None
+        if condition_plan is not None:
+            return condition_plan.properties
+        return Filter(data=condition).property_groups.flat
+
+    def _compile_condition(self, condition: dict, override_property_values: dict) -> ConditionPlan:
+        properties = Filter(data=condition).property_groups.flat
+        properties_with_math_operators = get_all_properties_with_math_operators(
+            properties, self.cohorts_cache, self.project_id
+        )
+        expr = None
+        if len(condition.get("properties", {})) > 0:
+            expr = properties_to_Q(
+                self.project_id,
+                properties,
+                override_property_values=override_property_values,
+                cohorts_cache=self.cohorts_cache,
+                using_database=DATABASE_FOR_FLAG_MATCHING,
+            )
+        return ConditionPlan(
+            properties=properties,
+            property_keys=frozenset(get_all_property_keys(properties, self.cohorts_cache, self.project_id)),
+            annotations=_get_property_type_annotations(properties_with_math_operators),
+            expr=expr,
+            uses_relative_dates=uses_relative_dates(properties, self.cohorts_cache, self.project_id),
+        )
+
     def _get_query_condition(
         self, key: str, match_if_entity_doesnt_exist: bool = False, group_type_index: Optional[GroupTypeIndex] = None
     ) -> bool:
+        self.query_condition_lookups += 1
         if self.failed_to_fetch_conditions:
             raise DatabaseError("Failed to fetch conditions for feature flag previously, not trying again.")
         if self.skip_database_flags:
@@ -511,16 +653,40 @@ class FeatureFlagMatcher:
 
     @cached_property
     def query_conditions(self) -> dict[str, bool]:
+        all_conditions, _ = self.fetch_query_conditions()
+        return all_conditions
+
+    def fetch_query_conditions(
+        self, distinct_ids: Optional[list[str]] = None, excluded_property_keys: frozenset[str] = frozenset()
+    ) -> tuple[dict[str, bool], dict[str, dict[str, bool]]]:
+        """
+        Match all flag conditions that need the database, in one person query and one query per group.
+
+        Returns the conditions of groups and of the matcher's distinct_id, and when `distinct_ids` are passed, the person
+        conditions of each of them instead, matched with a single query for all of them. Conditions on any of the
+        `excluded_property_keys` (e.g. ones overridden differently for each of the `distinct_ids`) are left out.
+        """
         try:
             # Some extra wiggle room here for timeouts because this depends on the number of flags as well,
             # and not just the database query.
             with start_span(op="query_conditions"):
-                all_conditions: dict = {}
-                person_query: QuerySet = Person.objects.db_manager(DATABASE_FOR_PERSONS).filter(
-                    team_id=self.team_id,
-                    persondistinctid__distinct_id=self.distinct_id,
-                    persondistinctid__team_id=self.team_id,
-                )
+                if self.evaluation_plan is None:
+                    self.evaluation_plan = get_flag_evaluation_plan(self.project_id)
+                all_conditions: dict = dict(self.prefetched_query_conditions or {})
+                person_conditions: dict[str, dict[str, bool]] = {}
+                person_query: QuerySet
+                if distinct_ids is None:
+                    person_query = Person.objects.db_manager(DATABASE_FOR_PERSONS).filter(
+                        team_id=self.team_id,
+                        persondistinctid__distinct_id=self.distinct_id,
+                        persondistinctid__team_id=self.team_id,
+                    )
+                else:
+                    person_query = Person.objects.db_manager(DATABASE_FOR_PERSONS).filter(
+                        team_id=self.team_id,
+                        persondistinctid__distinct_id__in=distinct_ids,
+                        persondistinctid__team_id=self.team_id,
+                    )
                 basic_group_query: QuerySet = Group.objects.db_manager(DATABASE_FOR_FLAG_MATCHING).filter(
                     team_id=self.team_id
                 )
@@ -538,11 +704,18 @@ class FeatureFlagMatcher:
                         )
 
                 person_fields: list[str] = []
+                check_person_exists = False
 
                 for existence_condition_key in self.has_pure_is_not_conditions:
+                    if f"{ENTITY_EXISTS_PREFIX}{existence_condition_key}" in all_conditions:
+                        continue
                     if existence_condition_key == PERSON_KEY:
-                        person_exists = person_query.exists()
-                        all_conditions[f"{ENTITY_EXISTS_PREFIX}{PERSON_KEY}"] = person_exists
+                        if distinct_ids is None:
+                            person_exists = person_query.exists()
+                            all_conditions[f"{ENTITY_EXISTS_PREFIX}{PERSON_KEY}"] = person_exists
+                        else:
+                            # Which of the persons exist follows from the person query below
+                            check_person_exists = True
                     else:
                         if existence_condition_key not in group_query_per_group_type_mapping:
                             continue
@@ -553,18 +726,15 @@ class FeatureFlagMatcher:
                         group_exists = group_query.exists()
                         all_conditions[f"{ENTITY_EXISTS_PREFIX}{existence_condition_key}"] = group_exists
 
-                def condition_eval(key, condition):
-                    expr = None
+                def condition_eval(key, condition, flag_plan: Optional[FlagPlan]):
+                    if key in all_conditions:
+                        return
                     annotate_query = True
                     nonlocal person_query
 
-                    property_list = Filter(data=condition).property_groups.flat
-                    properties_with_math_operators = get_all_properties_with_math_operators(
-                        property_list, self.cohorts_cache, self.project_id
-                    )
-
+                    # Feature Flags don't support OR filtering yet
+                    target_properties: dict = {}
                     if len(condition.get("properties", {})) > 0:
-                        # Feature Flags don't support OR filtering yet
                         target_properties = self.property_value_overrides
                         if feature_flag.aggregation_group_type_index is not None:
                             if feature_flag.aggregation_group_type_index not in self.cache.group_type_index_to_name:
@@ -575,14 +745,29 @@ class FeatureFlagMatcher:
                                     {},
                                 )
 
-                        expr = properties_to_Q(
-                            self.project_id,
-                            property_list,
-                            override_property_values=target_properties,
-                            cohorts_cache=self.cohorts_cache,
-                            using_database=DATABASE_FOR_FLAG_MATCHING,
+                    # :TRICKY: Overrides short circuit the properties they're for, so a condition compiled without them
+                    # only applies if none of its properties are overridden. In that case, compiling it with them is the same.
+                    if flag_plan is None:
+                        condition_plan = self._compile_condition(condition, target_properties)
+                    else:
+                        condition_plan = flag_plan.conditions.get(key)
+                        cache_hit = condition_plan is not None and condition_plan.property_keys.isdisjoint(
+                            target_properties
                         )
-
+                        FLAG_EVALUATION_PLAN_COUNTER.labels(cache_hit=str(cache_hit).lower()).inc()
+                        if not cache_hit:
+                            condition_plan = self._compile_condition(condition, target_properties)
+                            # Relative dates are resolved when the condition is compiled, so it can't be reused later
+                            if (
+                                condition_plan.property_keys.isdisjoint(target_properties)
+                                and not condition_plan.uses_relative_dates
+                            ):
+                                flag_plan.conditions[key] = condition_plan
+                    if not condition_plan.property_keys.isdisjoint(excluded_property_keys):
+                        return
+                    expr = condition_plan.expr
+
+                    if expr is not None:
                         # TRICKY: Due to property overrides for cohorts, we sometimes shortcircuit the condition check.
                         # In that case, the expression is either an explicit True or explicit False, or multiple conditions.
                         # We can skip going to the database in explicit True|False conditions. This is important
@@ -606,9 +791,8 @@ class FeatureFlagMatcher:
                             # in properties_to_q, in empty_or_null_with_value_q
                             # These need to come in before the expr so they're available to use inside the expr.
                             # Same holds for the group queries below.
-                            type_property_annotations = _get_property_type_annotations(properties_with_math_operators)
                             person_query = person_query.annotate(
-                                **type_property_annotations,
+                                **condition_plan.annotations,
                                 **{
                                     key: ExpressionWrapper(
                                         cast(Expression, expr if expr else RawSQL("true", [])),
@@ -625,9 +809,8 @@ class FeatureFlagMatcher:
                                 group_query,
                                 group_fields,
                             ) = group_query_per_group_type_mapping[feature_flag.aggregation_group_type_index]
-                            type_property_annotations = _get_property_type_annotations(properties_with_math_operators)
                             group_query = group_query.annotate(
-                                **type_property_annotations,
+                                **condition_plan.annotations,
                                 **{
                                     key: ExpressionWrapper(
                                         cast(Expression, expr if expr else RawSQL("true", [])),
@@ -641,8 +824,13 @@ class FeatureFlagMatcher:
                                 group_fields,
                             )
 
-                # only fetch all cohorts if not passed in any cached cohorts
-                if not self.cohorts_cache and any(feature_flag.uses_cohorts for feature_flag in self.feature_flags):
+                flag_plans = {feature_flag.pk: self._get_flag_plan(feature_flag) for feature_flag in self.feature_flags}
+
+                # only fetch all cohorts if not passed in any cached cohorts, and some flags using them need compiling
+                if not self.cohorts_cache and any(
+                    feature_flag.uses_cohorts and not self._is_flag_compiled(feature_flag, flag_plans[feature_flag.pk])
+                    for feature_flag in self.feature_flags
+                ):
                     all_cohorts = {
                         cohort.pk: cohort
                         for cohort in Cohort.objects.db_manager(DATABASE_FOR_FLAG_MATCHING).filter(
@@ -658,7 +846,7 @@ class FeatureFlagMatcher:
                         prop_key = (condition.get("properties") or [{}])[0].get("key")
                         if prop_key:
                             key = f"flag_{feature_flag.pk}_super_condition"
-                            condition_eval(key, condition)
+                            condition_eval(key, condition, flag_plans[feature_flag.pk])
 
                             is_set_key = f"flag_{feature_flag.pk}_super_condition_is_set"
                             is_set_condition = {
@@ -669,7 +857,7 @@ class FeatureFlagMatcher:
                                     }
                                 ]
                             }
-                            condition_eval(is_set_key, is_set_condition)
+                            condition_eval(is_set_key, is_set_condition, flag_plans[feature_flag.pk])
 
                     with start_span(
                         op="parse_feature_flag_conditions",
@@ -677,9 +865,30 @@ class FeatureFlagMatcher:
                     ):
                         for index, condition in enumerate(feature_flag.conditions):
                             key = f"flag_{feature_flag.pk}_condition_{index}"
-                            condition_eval(key, condition)
-
-                if len(person_fields) > 0:
+                            # Conditions that are matched from request properties alone never read the query results
+                            if self._is_condition_matched_locally(feature_flag, key, condition):
+                                continue
+                            condition_eval(key, condition, flag_plans[feature_flag.pk])
+
+                if distinct_ids is not None:
+                    if len(person_fields) > 0 or check_person_exists:
+                        with start_span(op="execute_person_query"):
+                            with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS * 2, DATABASE_FOR_PERSONS):
+                                rows = {
+                                    row.pop("persondistinctid__distinct_id"): row
+                                    for row in person_query.values("persondistinctid__distinct_id", *person_fields)
+                                }
+                    else:
+                        rows = {}
+                    for distinct_id in distinct_ids:
+                        # Conditions of persons that don't exist don't match, rather than being left to query again
+                        person_conditions[distinct_id] = {
+                            **dict.fromkeys(person_fields, False),
+                            **rows.get(distinct_id, {}),
+                        }
+                        if check_person_exists:
+                            person_conditions[distinct_id][f"{ENTITY_EXISTS_PREFIX}{PERSON_KEY}"] = distinct_id in rows
+                elif len(person_fields) > 0:
                     with start_span(op="execute_person_query"):
                         with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS * 2, DATABASE_FOR_PERSONS):
                             person_query = person_query.values(*person_fields)
@@ -701,7 +910,9 @@ class FeatureFlagMatcher:
                                             len(group_query) == 1
                                         ), f"Expected 1 group query result, got {len(group_query)}"
                                         all_conditions = {**all_conditions, **group_query[0]}
-                return all_conditions
+                                    elif distinct_ids is not None:
+                                        all_conditions.update(dict.fromkeys(group_fields, False))
+                return all_conditions, person_conditions
         except DatabaseError as e:
             logger.exception("query_conditions database error", error=str(e), exc_info=True)
             self.failed_to_fetch_conditions = True
@@ -740,14 +951,29 @@ class FeatureFlagMatcher:
     # uniformly distributed between 0 and 1, so if we want to show this feature to 20% of traffic
     # we can do _hash(key, identifier) < 0.2
     def get_hash(self, feature_flag: FeatureFlag, salt="") -> float:
-        return self.calculate_hash(f"{feature_flag.key}.", self.hashed_identifier(feature_flag), salt)
+        return self.hash_cache.get(f"{feature_flag.key}.", self.hashed_identifier(feature_flag), salt)
 
     # This function takes a identifier and a feature flag and returns a float between 0 and 1.
     # Given the same identifier and key, it'll always return the same float. These floats are
     # uniformly distributed between 0 and 1, and are keyed only on user's distinct id / group key.
     # Thus, irrespective of the flag, the same user will always get the same value.
     def get_holdout_hash(self, feature_flag: FeatureFlag, salt="") -> float:
-        return self.calculate_hash("holdout-", self.hashed_identifier(feature_flag), salt)
+        return self.hash_cache.get("holdout-", self.hashed_identifier(feature_flag), salt)
+
+    def get_rollout_hash_keys(self) -> list[HashKey]:
+        """
+        Keys of the rollout hashes matching is going to need whatever the properties of the person, i.e. of person flags
+        with a rollout condition without properties. Group flags are left out, as their identifiers may need a query.
+        """
+        return [
+            (f"{feature_flag.key}.", self.hashed_identifier(feature_flag), "")
+            for feature_flag in self.feature_flags
+            if feature_flag.aggregation_group_type_index is None
+            and any(
+                not condition.get("properties") and condition.get("rollout_percentage") is not None
+                for condition in feature_flag.conditions
+            )
+        ]
 
     @classmethod
     def calculate_hash(cls, prefix: str, hash_identifier: str | None, salt="") -> float:
@@ -795,8 +1021,10 @@ class FeatureFlagMatcher:
     def has_pure_is_not_conditions(self) -> set[Literal["person"] | GroupTypeIndex]:
         entity_to_condition_check: set[Literal["person"] | GroupTypeIndex] = set()
         for feature_flag in self.feature_flags:
-            for condition in feature_flag.conditions:
-                if check_pure_is_not_operator_condition(condition):
+            for index, condition in enumerate(feature_flag.conditions):
+                if check_pure_is_not_operator_condition(condition) and not self._is_condition_matched_locally(
+                    feature_flag, f"flag_{feature_flag.pk}_condition_{index}", condition
+                ):
                     if feature_flag.aggregation_group_type_index is not None:
                         entity_to_condition_check.add(feature_flag.aggregation_group_type_index)
                     else:
@@ -1078,6 +1306,161 @@ def get_all_feature_flags_with_details(
     )
 
 
+def get_feature_flag_hash_key_overrides_for_distinct_ids(
+    team_id: int, distinct_ids: list[str], using_database: str = "default"
+) -> dict[str, dict[str, str]]:
+    """Hash key overrides of the person of each of the distinct_ids, with two queries for all of them."""
+    distinct_ids_per_person_id: dict[int, list[str]] = {}
+    for person_id, distinct_id in (
+        PersonDistinctId.objects.db_manager(using_database)
+        .filter(distinct_id__in=distinct_ids, team_id=team_id)
+        .values_list("person_id", "distinct_id")
+    ):
+        distinct_ids_per_person_id.setdefault(person_id, []).append(distinct_id)
+
+    hash_key_overrides: dict[str, dict[str, str]] = {distinct_id: {} for distinct_id in distinct_ids}
+    if not distinct_ids_per_person_id:
+        return hash_key_overrides
+
+    for feature_flag_key, hash_key, person_id in (
+        FeatureFlagHashKeyOverride.objects.db_manager(using_database)
+        .filter(person_id__in=list(distinct_ids_per_person_id.keys()), team_id=team_id)
+        .values_list("feature_flag_key", "hash_key", "person_id")
+    ):
+        for distinct_id in distinct_ids_per_person_id[person_id]:
+            hash_key_overrides[distinct_id][feature_flag_key] = hash_key
+
+    return hash_key_overrides
+
+
+def get_all_feature_flags_for_distinct_ids(
+    team: Team,
+    distinct_ids: list[str],
+    groups: Optional[dict[GroupTypeName, str]] = None,
+    property_value_overrides: Optional[dict[str, Union[str, int]]] = None,
+    group_property_value_overrides: Optional[dict[str, dict[str, Union[str, int]]]] = None,
+    flag_keys: Optional[list[str]] = None,
+) -> tuple[dict[str, dict[str, Union[str, bool]]], bool]:
+    """
+    Evaluate all flags for each of the distinct_ids, e.g. for bulk jobs, returning the flags of each distinct_id and
+    whether there were errors computing any of them.
+
+    Matches the same flags `get_all_feature_flags` would, except that no hash key overrides are written. The groups and
+    properties passed in apply to all distinct_ids. Flag conditions are compiled once, and matched against all persons
+    with a single query (and one query per group type), rather than once per distinct_id.
+    """
+    if group_property_value_overrides is None:
+        group_property_value_overrides = {}
+    if property_value_overrides is None:
+        property_value_overrides = {}
+    if groups is None:
+        groups = {}
+    distinct_ids = list(dict.fromkeys(distinct_ids))
+
+    feature_flags_to_be_evaluated = get_feature_flags_for_team_in_cache(team.project_id)
+    cache_hit = True
+
+    if feature_flags_to_be_evaluated is None:
+        cache_hit = False
+        feature_flags_to_be_evaluated = set_feature_flags_for_team_in_cache(team.project_id)
+
+    if flag_keys is not None:
+        flag_keys_set = set(flag_keys)
+        feature_flags_to_be_evaluated = [ff for ff in feature_flags_to_be_evaluated if ff.key in flag_keys_set]
+
+    FLAG_CACHE_HIT_COUNTER.labels(team_id=label_for_team_id_to_track(team.id), cache_hit=cache_hit).inc()
+
+    if not feature_flags_to_be_evaluated or not distinct_ids:
+        return {distinct_id: {} for distinct_id in distinct_ids}, False
+
+    _, group_property_value_overrides = add_local_person_and_group_properties(
+        None, groups, property_value_overrides, group_property_value_overrides
+    )
+    is_database_alive = not settings.DECIDE_SKIP_POSTGRES_FLAGS
+    cache = FlagsMatcherCache(team.project_id)
+    cohorts_cache: dict[int, CohortOrEmpty] = {}
+
+    # Matches the conditions of all distinct_ids at once. Conditions on the distinct_id are left to the matcher of each
+    # distinct_id, as it's overridden differently for each of them.
+    batch_matcher = FeatureFlagMatcher(
+        team.id,
+        team.project_id,
+        feature_flags_to_be_evaluated,
+        "",
+        groups,
+        cache,
+        property_value_overrides=property_value_overrides,
+        group_property_value_overrides=group_property_value_overrides,
+        cohorts_cache=cohorts_cache,
+    )
+    all_conditions: Optional[dict[str, bool]] = None
+    person_conditions: dict[str, dict[str, bool]] = {}
+    hash_key_overrides: dict[str, dict[str, str]] = {}
+    can_read_hash_key_overrides = is_database_alive
+
+    if is_database_alive:
+        try:
+            with start_span(op="batch_query_conditions"):
+                all_conditions, person_conditions = batch_matcher.fetch_query_conditions(
+                    distinct_ids, excluded_property_keys=frozenset({"distinct_id"})
+                )
+        except Exception as e:
+            # The matcher of each distinct_id treats this like failing to fetch its own conditions
+            handle_feature_flag_exception(e, "[Feature Flags] Error matching flag conditions in batch")
+
+        if any(feature_flag.ensure_experience_continuity for feature_flag in feature_flags_to_be_evaluated):
+            try:
+                with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS, DATABASE_FOR_FLAG_MATCHING):
+                    hash_key_overrides = get_feature_flag_hash_key_overrides_for_distinct_ids(
+                        team.id, distinct_ids, DATABASE_FOR_FLAG_MATCHING
+                    )
+            except Exception as e:
+                handle_feature_flag_exception(
+                    e, f"[Feature Flags] Error fetching hash key overrides from {DATABASE_FOR_FLAG_MATCHING} db"
+                )
+                # Same as for a single distinct_id, experience continuity flags can't be handled at all
+                can_read_hash_key_overrides = False
+
+    # Hashes of group flags and holdouts are the same for many of the distinct_ids
+    hash_cache = FlagHashCache()
+    matchers: dict[str, FeatureFlagMatcher] = {}
+    for distinct_id in distinct_ids:
+        person_property_value_overrides, _ = add_local_person_and_group_properties(
+            distinct_id, groups, property_value_overrides, {}
+        )
+        matchers[distinct_id] = FeatureFlagMatcher(
+            team.id,
+            team.project_id,
+            feature_flags_to_be_evaluated,
+            distinct_id,
+            groups,
+            cache,
+            hash_key_overrides.get(distinct_id, {}),
+            person_property_value_overrides,
+            group_property_value_overrides,
+            skip_database_flags=not can_read_hash_key_overrides,
+            cohorts_cache=cohorts_cache,
+            evaluation_plan=batch_matcher.evaluation_plan,
+            prefetched_query_conditions=(
+                {**all_conditions, **person_conditions.get(distinct_id, {})} if all_conditions is not None else None
+            ),
+            hash_cache=hash_cache,
+        )
+        matchers[distinct_id].failed_to_fetch_conditions = batch_matcher.failed_to_fetch_conditions
+
+    with start_span(op="batch_rollout_hashes"):
+        hash_cache.get_many(key for matcher in matchers.values() for key in matcher.get_rollout_hash_keys())
+
+    flags_per_distinct_id: dict[str, dict[str, Union[str, bool]]] = {}
+    faced_error_computing_flags = False
+    for distinct_id, matcher in matchers.items():
+        flags, _, _, errors, _ = matcher.get_matches_with_details()
+        flags_per_distinct_id[distinct_id] = flags
+        faced_error_computing_flags = faced_error_computing_flags or errors
+
+    return flags_per_distinct_id, faced_error_computing_flags
+
+
 def set_feature_flag_hash_key_overrides(team: Team, distinct_ids: list[str], hash_key_override: str) -> bool:
     # As a product decision, the first override wins, i.e consistency matters for the first walkthrough.
     # Thus, we don't need to do upserts here.
@@ -1187,6 +1570,50 @@ def key_and_field_for_property(property: Property) -> tuple[str, str]:
     )
 
 
+def _get_cohort_for_property(prop: Property, cohorts_cache: dict[int, CohortOrEmpty], project_id: int) -> CohortOrEmpty:
+    cohort_id = int(cast(Union[str, int], prop.value))
+    if cohorts_cache.get(cohort_id) is None:
+        queried_cohort = (
+            Cohort.objects.db_manager(DATABASE_FOR_FLAG_MATCHING)
+            .filter(pk=cohort_id, team__project_id=project_id, deleted=False)
+            .first()
+        )
+        cohorts_cache[cohort_id] = queried_cohort or ""
+
+    return cohorts_cache[cohort_id]
+
+
+def get_all_property_keys(
+    properties: list[Property], cohorts_cache: dict[int, CohortOrEmpty], project_id: int
+) -> set[str]:
+    """Keys of the properties, and of the properties of their cohorts, i.e. all that overrides can apply to."""
+    all_keys = set()
+
+    for prop in properties:
+        if prop.type == "cohort":
+            cohort = _get_cohort_for_property(prop, cohorts_cache, project_id)
+            if cohort:
+                all_keys |= get_all_property_keys(cohort.properties.flat, cohorts_cache, project_id)
+        else:
+            all_keys.add(prop.key)
+
+    return all_keys
+
+
+def uses_relative_dates(properties: list[Property], cohorts_cache: dict[int, CohortOrEmpty], project_id: int) -> bool:
+    """Whether any of the properties, or of the properties of their cohorts, compares dates relative to now."""
+    for prop in properties:
+        if prop.type == "cohort":
+            cohort = _get_cohort_for_property(prop, cohorts_cache, project_id)
+            if cohort and uses_relative_dates(cohort.properties.flat, cohorts_cache, project_id):
+                return True
+        elif prop.operator in ("is_date_before", "is_date_after") and relative_date_parse_for_feature_flag_matching(
+            str(prop.value)
+        ):
+            return True
+    return False
+
+
 def get_all_properties_with_math_operators(
     properties: list[Property], cohorts_cache: dict[int, CohortOrEmpty], project_id: int
 ) -> list[tuple[str, str]]:
@@ -1194,16 +1621,7 @@ def get_all_properties_with_math_operators(
 
     for prop in properties:
         if prop.type == "cohort":
-            cohort_id = int(cast(Union[str, int], prop.value))
-            if cohorts_cache.get(cohort_id) is None:
-                queried_cohort = (
-                    Cohort.objects.db_manager(DATABASE_FOR_FLAG_MATCHING)
-                    .filter(pk=cohort_id, team__project_id=project_id, deleted=False)
-                    .first()
-                )
-                cohorts_cache[cohort_id] = queried_cohort or ""
-
-            cohort = cohorts_cache[cohort_id]
+            cohort = _get_cohort_for_property(prop, cohorts_cache, project_id)
             if cohort:
                 all_keys_and_fields.extend(
                     get_all_properties_with_math_operators(cohort.properties.flat, cohorts_cache, project_id)
@@ -0,0 +1,336 @@
+"""
+The payload server-side SDKs poll (`/api/feature_flag/local_evaluation`) to evaluate flags locally.
+
+Every SDK instance polls it every 30 seconds, while the flags, cohorts and group type mapping it's built from rarely
+change. So both variants of a project's payload (with cohorts sent as is, or expanded into flag conditions where
+possible) are serialized once and stored in the cache, along with an ETag for conditional requests. Saving or deleting
+any of the models it's built from drops the stored payloads once committed, and schedules building them again.
+
+Each of these changes also bumps a per-project version, so that a payload built while a change was being made is only
+stored if the version is still the same afterwards. Payloads built from the replica, which may lag behind, are served but
+never stored; building them from the primary is scheduled instead.
+"""
+
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import structlog
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from prometheus_client import Counter
+
+from posthog.constants import SURVEY_TARGETING_FLAG_PREFIX
+from posthog.models.cohort import Cohort, CohortOrEmpty
+from posthog.models.group_type_mapping import GroupTypeMapping
+from posthog.models.signals import mutable_receiver
+
+from .feature_flag import FeatureFlag
+from .flag_evaluation_plan import COHORT_FIELDS_NOT_AFFECTING_FLAGS
+
+logger = structlog.get_logger(__name__)
+
+DATABASE_FOR_LOCAL_EVALUATION = (
+    "default"
+    if ("local_evaluation" not in settings.READ_REPLICA_OPT_IN or "replica" not in settings.DATABASES)
+    else "replica"
+)
+
+LOCAL_EVALUATION_CACHE_KEY = "local_evaluation_payload:{project_id}:{variant}"
+LOCAL_EVALUATION_VERSION_KEY = "local_evaluation_payload_version:{project_id}"
+# Set while building the payloads from the primary is scheduled, so that polls missing the cache schedule it only once
+LOCAL_EVALUATION_UPDATE_SCHEDULED_KEY = "local_evaluation_payload_update_scheduled:{project_id}"
+LOCAL_EVALUATION_UPDATE_SCHEDULED_SECONDS = 60
+
+LOCAL_EVALUATION_CACHE_COUNTER = Counter(
+    "posthog_local_evaluation_payload_via_cache",
+    "Whether the local evaluation payload was served from the cache or built for the request.",
+    labelnames=["result"],
+)
+
+
+class LocalEvaluationError(Exception):
+    """Building the payload failed, at the step that `code` names."""
+
+    def __init__(self, code: str, detail: str):
+        super().__init__(detail)
+        self.code = code
+        self.detail = detail
+
+
+@dataclass(frozen=True)
+class LocalEvaluationPayload:
+    # The serialized JSON response
+    content: str
+    # Strong ETag of the content, quoted
+    etag: str
+    # Whether polling it counts as a billable local evaluation request, i.e. not only survey targeting flags are in it
+    billable: bool
+    flags_count: int
+    cohorts_count: int
+
+
+def _cache_key(project_id: int, send_cohorts: bool) -> str:
+    return LOCAL_EVALUATION_CACHE_KEY.format(project_id=project_id, variant="cohorts" if send_cohorts else "flags")
+
+
+def build_local_evaluation_response(
+    project_id: int,
+    send_cohorts: bool,
+    using_database: str = DATABASE_FOR_LOCAL_EVALUATION,
+    serializer_context: Optional[dict[str, Any]] = None,
+) -> dict:
+    from posthog.api.feature_flag import MinimalFeatureFlagSerializer
+
+    try:
+        feature_flags = list(
+            FeatureFlag.objects.db_manager(using_database).filter(
+                ~Q(is_remote_configuration=True),
+                team__project_id=project_id,
+                deleted=False,
+            )
+        )
+        logger.info("Retrieved feature flags", flags_count=len(feature_flags))
+    except Exception as e:
+        raise LocalEvaluationError("feature_flags_fetch_failed", "Error fetching feature flags") from e
+
+    cohorts = {}
+    seen_cohorts_cache: dict[int, CohortOrEmpty] = {}
+
+    if send_cohorts:
+        try:
+            seen_cohorts_cache = {
+                cohort.pk: cohort
+                for cohort in Cohort.objects.db_manager(using_database).filter(
+                    team__project_id=project_id, deleted=False
+                )
+            }
+            logger.info("Prefetched cohorts", cohorts_count=len(seen_cohorts_cache))
+        except Exception as e:
+            raise LocalEvaluationError("cohorts_fetch_failed", "Error fetching cohorts") from e
+
+    parsed_flags = []
+    for feature_flag in feature_flags:
+        try:
+            filters = feature_flag.get_filters()
+            # transform cohort filters to be evaluated locally, but only if send_cohorts is false
+            if (
+                not send_cohorts
+                and len(
+                    feature_flag.get_cohort_ids(using_database=using_database, seen_cohorts_cache=seen_cohorts_cache)
+                )
+                == 1
+            ):
+                feature_flag.filters = {
+                    **filters,
+                    "groups": feature_flag.transform_cohort_filters_for_easy_evaluation(
+                        using_database=using_database,
+                        seen_cohorts_cache=seen_cohorts_cache,
+                    ),
+                }
+            else:
+                feature_flag.filters = filters
+
+            parsed_flags.append(feature_flag)
+
+            # when param set, send cohorts, for libraries that can handle evaluating them locally
+            # irrespective of complexity
+            if send_cohorts:
+                try:
+                    cohort_ids = feature_flag.get_cohort_ids(
+                        using_database=using_database,
+                        seen_cohorts_cache=seen_cohorts_cache,
+                    )
+
+                    for id in cohort_ids:
+                        # don't duplicate queries for already added cohorts
+                        if id not in cohorts:
+                            if id in seen_cohorts_cache:
+                                cohort = seen_cohorts_cache[id]
+                            else:
+                                cohort = (
+                                    Cohort.objects.db_manager(using_database)
+                                    .filter(id=id, team__project_id=project_id, deleted=False)
+                                    .first()
+                                )
+                                seen_cohorts_cache[id] = cohort or ""
+
+                            if cohort and not cohort.is_static:
+                                try:
+                                    cohorts[str(cohort.pk)] = cohort.properties.to_dict()
+                                except Exception:
+                                    logger.exception("Error processing cohort properties", cohort_id=id)
+                                    continue
+
+                except Exception:
+                    logger.exception("Error processing cohorts for feature flag", flag_id=feature_flag.pk)
+                    continue
+
+        except Exception:
+            logger.exception("Error processing feature flag", flag_id=feature_flag.pk)
+            continue
+
+    try:
+        return {
+            "flags": [
+                MinimalFeatureFlagSerializer(feature_flag, context=serializer_context or {}).data
+                for feature_flag in parsed_flags
+            ],
+            "group_type_mapping": {
+                str(row.group_type_index): row.group_type
+                for row in GroupTypeMapping.objects.db_manager(using_database).filter(project_id=project_id)
+            },
+            "cohorts": cohorts,
+        }
+    except Exception as e:
+        raise LocalEvaluationError("serialization_failed", "Error preparing response") from e
+
+
+def _build_payload(
+    project_id: int, send_cohorts: bool, using_database: str, serializer_context: Optional[dict[str, Any]] = None
+) -> LocalEvaluationPayload:
+    from rest_framework.renderers import JSONRenderer
+
+    response = build_local_evaluation_response(project_id, send_cohorts, using_database, serializer_context)
+    try:
+        content = JSONRenderer().render(response).decode("utf-8")
+    except Exception as e:
+        raise LocalEvaluationError("serialization_failed", "Error preparing response") from e
+    return LocalEvaluationPayload(
+        content=content,
+        etag=f'"{hashlib.sha256(content.encode("utf-8")).hexdigest()}"',
+        billable=any(not flag["key"].startswith(SURVEY_TARGETING_FLAG_PREFIX) for flag in response["flags"]),
+        flags_count=len(response["flags"]),
+        cohorts_count=len(response["cohorts"]),
+    )
+
+
+def _get_version(project_id: int) -> Optional[str]:
+    """When the models the project's payloads are built from last changed, None if not within the cache's TTL."""
+    return cache.get(LOCAL_EVALUATION_VERSION_KEY.format(project_id=project_id))
+
+
+def _set_cached_payload(
+    project_id: int, send_cohorts: bool, payload: LocalEvaluationPayload, version: Optional[str]
+) -> None:
+    try:
+        if _get_version(project_id) != version:
+            # Something changed while building it, so it may be out of date already
+            return
+        cache.set(
+            _cache_key(project_id, send_cohorts),
+            (payload.content, payload.etag, payload.billable, payload.flags_count, payload.cohorts_count),
+            timeout=settings.LOCAL_EVALUATION_CACHE_TTL_SECONDS,
+        )
+    except Exception:
+        logger.exception("local_evaluation_payload_cache_set_failed", project_id=project_id)
+
+
+def get_local_evaluation_payload(
+    project_id: int, send_cohorts: bool, serializer_context: Optional[dict[str, Any]] = None
+) -> LocalEvaluationPayload:
+    """
+    The project's payload, from the cache if possible. Raises `LocalEvaluationError` if it can't be built.
+
+    `serializer_context` is only used if the payload has to be built for this request.
+    """
+    if settings.LOCAL_EVALUATION_CACHE_TTL_SECONDS <= 0:
+        return _build_payload(project_id, send_cohorts, DATABASE_FOR_LOCAL_EVALUATION, serializer_context)
+
+    cache_key = _cache_key(project_id, send_cohorts)
+    version_key = LOCAL_EVALUATION_VERSION_KEY.format(project_id=project_id)
+    try:
+        values = cache.get_many([cache_key, version_key])
+    except Exception:
+        logger.exception("local_evaluation_payload_cache_get_failed", project_id=project_id)
+        return _build_payload(project_id, send_cohorts, DATABASE_FOR_LOCAL_EVALUATION, serializer_context)
+
+    cached: Optional[tuple[str, str, bool, int, int]] = values.get(cache_key)
+    if cached is not None:
+        LOCAL_EVALUATION_CACHE_COUNTER.labels(result="hit").inc()
+        return LocalEvaluationPayload(*cached)
+
+    LOCAL_EVALUATION_CACHE_COUNTER.labels(result="miss").inc()
+    payload = _build_payload(project_id, send_cohorts, DATABASE_FOR_LOCAL_EVALUATION, serializer_context)
+    if DATABASE_FOR_LOCAL_EVALUATION == "default":
+        _set_cached_payload(project_id, send_cohorts, payload, values.get(version_key))
+    else:
+        _schedule_update(project_id)
+    return payload
+
+
+def update_local_evaluation_payloads(project_id: int) -> None:
+    """Build and store both variants of the project's payload, reading from the primary so that no change is missed."""
+    if settings.LOCAL_EVALUATION_CACHE_TTL_SECONDS <= 0:
+        return
+    try:
+        cache.delete(LOCAL_EVALUATION_UPDATE_SCHEDULED_KEY.format(project_id=project_id))
+        version = _get_version(project_id)
+    except Exception:
+        logger.exception("local_evaluation_payload_cache_get_failed", project_id=project_id)
+        return
+    for send_cohorts in (False, True):
+        _set_cached_payload(project_id, send_cohorts, _build_payload(project_id, send_cohorts, "default"), version)
+
+
+def _schedule_update(project_id: int) -> None:
+    from posthog.tasks.feature_flags import update_local_evaluation_payloads as update_local_evaluation_payloads_task
+
+    try:
+        already_scheduled = not cache.add(
+            LOCAL_EVALUATION_UPDATE_SCHEDULED_KEY.format(project_id=project_id),
+            True,
+            timeout=LOCAL_EVALUATION_UPDATE_SCHEDULED_SECONDS,
+        )
+    except Exception:
+        logger.exception("local_evaluation_payload_cache_set_failed", project_id=project_id)
+        return
+    if not already_scheduled:
+        update_local_evaluation_payloads_task.delay(project_id)
+
+
+def _drop_payloads(project_id: int) -> None:
+    try:
+        # A new version makes builds that started before now not store their payload
+        cache.set(
+            LOCAL_EVALUATION_VERSION_KEY.format(project_id=project_id),
+            str(time.time_ns()),
+            timeout=settings.LOCAL_EVALUATION_CACHE_TTL_SECONDS * 2,
+        )
+        cache.delete_many([_cache_key(project_id, send_cohorts) for send_cohorts in (False, True)])
+    except Exception:
+        # Stored payloads expire on their own eventually
+        logger.exception("local_evaluation_payload_invalidation_failed", project_id=project_id)
+        return
+
+    from posthog.tasks.feature_flags import update_local_evaluation_payloads as update_local_evaluation_payloads_task
+
+    update_local_evaluation_payloads_task.delay(project_id)
+
+
+def invalidate_local_evaluation_payloads(project_id: int) -> None:
+    if settings.LOCAL_EVALUATION_CACHE_TTL_SECONDS <= 0:
+        return
+    # Until the change is committed, polls would build (and store) the payload without it
+    transaction.on_commit(lambda: _drop_payloads(project_id))
+
+
+@mutable_receiver([post_save, post_delete], sender=FeatureFlag)
+def feature_flag_changed(sender, instance, **kwargs):
+    invalidate_local_evaluation_payloads(instance.team.project_id)
+
+
+@mutable_receiver([post_save, post_delete], sender=Cohort)
+def cohort_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= COHORT_FIELDS_NOT_AFFECTING_FLAGS:
+        return
+    invalidate_local_evaluation_payloads(instance.team.project_id)
+
+
+@mutable_receiver([post_save, post_delete], sender=GroupTypeMapping)
+def group_type_mapping_changed(sender, instance, **kwargs):
+    invalidate_local_evaluation_payloads(instance.project_id)
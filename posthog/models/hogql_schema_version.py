@@ -0,0 +1,119 @@
+"""
+A per-team counter for everything that HogQL resolution reads from Postgres, i.e. the "schema" a HogQL query is
+resolved and printed against: team settings, property definitions, group types, cohorts, actions and data warehouse
+sources, tables, saved queries and joins.
+
+Whatever caches derived from that schema (e.g. printed queries, HogQL databases) include the version in their keys, so bumping it
+invalidates them all at once. Property definitions created by ingestion don't go through Django, so such caches must
+still expire on their own.
+"""
+
+import structlog
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posthog import redis
+
+logger = structlog.get_logger(__name__)
+
+HOGQL_SCHEMA_VERSION_KEY = "hogql_schema_version:{team_id}"
+
+# Fields of a team that HogQL resolution reads, saving a team with none of them changed doesn't change its schema
+TEAM_FIELDS_AFFECTING_HOGQL = frozenset(
+    {
+        "organization_id",
+        "project_id",
+        "api_token",
+        "timezone",
+        "week_start_day",
+        "test_account_filters",
+        "path_cleaning_filters",
+        "modifiers",
+    }
+)
+
+# Saving a cohort with only these fields changed (e.g. when it's recalculated) doesn't change how queries are printed,
+# while the version that queries are printed with is bumped explicitly when a calculation finishes
+COHORT_FIELDS_NOT_AFFECTING_HOGQL = frozenset(
+    {"count", "is_calculating", "last_calculation", "errors_calculating", "pending_version", "last_error_at"}
+)
+
+
+def get_hogql_schema_version(team_id: int) -> int:
+    version = redis.get_client().get(HOGQL_SCHEMA_VERSION_KEY.format(team_id=team_id))
+    return int(version) if version else 0
+
+
+def bump_hogql_schema_version(team_id: int) -> None:
+    try:
+        redis.get_client().incr(HOGQL_SCHEMA_VERSION_KEY.format(team_id=team_id))
+    except Exception:
+        # Don't fail model saves because of this, derived caches expire on their own eventually
+        logger.exception("hogql_schema_version_bump_failed", team_id=team_id)
+
+
+def bump_hogql_schema_version_for_project(project_id: int) -> None:
+    from posthog.models.team import Team
+
+    for team_id in Team.objects.filter(project_id=project_id).values_list("id", flat=True):
+        bump_hogql_schema_version(team_id)
+
+
+@receiver(pre_save, sender="posthog.Team")
+def team_schema_changing(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Teams are mostly saved as a whole, so compare what HogQL reads with what's stored to tell whether it changes
+    fields = TEAM_FIELDS_AFFECTING_HOGQL
+    if update_fields is not None:
+        fields = fields & {sender._meta.get_field(name).attname for name in update_fields}
+    if not fields or instance.pk is None or raw:
+        instance._hogql_schema_changed = bool(fields)
+        return
+    stored = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._hogql_schema_changed = stored is None or any(
+        stored[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender="posthog.Team")
+def team_schema_changed(sender, instance, **kwargs):
+    if getattr(instance, "_hogql_schema_changed", True):
+        bump_hogql_schema_version(instance.id)
+
+
+@receiver(post_delete, sender="posthog.Team")
+def team_deleted(sender, instance, **kwargs):
+    bump_hogql_schema_version(instance.id)
+
+
+@receiver(post_save, sender="posthog.PropertyDefinition")
+@receiver(post_delete, sender="posthog.PropertyDefinition")
+@receiver(post_save, sender="posthog.GroupTypeMapping")
+@receiver(post_delete, sender="posthog.GroupTypeMapping")
+def project_schema_changed(sender, instance, **kwargs):
+    bump_hogql_schema_version_for_project(instance.project_id or instance.team_id)
+
+
+@receiver(post_save, sender="posthog.Cohort")
+@receiver(post_delete, sender="posthog.Cohort")
+def cohort_schema_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= COHORT_FIELDS_NOT_AFFECTING_HOGQL:
+        return
+    bump_hogql_schema_version(instance.team_id)
+
+
+@receiver(post_save, sender="posthog.Action")
+@receiver(post_delete, sender="posthog.Action")
+@receiver(post_save, sender="posthog.DataWarehouseTable")
+@receiver(post_delete, sender="posthog.DataWarehouseTable")
+@receiver(post_save, sender="posthog.DataWarehouseSavedQuery")
+@receiver(post_delete, sender="posthog.DataWarehouseSavedQuery")
+@receiver(post_save, sender="posthog.DataWarehouseJoin")
+@receiver(post_delete, sender="posthog.DataWarehouseJoin")
+@receiver(post_save, sender="posthog.ExternalDataSource")
+@receiver(post_delete, sender="posthog.ExternalDataSource")
+@receiver(post_save, sender="posthog.ExternalDataSchema")
+@receiver(post_delete, sender="posthog.ExternalDataSchema")
+@receiver(post_save, sender="posthog.TeamRevenueAnalyticsConfig")
+@receiver(post_delete, sender="posthog.TeamRevenueAnalyticsConfig")
+def team_object_schema_changed(sender, instance, **kwargs):
+    bump_hogql_schema_version(instance.team_id)
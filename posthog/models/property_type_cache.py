@@ -0,0 +1,140 @@
+"""
+A per-project map of property definitions to their property types, as used when printing HogQL.
+
+Entries live in a Redis hash per project and are looked up in one round trip. Whatever isn't cached yet is fetched from
+Postgres in a single query, including definitions that don't exist or have no type, so that those don't hit Postgres
+again either. Saving or deleting a definition through Django drops just its own entry, while definitions created by
+ingestion are only picked up once the hash expires.
+"""
+
+from collections import defaultdict
+from typing import Optional
+
+import structlog
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from prometheus_client import Counter
+
+from posthog import redis
+from posthog.models.property_definition import PropertyDefinition
+
+logger = structlog.get_logger(__name__)
+
+PROPERTY_TYPE_CACHE_COUNTER = Counter(
+    "posthog_hogql_property_type_cache_total",
+    "Property type lookups for HogQL printing, by whether they were served from the cache.",
+    labelnames=["result"],
+)
+
+PROPERTY_TYPE_CACHE_KEY = "hogql_property_types:{project_id}"
+
+# (PropertyDefinition.Type, group type index for group properties, property name)
+PropertyTypeLookup = tuple[int, Optional[int], str]
+
+
+def _lookup(type: Optional[int], group_type_index: Optional[int], name: str) -> PropertyTypeLookup:
+    # :TRICKY: Historical event definitions may have no type
+    type = type if type is not None else PropertyDefinition.Type.EVENT
+    return int(type), group_type_index if type == PropertyDefinition.Type.GROUP else None, name
+
+
+def _field(lookup: PropertyTypeLookup) -> str:
+    type, group_type_index, name = lookup
+    return f"{type}:{'' if group_type_index is None else group_type_index}:{name}"
+
+
+def get_property_types(project_id: int, lookups: list[PropertyTypeLookup]) -> dict[PropertyTypeLookup, Optional[str]]:
+    """Property type of each of the given definitions, None if it doesn't exist or has no type."""
+    lookups = list(dict.fromkeys(lookups))
+    if not lookups:
+        return {}
+
+    ttl = settings.HOGQL_PROPERTY_TYPE_CACHE_TTL_SECONDS
+    if ttl <= 0:
+        return _fetch_property_types(project_id, lookups)
+
+    key = PROPERTY_TYPE_CACHE_KEY.format(project_id=project_id)
+    try:
+        cached = redis.get_client().hmget(key, [_field(lookup) for lookup in lookups])
+    except Exception:
+        logger.exception("hogql_property_type_cache_get_failed", project_id=project_id)
+        cached = [None] * len(lookups)
+
+    property_types: dict[PropertyTypeLookup, Optional[str]] = {}
+    missing: list[PropertyTypeLookup] = []
+    for lookup, value in zip(lookups, cached):
+        if value is None:
+            missing.append(lookup)
+        else:
+            property_types[lookup] = (value.decode("utf-8") if isinstance(value, bytes) else value) or None
+
+    PROPERTY_TYPE_CACHE_COUNTER.labels(result="hit").inc(len(lookups) - len(missing))
+    if not missing:
+        return property_types
+    PROPERTY_TYPE_CACHE_COUNTER.labels(result="miss").inc(len(missing))
+
+    fetched = _fetch_property_types(project_id, missing)
+    property_types.update(fetched)
+    try:
+        client = redis.get_client()
+        pipeline = client.pipeline(transaction=False)
+        pipeline.hset(key, mapping={_field(lookup): property_type or "" for lookup, property_type in fetched.items()})
+        pipeline.ttl(key)
+        _, key_ttl = pipeline.execute()
+        # Only expire the hash counting from when it was created, as otherwise every miss would keep it alive forever
+        if key_ttl == -1:
+            client.expire(key, ttl)
+    except Exception:
+        logger.exception("hogql_property_type_cache_set_failed", project_id=project_id)
+    return property_types
+
+
+def _fetch_property_types(
+    project_id: int, lookups: list[PropertyTypeLookup]
+) -> dict[PropertyTypeLookup, Optional[str]]:
+    names: dict[tuple[int, Optional[int]], set[str]] = defaultdict(set)
+    for type, group_type_index, name in lookups:
+        names[(type, group_type_index)].add(name)
+
+    condition = Q()
+    for (type, group_type_index), type_names in names.items():
+        if type == PropertyDefinition.Type.EVENT:
+            condition |= Q(type__in=[None, PropertyDefinition.Type.EVENT], name__in=type_names)
+        elif type == PropertyDefinition.Type.GROUP:
+            condition |= Q(type=type, group_type_index=group_type_index, name__in=type_names)
+        else:
+            condition |= Q(type=type, name__in=type_names)
+
+    property_types: dict[PropertyTypeLookup, Optional[str]] = dict.fromkeys(lookups)
+    definitions = (
+        PropertyDefinition.objects.alias(
+            effective_project_id=Coalesce("project_id", "team_id", output_field=models.BigIntegerField())
+        )
+        .filter(condition, effective_project_id=project_id)
+        .values_list("type", "group_type_index", "name", "property_type")
+    )
+    for type, group_type_index, name, property_type in definitions:
+        lookup = _lookup(type, group_type_index, name)
+        if property_type and lookup in property_types:
+            property_types[lookup] = property_type
+    return property_types
+
+
+def invalidate_property_type(project_id: int, lookup: PropertyTypeLookup) -> None:
+    try:
+        redis.get_client().hdel(PROPERTY_TYPE_CACHE_KEY.format(project_id=project_id), _field(lookup))
+    except Exception:
+        # Don't fail model saves because of this, the cache expires on its own eventually
+        logger.exception("hogql_property_type_cache_invalidation_failed", project_id=project_id)
+
+
+@receiver(post_save, sender="posthog.PropertyDefinition")
+@receiver(post_delete, sender="posthog.PropertyDefinition")
+def property_definition_changed(sender, instance, **kwargs):
+    invalidate_property_type(
+        instance.project_id or instance.team_id, _lookup(instance.type, instance.group_type_index, instance.name)
+    )
@@ -112,6 +112,29 @@ PROM_PUSHGATEWAY_ADDRESS: str | None = os.getenv("PROM_PUSHGATEWAY_ADDRESS", Non
 
 HOGQL_INCREASED_MAX_EXECUTION_TIME: int = get_from_env("HOGQL_INCREASED_MAX_EXECUTION_TIME", 600, type_cast=int)
 
+# How long fully printed HogQL queries are cached for (see posthog/hogql/printed_query_cache.py). 0 disables the cache.
+# Entries are also invalidated by team schema changes, this bounds staleness from changes that can't be tracked.
+HOGQL_PRINTED_QUERY_CACHE_TTL_SECONDS: int = get_from_env(
+    "HOGQL_PRINTED_QUERY_CACHE_TTL_SECONDS", 0 if TEST else 60 * 60, type_cast=int
+)
+
+# How long a worker may reuse the HogQL Database it built for a team (see create_hogql_database). 0 disables reuse.
+# Like the printed query cache, entries are invalidated by team schema changes and expire to bound other staleness.
+HOGQL_DATABASE_CACHE_TTL_SECONDS: int = get_from_env(
+    "HOGQL_DATABASE_CACHE_TTL_SECONDS", 0 if TEST else 10 * 60, type_cast=int
+)
+# Maximum number of (team, modifiers) Database templates kept per worker
+HOGQL_DATABASE_CACHE_MAX_ENTRIES: int = get_from_env("HOGQL_DATABASE_CACHE_MAX_ENTRIES", 128, type_cast=int)
+
+# How long property types looked up for HogQL printing stay cached per project (see posthog/models/property_type_cache.py).
+# Definitions saved through Django are refreshed right away, this bounds staleness from ones created by ingestion.
+HOGQL_PROPERTY_TYPE_CACHE_TTL_SECONDS: int = get_from_env(
+    "HOGQL_PROPERTY_TYPE_CACHE_TTL_SECONDS", 0 if TEST else 10 * 60, type_cast=int
+)
+
+# How many parsed HogQL strings each process keeps around (see ParseCache in posthog/hogql/parser.py). 0 disables it.
+HOGQL_PARSER_CACHE_MAX_ENTRIES: int = get_from_env("HOGQL_PARSER_CACHE_MAX_ENTRIES", 0, type_cast=int)
+
 # Extend and override these settings with EE's ones
 if "ee.apps.EnterpriseConfig" in INSTALLED_APPS:
     from ee.settings import *  # noqa: F401, F403
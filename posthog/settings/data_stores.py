@@ -194,6 +194,12 @@ QUERYSERVICE_VERIFY: bool = get_from_env("QUERYSERVICE_VERIFY", CLICKHOUSE_VERIF
 
 CLICKHOUSE_CONN_POOL_MIN: int = get_from_env("CLICKHOUSE_CONN_POOL_MIN", 20, type_cast=int)
 CLICKHOUSE_CONN_POOL_MAX: int = get_from_env("CLICKHOUSE_CONN_POOL_MAX", 1000, type_cast=int)
+# Disconnect pooled ClickHouse connections that have been idle for longer than this, 0 keeps them open indefinitely
+CLICKHOUSE_CONN_POOL_IDLE_TIMEOUT_SECONDS: int = get_from_env(
+    "CLICKHOUSE_CONN_POOL_IDLE_TIMEOUT_SECONDS", 0, type_cast=int
+)
+# Open the minimum number of pooled ClickHouse connections when a worker starts, instead of on first use
+CLICKHOUSE_CONN_POOL_PREWARM: bool = get_from_env("CLICKHOUSE_CONN_POOL_PREWARM", False, type_cast=str_to_bool)
 
 CLICKHOUSE_STABLE_HOST: str = get_from_env("CLICKHOUSE_STABLE_HOST", CLICKHOUSE_HOST)
 # If enabled, some queries will use system.cluster table to query each shard
@@ -306,6 +312,13 @@ SESSION_RECORDING_KAFKA_MAX_REQUEST_SIZE_BYTES: int = get_from_env(
     type_cast=int,
 )
 
+# Whether ClickhouseProducer inserts rows into ClickHouse directly instead of producing them to Kafka, for deployments
+# without Kafka
+CLICKHOUSE_PRODUCER_WRITE_DIRECTLY = get_from_env("CLICKHOUSE_PRODUCER_WRITE_DIRECTLY", False, type_cast=str_to_bool)
+# How many rows a buffering ClickhouseProducer accumulates, and for how long, before writing them
+CLICKHOUSE_PRODUCER_MAX_BUFFERED_ROWS = get_from_env("CLICKHOUSE_PRODUCER_MAX_BUFFERED_ROWS", 1000, type_cast=int)
+CLICKHOUSE_PRODUCER_MAX_BUFFER_SECONDS = get_from_env("CLICKHOUSE_PRODUCER_MAX_BUFFER_SECONDS", 1.0, type_cast=float)
+
 KAFKA_SECURITY_PROTOCOL = os.getenv("KAFKA_SECURITY_PROTOCOL", None)
 SESSION_RECORDING_KAFKA_SECURITY_PROTOCOL = os.getenv(
     "SESSION_RECORDING_KAFKA_SECURITY_PROTOCOL", KAFKA_SECURITY_PROTOCOL
@@ -401,3 +414,41 @@ CACHES = {
 
 if TEST:
     CACHES["default"] = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+# Format query results are written to the cache with, see posthog/hogql_queries/query_cache_codec.py.
+# Either "orjson" (the original format) or "columnar". Reading always understands every format, so only switch
+# once all readers are deployed.
+QUERY_CACHE_CODEC = get_from_env("QUERY_CACHE_CODEC", "orjson")
+
+# Optional per-process LRU tier in front of the Redis query results cache (see QueryCacheManager).
+# Holds already deserialized responses so repeated tile loads on the same worker skip the Redis GET and decode.
+# The budget is measured in serialized bytes; 0 disables the tier.
+QUERY_CACHE_LOCAL_MAX_BYTES = get_from_env("QUERY_CACHE_LOCAL_MAX_BYTES", 0, type_cast=int)
+# How long a worker may serve a response from its local tier before going back to Redis.
+# This bounds how stale a result can be when another worker has written a fresher one.
+QUERY_CACHE_LOCAL_TTL_SECONDS = get_from_env("QUERY_CACHE_LOCAL_TTL_SECONDS", 30, type_cast=int)
+
+# Single-flight for identical query calculations: while one process calculates a given cache key, others wait up to
+# this many seconds for its result to land in the cache instead of running the same ClickHouse query. 0 disables it.
+QUERY_CALCULATION_COALESCING_WAIT_SECONDS = get_from_env(
+    "QUERY_CALCULATION_COALESCING_WAIT_SECONDS", 0 if TEST else 30, type_cast=float
+)
+# A calculation lease is held for as long as the query may run in ClickHouse plus this margin, so that a dead lease
+# holder doesn't block others for good
+QUERY_CALCULATION_LEASE_MARGIN_SECONDS = get_from_env("QUERY_CALCULATION_LEASE_MARGIN_SECONDS", 30, type_cast=int)
+
+# Size of the process-wide pool of threads query runners run their queries in parallel in (e.g. the series of a trends
+# query), see posthog/hogql_queries/utils/query_executor.py
+QUERY_RUNNER_EXECUTOR_MAX_WORKERS = get_from_env("QUERY_RUNNER_EXECUTOR_MAX_WORKERS", 32, type_cast=int)
+# How many queries of a single query runner run at once
+QUERY_RUNNER_MAX_PARALLEL_QUERIES_PER_REQUEST = get_from_env(
+    "QUERY_RUNNER_MAX_PARALLEL_QUERIES_PER_REQUEST", 4, type_cast=int
+)
+# How many queries of a single team's query runners run at once in a process
+QUERY_RUNNER_MAX_PARALLEL_QUERIES_PER_TEAM = get_from_env(
+    "QUERY_RUNNER_MAX_PARALLEL_QUERIES_PER_TEAM", 8, type_cast=int
+)
+
+# Whether trends queries compute their series over the same date range in a single query, scanning events once for all
+# of them, whenever their math and filters allow it. Otherwise each series is queried on its own.
+TRENDS_COMBINED_SERIES_QUERIES = get_from_env("TRENDS_COMBINED_SERIES_QUERIES", False, type_cast=str_to_bool)
@@ -22,6 +22,10 @@ CAPTURE_ALLOW_RANDOM_PARTITIONING = get_from_env("CAPTURE_ALLOW_RANDOM_PARTITION
 # This is a measure to handle hot partitions in ad-hoc cases.
 EVENT_PARTITION_KEYS_TO_OVERRIDE = get_list(os.getenv("EVENT_PARTITION_KEYS_TO_OVERRIDE", ""))
 
+# Whether capture serializes all events of a request with orjson and hands them to the Kafka producer at once,
+# instead of producing them one by one.
+CAPTURE_BATCH_PRODUCE_ENABLED = get_from_env("CAPTURE_BATCH_PRODUCE_ENABLED", False, type_cast=str_to_bool)
+
 # Keep in sync with plugin-server
 EVENTS_DEAD_LETTER_QUEUE_STATSD_METRIC = "events_added_to_dead_letter_queue"
 
@@ -415,6 +415,18 @@ DECIDE_BILLING_ANALYTICS_TOKEN = get_from_env("DECIDE_BILLING_ANALYTICS_TOKEN",
 # The string "all" -- represents all team IDs
 DECIDE_TRACK_TEAM_IDS = get_list(os.getenv("DECIDE_TRACK_TEAM_IDS", ""))
 
+# How many projects' compiled flag conditions each process keeps around (see posthog/models/feature_flag/flag_evaluation_plan.py).
+# 0 disables them.
+FLAG_EVALUATION_PLAN_CACHE_MAX_PROJECTS = get_from_env(
+    "FLAG_EVALUATION_PLAN_CACHE_MAX_PROJECTS", 0 if TEST else 1000, type_cast=int
+)
+
+# How long the local evaluation payload of a project stays cached (see posthog/models/feature_flag/local_evaluation.py).
+# Changes made through Django rebuild it right away, this bounds staleness from payloads built off a lagging replica.
+LOCAL_EVALUATION_CACHE_TTL_SECONDS = get_from_env(
+    "LOCAL_EVALUATION_CACHE_TTL_SECONDS", 0 if TEST else 10 * 60, type_cast=int
+)
+
 # Decide skip hash key overrides
 DECIDE_SKIP_HASH_KEY_OVERRIDE_WRITES = get_from_env(
     "DECIDE_SKIP_HASH_KEY_OVERRIDE_WRITES", False, type_cast=str_to_bool
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from posthog.models.feature_flag.local_evaluation import update_local_evaluation_payloads as _update_payloads
+from posthog.tasks.utils import CeleryQueue
+
+
+@shared_task(ignore_result=True, queue=CeleryQueue.DEFAULT.value)
+def update_local_evaluation_payloads(project_id: int) -> None:
+    _update_payloads(project_id)
@@ -313,6 +313,39 @@ async def test_csv_writer_writes_record_batches(record_batch):
     ]
 
 
+@pytest.mark.asyncio
+async def test_csv_writer_writes_arrays_and_missing_fields():
+    """Test list values are written as PostgreSQL array literals, and missing fields as empty values."""
+    in_memory_file_obj = io.StringIO()
+
+    async def store_in_memory_on_flush(
+        batch_export_file,
+        records_since_last_flush,
+        bytes_since_last_flush,
+        flush_counter,
+        last_date_range,
+        is_last,
+        error,
+    ):
+        in_memory_file_obj.write(batch_export_file.read().decode("utf-8"))
+
+    record_batch = pa.RecordBatch.from_pydict(
+        {
+            "event": pa.array(["test-event-0", "test-event-1"]),
+            "elements": pa.array([["a", "b"], None]),
+            "_inserted_at": pa.array([dt.datetime.fromtimestamp(0), dt.datetime.fromtimestamp(1)]),
+        }
+    )
+    writer = CSVBatchExportWriter(
+        max_bytes=1, field_names=["event", "elements", "missing"], flush_callable=store_in_memory_on_flush
+    )
+
+    async with writer.open_temporary_file():
+        await writer.write_record_batch(record_batch)
+
+    assert in_memory_file_obj.getvalue() == "test-event-0,{'a'\\, 'b'},\ntest-event-1,,\n"
+
+
 @pytest.mark.parametrize(
     "record_batch",
     TEST_RECORD_BATCHES,
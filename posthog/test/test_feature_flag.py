@@ -1,24 +1,30 @@
 import concurrent.futures
-from datetime import datetime
+import random
+from datetime import datetime, timedelta
 from typing import cast
 
 from django.core.cache import cache
 from django.db import IntegrityError, connection
-from django.test import TransactionTestCase
+from django.test import TransactionTestCase, override_settings
 from django.utils import timezone
 from freezegun import freeze_time
 from parameterized import parameterized
 import pytest
 
+from posthog import redis
 from posthog.models import Cohort, FeatureFlag, GroupTypeMapping, Person
 from posthog.models.feature_flag import get_feature_flags_for_team_in_cache
+from posthog.models.feature_flag.flag_evaluation_plan import FLAG_EVALUATION_PLAN_VERSION_KEY, get_flag_evaluation_plan
 from posthog.models.feature_flag.flag_matching import (
     FeatureFlagHashKeyOverride,
     FeatureFlagMatch,
     FeatureFlagMatcher,
     FeatureFlagMatchReason,
+    FlagHashCache,
     FlagsMatcherCache,
+    calculate_hashes,
     get_all_feature_flags,
+    get_all_feature_flags_for_distinct_ids,
     get_feature_flag_hash_key_overrides,
     set_feature_flag_hash_key_overrides,
 )
@@ -49,6 +55,27 @@ class TestFeatureFlagCohortExpansion(BaseTest):
         result = FeatureFlagMatcher.calculate_hash("holdout-", identifier, "")
         self.assertAlmostEqual(result, expected_hash)
 
+    def test_calculate_hashes_is_identical_to_calculate_hash(self):
+        rng = random.Random(0)
+        alphabet = "abcXYZ019-_.@ é漢字🦔"
+        keys = [
+            (
+                rng.choice(["holdout-", "", "flag-key.", f"{rng.randint(0, 10**6)}."]),
+                None if rng.random() < 0.05 else "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))),
+                rng.choice(["", "variant", "salt-ö"]),
+            )
+            for _ in range(10_000)
+        ]
+        keys.append(("holdout-", "", ""))
+
+        expected = [FeatureFlagMatcher.calculate_hash(prefix, identifier, salt) for prefix, identifier, salt in keys]
+        self.assertEqual(calculate_hashes(keys), expected)
+
+        hash_cache = FlagHashCache()
+        self.assertEqual(hash_cache.get_many(keys[:5_000]), expected[:5_000])
+        self.assertEqual(hash_cache.get_many(keys), expected)
+        self.assertEqual([hash_cache.get(*key) for key in keys], expected)
+
     def test_cohort_expansion(self):
         cohort = Cohort.objects.create(
             team=self.team,
@@ -5891,6 +5918,222 @@ class TestFeatureFlagMatcher(BaseTest, QueryMatchingTest):
             FeatureFlagMatch(False, None, FeatureFlagMatchReason.NO_CONDITION_MATCH, 0),
         )
 
+    def test_conditions_matched_locally_are_not_queried(self):
+        Person.objects.create(
+            team=self.team, distinct_ids=["example_id"], properties={"email": "tim@posthog.com", "name": "tim"}
+        )
+        local_flag = self.create_feature_flag(
+            key="local",
+            filters={"groups": [{"properties": [{"key": "email", "type": "person", "value": "tim@posthog.com"}]}]},
+        )
+        database_flag = self.create_feature_flag(
+            key="database",
+            filters={"groups": [{"properties": [{"key": "name", "type": "person", "value": "tim"}]}]},
+        )
+
+        matcher = FeatureFlagMatcher(
+            self.team.id,
+            self.project.id,
+            [local_flag, database_flag],
+            "example_id",
+            property_value_overrides={"email": "tim@posthog.com"},
+        )
+        flags, *_ = matcher.get_matches_with_details()
+
+        self.assertEqual(flags, {"local": True, "database": True})
+        self.assertEqual(set(matcher.query_conditions), {f"flag_{database_flag.pk}_condition_0"})
+        self.assertEqual(matcher.query_condition_lookups, 1)
+
+    @override_settings(FLAG_EVALUATION_PLAN_CACHE_MAX_PROJECTS=10)
+    def test_evaluation_plan_reuses_compiled_conditions(self):
+        cohort = Cohort.objects.create(
+            team=self.team,
+            groups=[
+                {"properties": [{"key": "email", "type": "person", "value": "@posthog.com", "operator": "icontains"}]}
+            ],
+            name="cohort",
+        )
+        feature_flag = self.create_feature_flag(
+            filters={"groups": [{"properties": [{"key": "id", "value": cohort.pk, "type": "cohort"}]}]}
+        )
+        Person.objects.create(team=self.team, distinct_ids=["example_id"], properties={"email": "tim@posthog.com"})
+
+        self.assertEqual(
+            self.match_flag(feature_flag, "example_id"),
+            FeatureFlagMatch(True, None, FeatureFlagMatchReason.CONDITION_MATCH, 0),
+        )
+        with self.assertNumQueries(1):
+            # The cohort is already compiled into the condition, so only the person is queried
+            self.assertEqual(
+                self.match_flag(feature_flag, "example_id"),
+                FeatureFlagMatch(True, None, FeatureFlagMatchReason.CONDITION_MATCH, 0),
+            )
+
+        # Overridden properties still short circuit the condition
+        self.assertEqual(
+            self.match_flag(feature_flag, "example_id", property_value_overrides={"email": "tim@example.com"}),
+            FeatureFlagMatch(False, None, FeatureFlagMatchReason.NO_CONDITION_MATCH, 0),
+        )
+
+        # Flags that changed since they were compiled are compiled again
+        feature_flag.filters = {
+            "groups": [
+                {"properties": [{"key": "email", "type": "person", "value": "@example.com", "operator": "icontains"}]}
+            ]
+        }
+        self.assertEqual(
+            self.match_flag(feature_flag, "example_id"),
+            FeatureFlagMatch(False, None, FeatureFlagMatchReason.NO_CONDITION_MATCH, 0),
+        )
+
+    @override_settings(FLAG_EVALUATION_PLAN_CACHE_MAX_PROJECTS=10)
+    def test_evaluation_plan_resolves_relative_dates_when_evaluating(self):
+        Person.objects.create(team=self.team, distinct_ids=["example_id"], properties={"signed_up_at": "2022-04-28"})
+        feature_flag = self.create_feature_flag(
+            filters={
+                "groups": [
+                    {
+                        "properties": [
+                            {"key": "signed_up_at", "value": "-7d", "operator": "is_date_after", "type": "person"}
+                        ]
+                    }
+                ]
+            }
+        )
+
+        with freeze_time("2022-05-01") as frozen_time:
+            self.assertEqual(
+                self.match_flag(feature_flag, "example_id"),
+                FeatureFlagMatch(True, None, FeatureFlagMatchReason.CONDITION_MATCH, 0),
+            )
+
+            frozen_time.tick(timedelta(days=7))
+
+            self.assertEqual(
+                self.match_flag(feature_flag, "example_id"),
+                FeatureFlagMatch(False, None, FeatureFlagMatchReason.NO_CONDITION_MATCH, 0),
+            )
+
+    @override_settings(FLAG_EVALUATION_PLAN_CACHE_MAX_PROJECTS=10)
+    def test_evaluation_plan_is_invalidated_by_cohort_changes(self):
+        cohort = Cohort.objects.create(
+            team=self.team,
+            groups=[
+                {"properties": [{"key": "email", "type": "person", "value": "@posthog.com", "operator": "icontains"}]}
+            ],
+            name="cohort",
+        )
+        feature_flag = self.create_feature_flag(
+            filters={"groups": [{"properties": [{"key": "id", "value": cohort.pk, "type": "cohort"}]}]}
+        )
+        Person.objects.create(team=self.team, distinct_ids=["example_id"], properties={"email": "tim@posthog.com"})
+
+        self.assertEqual(
+            self.match_flag(feature_flag, "example_id"),
+            FeatureFlagMatch(True, None, FeatureFlagMatchReason.CONDITION_MATCH, 0),
+        )
+
+        cohort.groups = [
+            {"properties": [{"key": "email", "type": "person", "value": "@example.com", "operator": "icontains"}]}
+        ]
+        cohort.save()
+
+        self.assertEqual(
+            self.match_flag(feature_flag, "example_id"),
+            FeatureFlagMatch(False, None, FeatureFlagMatchReason.NO_CONDITION_MATCH, 0),
+        )
+
+    @override_settings(FLAG_EVALUATION_PLAN_CACHE_MAX_PROJECTS=10)
+    def test_evaluation_plan_version_expires_and_is_checked_periodically(self):
+        redis_client = redis.get_client()
+        key = FLAG_EVALUATION_PLAN_VERSION_KEY.format(project_id=self.project.id)
+
+        with freeze_time("2022-05-01") as frozen_time:
+            plan = get_flag_evaluation_plan(self.project.id)
+            assert plan is not None
+            self.assertGreater(redis_client.ttl(key), 0)
+
+            # Plans invalidated by another process are used until the version is checked again
+            redis_client.delete(key)
+            self.assertIs(get_flag_evaluation_plan(self.project.id), plan)
+
+            frozen_time.tick(timedelta(seconds=2))
+            self.assertIsNot(get_flag_evaluation_plan(self.project.id), plan)
+
+    def test_batch_evaluation_matches_evaluating_each_distinct_id(self):
+        Person.objects.create(
+            team=self.team, distinct_ids=["example_id", "other_id"], properties={"email": "tim@posthog.com"}
+        )
+        Person.objects.create(team=self.team, distinct_ids=["another_id"], properties={"email": "tom@example.com"})
+        self.create_feature_flag(
+            key="email",
+            filters={
+                "groups": [
+                    {
+                        "properties": [
+                            {"key": "email", "type": "person", "value": "@posthog.com", "operator": "icontains"}
+                        ]
+                    }
+                ]
+            },
+        )
+        self.create_feature_flag(
+            key="not-set",
+            filters={"groups": [{"properties": [{"key": "name", "type": "person", "operator": "is_not_set"}]}]},
+        )
+        self.create_feature_flag(
+            key="distinct-id-and-email",
+            filters={
+                "groups": [
+                    {
+                        "properties": [
+                            {"key": "distinct_id", "type": "person", "value": "example_id"},
+                            {"key": "email", "type": "person", "value": "tim@posthog.com"},
+                        ]
+                    }
+                ]
+            },
+        )
+        self.create_feature_flag(
+            key="variant",
+            filters={
+                "groups": [{"properties": [], "rollout_percentage": 50}],
+                "multivariate": {
+                    "variants": [
+                        {"key": "first", "rollout_percentage": 50},
+                        {"key": "second", "rollout_percentage": 50},
+                    ]
+                },
+            },
+        )
+
+        distinct_ids = ["example_id", "other_id", "another_id", "unknown_id"]
+        flags, errors = get_all_feature_flags_for_distinct_ids(self.team, distinct_ids)
+
+        self.assertFalse(errors)
+        self.assertEqual(
+            flags, {distinct_id: get_all_feature_flags(self.team, distinct_id)[0] for distinct_id in distinct_ids}
+        )
+        self.assertEqual(flags["example_id"]["distinct-id-and-email"], True)
+        self.assertEqual(flags["other_id"]["distinct-id-and-email"], False)
+        self.assertEqual(flags["unknown_id"]["not-set"], True)
+        self.assertEqual(flags["another_id"]["email"], False)
+
+    def test_batch_evaluation_queries_persons_once(self):
+        for index in range(5):
+            Person.objects.create(team=self.team, distinct_ids=[f"id_{index}"], properties={"index": index})
+        self.create_feature_flag(
+            key="even",
+            filters={"groups": [{"properties": [{"key": "index", "type": "person", "value": [0, 2, 4]}]}]},
+        )
+
+        # Flags are read from the cache, and all persons are matched with a single query
+        with self.assertNumQueries(1):
+            flags, errors = get_all_feature_flags_for_distinct_ids(self.team, [f"id_{index}" for index in range(5)])
+
+        self.assertFalse(errors)
+        self.assertEqual(flags, {f"id_{index}": {"even": index % 2 == 0} for index in range(5)})
+
 
 class TestFeatureFlagHashKeyOverrides(BaseTest, QueryMatchingTest):
     person: Person